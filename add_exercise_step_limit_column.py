@@ -0,0 +1,51 @@
+"""Add step_limit column to exercises table."""
+
+from app import create_app
+from app.extensions import db
+from sqlalchemy import text
+
+def add_exercise_step_limit_column():
+    """Add step_limit column to exercises table."""
+    app = create_app()
+    
+    with app.app_context():
+        print("=" * 60)
+        print("Adding step_limit column to exercises table")
+        print("=" * 60)
+        
+        try:
+            # Check if column already exists
+            result = db.session.execute(text("""
+                SELECT COLUMN_NAME 
+                FROM INFORMATION_SCHEMA.COLUMNS 
+                WHERE TABLE_SCHEMA = DATABASE() 
+                AND TABLE_NAME = 'exercises' 
+                AND COLUMN_NAME = 'step_limit'
+            """))
+            
+            if result.fetchone():
+                print("\n✓ step_limit column already exists")
+                return
+            
+            # Add step_limit column
+            print("\nAdding step_limit column...")
+            db.session.execute(text("""
+                ALTER TABLE exercises 
+                ADD COLUMN step_limit INT NULL 
+                AFTER points
+            """))
+            
+            db.session.commit()
+            print("✓ step_limit column added successfully")
+            
+            print("\n" + "=" * 60)
+            print("Migration completed successfully!")
+            print("=" * 60)
+            
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n✗ Error: {str(e)}")
+            raise
+
+if __name__ == '__main__':
+    add_exercise_step_limit_column()
@@ -0,0 +1,51 @@
+"""Add time_limit_ms column to exercises table."""
+
+from app import create_app
+from app.extensions import db
+from sqlalchemy import text
+
+def add_exercise_time_limit_column():
+    """Add time_limit_ms column to exercises table."""
+    app = create_app()
+    
+    with app.app_context():
+        print("=" * 60)
+        print("Adding time_limit_ms column to exercises table")
+        print("=" * 60)
+        
+        try:
+            # Check if column already exists
+            result = db.session.execute(text("""
+                SELECT COLUMN_NAME 
+                FROM INFORMATION_SCHEMA.COLUMNS 
+                WHERE TABLE_SCHEMA = DATABASE() 
+                AND TABLE_NAME = 'exercises' 
+                AND COLUMN_NAME = 'time_limit_ms'
+            """))
+            
+            if result.fetchone():
+                print("\n✓ time_limit_ms column already exists")
+                return
+            
+            # Add time_limit_ms column
+            print("\nAdding time_limit_ms column...")
+            db.session.execute(text("""
+                ALTER TABLE exercises 
+                ADD COLUMN time_limit_ms INT NULL 
+                AFTER step_limit
+            """))
+            
+            db.session.commit()
+            print("✓ time_limit_ms column added successfully")
+            
+            print("\n" + "=" * 60)
+            print("Migration completed successfully!")
+            print("=" * 60)
+            
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n✗ Error: {str(e)}")
+            raise
+
+if __name__ == '__main__':
+    add_exercise_time_limit_column()
@@ -0,0 +1,51 @@
+"""Add cpu_time_ms column to exercise_submissions table."""
+
+from app import create_app
+from app.extensions import db
+from sqlalchemy import text
+
+def add_submission_cpu_time_column():
+    """Add cpu_time_ms column to exercise_submissions table."""
+    app = create_app()
+    
+    with app.app_context():
+        print("=" * 60)
+        print("Adding cpu_time_ms column to exercise_submissions table")
+        print("=" * 60)
+        
+        try:
+            # Check if column already exists
+            result = db.session.execute(text("""
+                SELECT COLUMN_NAME 
+                FROM INFORMATION_SCHEMA.COLUMNS 
+                WHERE TABLE_SCHEMA = DATABASE() 
+                AND TABLE_NAME = 'exercise_submissions' 
+                AND COLUMN_NAME = 'cpu_time_ms'
+            """))
+            
+            if result.fetchone():
+                print("\n✓ cpu_time_ms column already exists")
+                return
+            
+            # Add cpu_time_ms column
+            print("\nAdding cpu_time_ms column...")
+            db.session.execute(text("""
+                ALTER TABLE exercise_submissions 
+                ADD COLUMN cpu_time_ms INT NULL 
+                AFTER memory_used_mb
+            """))
+            
+            db.session.commit()
+            print("✓ cpu_time_ms column added successfully")
+            
+            print("\n" + "=" * 60)
+            print("Migration completed successfully!")
+            print("=" * 60)
+            
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n✗ Error: {str(e)}")
+            raise
+
+if __name__ == '__main__':
+    add_submission_cpu_time_column()
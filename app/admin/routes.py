@@ -7,6 +7,8 @@ from app.admin import admin_bp
 from app.admin.decorators import admin_required
 from app.admin.forms import TutorialForm, LessonForm, ExerciseForm
 from app.models import NewTutorial, Lesson, Exercise, TutorialUser, TutorialOrderItem
+from app.python_practice.executor import schedule_time_limit_calibration
+from app.python_practice.plan_cache import exercise_plans, store_exercise_fixtures
 from app.extensions import db
 from datetime import datetime
 from sqlalchemy import func, case
@@ -401,9 +403,11 @@ def exercise_create(course_id):
             order_index=form.order_index.data,
             points=form.points.data
         )
+        store_exercise_fixtures(exercise)
         
         db.session.add(exercise)
         db.session.commit()
+        schedule_time_limit_calibration(exercise)
         
         flash(f'Exercise "{exercise.title}" created successfully!', 'success')
         return redirect(url_for('admin.course_edit', course_id=course_id))
@@ -444,8 +448,11 @@ def exercise_edit(exercise_id):
         exercise.order_index = form.order_index.data
         exercise.points = form.points.data
         exercise.lesson_id = request.form.get('lesson_id', type=int)
+        store_exercise_fixtures(exercise)
         
         db.session.commit()
+        exercise_plans.invalidate(exercise.id)
+        schedule_time_limit_calibration(exercise)
         
         flash(f'Exercise "{exercise.title}" updated successfully!', 'success')
         return redirect(url_for('admin.course_edit', course_id=exercise.tutorial_id))
@@ -887,10 +894,27 @@ def system_health():
         'error_submissions': ExerciseSubmission.query.filter_by(status='error').count()
     }
     
+    # Python execution queue (admission control)
+    from app.python_practice.admission import get_governor
+    governor = get_governor()
+    try:
+        execution_stats = governor.stats() if governor else None
+    except Exception:
+        execution_stats = None
+    
+    # Warm SQL sandbox containers
+    from app.sql_practice.container_pool import current_pool_stats
+    try:
+        sql_pool_stats = current_pool_stats()
+    except Exception:
+        sql_pool_stats = None
+    
     return render_template('admin/system.html',
                          db_stats=db_stats,
                          system_stats=system_stats,
-                         recent_failures=recent_failures)
+                         recent_failures=recent_failures,
+                         execution_stats=execution_stats,
+                         sql_pool_stats=sql_pool_stats)
 
 
 @admin_bp.route('/submissions')
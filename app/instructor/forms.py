@@ -128,6 +128,11 @@ class ExerciseForm(FlaskForm):
         DataRequired(),
         NumberRange(min=0)
     ])
+    
+    step_limit = IntegerField('Step Limit (Python)', validators=[
+        Optional(),
+        NumberRange(min=1000, max=1000000000)
+    ])
 
 
 class QuizForm(FlaskForm):
@@ -7,6 +7,8 @@ from app.instructor import instructor_bp
 from app.instructor.decorators import instructor_required, can_edit_course
 from app.instructor.forms import CourseForm, LessonForm, ExerciseForm, QuizForm, QuizQuestionForm, TestCaseForm
 from app.models import NewTutorial, Lesson, Exercise, TutorialEnrollment, Quiz, QuizQuestion, db
+from app.python_practice.executor import schedule_time_limit_calibration
+from app.python_practice.plan_cache import exercise_plans, store_exercise_fixtures
 from datetime import datetime
 import re
 import os
@@ -396,11 +398,14 @@ def create_exercise(course_id):
             sample_data=form.sample_data.data,
             expected_output=form.expected_output.data,
             points=form.points.data,
-            order_index=form.order_index.data
+            order_index=form.order_index.data,
+            step_limit=form.step_limit.data
         )
+        store_exercise_fixtures(exercise)
         
         db.session.add(exercise)
         db.session.commit()
+        schedule_time_limit_calibration(exercise)
         
         flash(f'Exercise "{exercise.title}" created successfully!', 'success')
         return redirect(url_for('instructor.course_detail', course_id=course_id))
@@ -450,8 +455,12 @@ def edit_exercise(course_id, exercise_id):
         exercise.expected_output = form.expected_output.data
         exercise.points = form.points.data
         exercise.order_index = form.order_index.data
+        exercise.step_limit = form.step_limit.data
+        store_exercise_fixtures(exercise)
         
         db.session.commit()
+        exercise_plans.invalidate(exercise.id)
+        schedule_time_limit_calibration(exercise)
         
         flash('Exercise updated successfully!', 'success')
         return redirect(url_for('instructor.course_detail', course_id=course_id))
@@ -965,7 +974,10 @@ def add_test_case(exercise_id):
         
         # Save back to exercise
         exercise.test_cases = json.dumps(test_cases)
+        store_exercise_fixtures(exercise)
         db.session.commit()
+        exercise_plans.invalidate(exercise.id)
+        schedule_time_limit_calibration(exercise)
         
         return jsonify({'success': True, 'test_case': new_test_case})
     except Exception as e:
@@ -997,6 +1009,8 @@ def delete_test_case(exercise_id, test_case_id):
         # Save back to exercise
         exercise.test_cases = json.dumps(test_cases)
         db.session.commit()
+        exercise_plans.invalidate(exercise.id)
+        schedule_time_limit_calibration(exercise)
         
         return jsonify({'success': True})
     except Exception as e:
@@ -1032,7 +1046,10 @@ def update_test_case(exercise_id, test_case_id):
         
         # Save back to exercise
         exercise.test_cases = json.dumps(test_cases)
+        store_exercise_fixtures(exercise)
         db.session.commit()
+        exercise_plans.invalidate(exercise.id)
+        schedule_time_limit_calibration(exercise)
         
         return jsonify({'success': True})
     except Exception as e:
@@ -7,6 +7,7 @@ IMPORTANT: Using different table names to avoid conflicts with existing database
 - All tables prefixed with 'tutorial_' or 'tut_'
 """
 
+import json
 import uuid
 from datetime import datetime, timedelta
 from flask_login import UserMixin
@@ -231,6 +232,8 @@ class Exercise(db.Model):
     # Organization
     order_index = db.Column(db.Integer, nullable=False, default=0)
     points = db.Column(db.Integer, default=10)
+    step_limit = db.Column(db.Integer, nullable=True)  # Lines of code a Python run may execute (None: default)
+    time_limit_ms = db.Column(db.Integer, nullable=True)  # Calibrated from solution_code (None: default timeout)
     
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -259,7 +262,7 @@ class ExerciseSubmission(db.Model):
     language = db.Column(db.String(20), default='python')  # 'python' or 'sql'
     
     # Execution results
-    status = db.Column(db.String(20), nullable=False, default='pending', index=True)  # 'pending', 'passed', 'failed', 'error', 'timeout'
+    status = db.Column(db.String(20), nullable=False, default='pending', index=True)  # 'pending', 'passed', 'failed', 'error', 'timeout', 'steps_exceeded', 'memory_exceeded', 'output_exceeded'
     output = db.Column(db.Text, nullable=True)  # stdout
     error_message = db.Column(db.Text, nullable=True)  # stderr or exception
     test_results = db.Column(db.Text, nullable=True)  # JSON: test case results
@@ -270,8 +273,9 @@ class ExerciseSubmission(db.Model):
     score = db.Column(db.Numeric(5, 2), default=0.00)
     
     # Performance metrics
-    execution_time_ms = db.Column(db.Integer, nullable=True)
-    memory_used_mb = db.Column(db.Numeric(10, 2), nullable=True)
+    execution_time_ms = db.Column(db.Integer, nullable=True)  # wall clock, including overhead
+    memory_used_mb = db.Column(db.Numeric(10, 2), nullable=True)  # peak RSS of the child
+    cpu_time_ms = db.Column(db.Integer, nullable=True)  # child CPU time (user + system)
     
     # Security & validation
     is_flagged = db.Column(db.Boolean, default=False)  # Flagged for suspicious code
@@ -290,6 +294,31 @@ class ExerciseSubmission(db.Model):
     def __repr__(self):
         return f'<ExerciseSubmission User:{self.user_id} Exercise:{self.exercise_id} Status:{self.status}>'
     
+    def apply_execution_result(self, result):
+        """Copy an executor result onto this submission and score it."""
+        self.status = result['status']
+        self.output = result.get('output', '')
+        self.error_message = result.get('error', '')
+        self.test_results = json.dumps(result.get('test_results', []))
+        self.tests_passed = result.get('tests_passed', 0)
+        self.tests_failed = result.get('tests_failed', 0)
+        self.execution_time_ms = result.get('execution_time_ms', 0)
+        self.memory_used_mb = result.get('memory_used_mb')
+        self.cpu_time_ms = result.get('cpu_time_ms')
+        self.executed_at = datetime.utcnow()
+        
+        # Calculate score (tests skipped by a fail-fast run count as not passed)
+        total_tests = self.tests_passed + self.tests_failed + result.get('tests_skipped', 0)
+        if total_tests > 0:
+            self.score = (self.tests_passed / total_tests) * 100
+        else:
+            self.score = 0
+        
+        # Check if flagged
+        if result.get('is_flagged', False):
+            self.is_flagged = True
+            self.flagged_reason = result.get('flagged_reason') or 'Suspicious code detected'
+    
     def mark_as_passed(self):
         """Mark submission as passed and update enrollment progress."""
         if self.status == 'passed' and self.enrollment:
@@ -0,0 +1,436 @@
+"""
+Admission control for Python code execution.
+
+Every web and Celery process can start sandboxes, so without a shared limit
+a classroom burst oversubscribes the CPU and every submission times out
+together. The governor caps concurrently running executions across the
+cluster (a Redis semaphore when Redis is available, otherwise a per-process
+stand-in) and queues the rest fairly: a user's n-th outstanding request is
+ranked behind every other user's earlier ones, so one user's flood cannot
+starve the others.
+
+When the queue is longer than `max_queue`, or a request waits longer than
+`max_wait`, AdmissionRejected is raised with a Retry-After estimate so
+callers can answer 503 instead of piling on more work.
+
+Server-side work (regrades, batch grading, time-limit calibration) shares
+the BATCH_KEY fairness key. Its requests queue behind every user's and may
+hold at most `batch_slots` slots, so the remaining slots stay free for
+students.
+
+Configuration (environment):
+    PYTHON_ADMISSION                   'redis', 'local' or '0' to disable
+                                       (default: redis when connected)
+    PYTHON_MAX_CONCURRENT_EXECUTIONS   running executions (default: CPU count)
+    PYTHON_ADMISSION_MAX_QUEUE         queued executions before rejecting
+                                       (default: 4 per slot)
+    PYTHON_ADMISSION_MAX_WAIT          seconds a request may queue (default: 15)
+    PYTHON_ADMISSION_BATCH_SLOTS       slots batch work may hold (default:
+                                       half the capacity, at least 1)
+    PYTHON_ADMISSION_BATCH_MAX_WAIT    seconds a batch request may queue
+                                       (default: 60)
+"""
+
+import math
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from app.cache import cache_manager
+
+REDIS_KEY_PREFIX = 'pyexec:admission'
+
+# Queue priority: rank (the user's outstanding requests) dominates arrival time
+RANK_WEIGHT = 1e10
+
+# Fairness key of server-side work; its rank starts this far back, behind
+# any user's queued requests
+BATCH_KEY = 'batch'
+BATCH_RANK_OFFSET = 10000
+
+# A waiter that stops polling (crashed process) is dropped after this long
+HEARTBEAT_TTL = 10
+
+# A slot whose holder never released it (crashed process) expires after this long
+LEASE_SECONDS = 120
+
+POLL_INTERVAL = 0.05
+
+
+class AdmissionRejected(Exception):
+    """Raised when an execution cannot be admitted; carries a Retry-After hint."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ExecutionGovernor:
+    """Concurrency limit with fair queueing; subclasses hold the shared state."""
+
+    backend = None
+
+    def __init__(self, capacity: Optional[int] = None, max_queue: Optional[int] = None,
+                 max_wait: Optional[float] = None, batch_slots: Optional[int] = None):
+        """
+        Initialize governor.
+
+        Args:
+            capacity: Executions allowed to run at once
+            max_queue: Queued executions before new ones are rejected
+            max_wait: Seconds an execution may wait for a slot
+            batch_slots: Slots BATCH_KEY executions may hold at once
+        """
+        self.capacity = capacity or int(os.environ.get('PYTHON_MAX_CONCURRENT_EXECUTIONS') or os.cpu_count() or 2)
+        self.max_queue = max_queue or int(os.environ.get('PYTHON_ADMISSION_MAX_QUEUE') or self.capacity * 4)
+        self.max_wait = max_wait or float(os.environ.get('PYTHON_ADMISSION_MAX_WAIT') or 15)
+        self.batch_slots = min(self.capacity, batch_slots or int(
+            os.environ.get('PYTHON_ADMISSION_BATCH_SLOTS') or max(1, self.capacity // 2)
+        ))
+        self.batch_max_wait = float(os.environ.get('PYTHON_ADMISSION_BATCH_MAX_WAIT') or 60)
+
+        self._metrics_lock = threading.Lock()
+        # Running average of how long a slot is held, for Retry-After
+        self._avg_hold_seconds = 1.0
+        self.metrics = {
+            'admitted': 0,
+            'rejected_backlog': 0,
+            'rejected_wait': 0,
+            'bypassed': 0,
+            'wait_ms_total': 0,
+            'wait_ms_max': 0
+        }
+
+    def _enqueue(self, token: str, user_key: str) -> bool:
+        """Join the queue; False if it is full."""
+        raise NotImplementedError
+
+    def _try_acquire(self, token: str, reserve: int = 0) -> bool:
+        """Take a slot if it is this token's turn and more than `reserve` slots are free."""
+        raise NotImplementedError
+
+    def _release(self, token: str):
+        """Give up a slot or a place in the queue."""
+        raise NotImplementedError
+
+    def _wait(self, seconds: float):
+        """Sleep until the next acquire attempt."""
+        time.sleep(seconds)
+
+    def depth(self) -> Dict[str, int]:
+        """Get the number of running and queued executions."""
+        raise NotImplementedError
+
+    def retry_after(self) -> int:
+        """Estimate the seconds until a new request would be admitted."""
+        try:
+            queued = self.depth()['queued']
+        except Exception:
+            queued = 0
+        return max(1, math.ceil((queued + 1) / self.capacity * self._avg_hold_seconds))
+
+    def admit(self):
+        """
+        Check the backlog before accepting new work.
+
+        Raises:
+            AdmissionRejected: If the queue is over its threshold
+        """
+        try:
+            queued = self.depth()['queued']
+        except Exception:
+            return
+        if queued >= self.max_queue:
+            self._count('rejected_backlog')
+            raise AdmissionRejected('The server is busy. Please try again shortly.', self.retry_after())
+
+    @contextmanager
+    def slot(self, user_key: str, max_wait: Optional[float] = None):
+        """
+        Hold an execution slot for the duration of the block.
+
+        Args:
+            user_key: Fairness key (e.g. 'user:42', or BATCH_KEY)
+            max_wait: Seconds to wait for a slot (default: self.max_wait, or
+                self.batch_max_wait for BATCH_KEY)
+
+        Raises:
+            AdmissionRejected: If the queue is full or the wait runs out
+        """
+        if max_wait is None:
+            max_wait = self.batch_max_wait if user_key == BATCH_KEY else self.max_wait
+        token = uuid.uuid4().hex
+        started = time.monotonic()
+
+        try:
+            admitted = self._acquire(token, user_key, started, max_wait)
+        except AdmissionRejected:
+            raise
+        except Exception as e:
+            # Never fail an execution because the governor's store is down
+            print(f'Admission control unavailable, running unthrottled: {e}')
+            self._count('bypassed')
+            yield
+            return
+        if not admitted:
+            self._count('rejected_backlog')
+            raise AdmissionRejected('The server is busy. Please try again shortly.', self.retry_after())
+
+        acquired = time.monotonic()
+        self._record_wait(acquired - started)
+        try:
+            yield
+        finally:
+            self._release(token)
+            self._record_hold(time.monotonic() - acquired)
+
+    def _acquire(self, token: str, user_key: str, started: float, max_wait: float) -> bool:
+        """Queue and wait for a slot; False if the queue is full."""
+        if not self._enqueue(token, user_key):
+            return False
+        # Batch work leaves the slots above its share to the users
+        reserve = self.capacity - self.batch_slots if user_key == BATCH_KEY else 0
+        try:
+            interval = POLL_INTERVAL
+            while not self._try_acquire(token, reserve):
+                if time.monotonic() - started >= max_wait:
+                    self._count('rejected_wait')
+                    raise AdmissionRejected('Timed out waiting for an execution slot.', self.retry_after())
+                self._wait(interval)
+                interval = min(interval * 1.5, 0.5)
+        except BaseException:
+            self._release(token)
+            raise
+        return True
+
+    def _count(self, name: str):
+        with self._metrics_lock:
+            self.metrics[name] += 1
+
+    def _record_wait(self, seconds: float):
+        wait_ms = int(seconds * 1000)
+        with self._metrics_lock:
+            self.metrics['admitted'] += 1
+            self.metrics['wait_ms_total'] += wait_ms
+            self.metrics['wait_ms_max'] = max(self.metrics['wait_ms_max'], wait_ms)
+
+    def _record_hold(self, seconds: float):
+        with self._metrics_lock:
+            self._avg_hold_seconds = 0.9 * self._avg_hold_seconds + 0.1 * seconds
+
+    def stats(self) -> Dict[str, Any]:
+        """Get queue depth and wait-time statistics."""
+        with self._metrics_lock:
+            metrics = dict(self.metrics)
+        admitted = metrics['admitted']
+        return {
+            'backend': self.backend,
+            'capacity': self.capacity,
+            'batch_slots': self.batch_slots,
+            'max_queue': self.max_queue,
+            **self.depth(),
+            **metrics,
+            'wait_ms_avg': round(metrics['wait_ms_total'] / admitted, 1) if admitted else 0.0
+        }
+
+
+def _rank_offset(user_key: str) -> int:
+    """Get the rank a key's queued requests start from."""
+    return BATCH_RANK_OFFSET if user_key == BATCH_KEY else 0
+
+
+class LocalGovernor(ExecutionGovernor):
+    """Governor for a single process (development, or when Redis is down)."""
+
+    backend = 'local'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._condition = threading.Condition()
+        self._holders = set()
+        self._queue = {}
+        self._owners = {}
+        self._outstanding = {}
+
+    def _enqueue(self, token: str, user_key: str) -> bool:
+        with self._condition:
+            if len(self._queue) >= self.max_queue:
+                return False
+            rank = self._outstanding.get(user_key, 0) + 1
+            self._outstanding[user_key] = rank
+            self._owners[token] = user_key
+            self._queue[token] = (rank + _rank_offset(user_key)) * RANK_WEIGHT + time.time()
+            return True
+
+    def _try_acquire(self, token: str, reserve: int = 0) -> bool:
+        with self._condition:
+            free = self.capacity - len(self._holders) - reserve
+            if free <= 0:
+                return False
+            score = self._queue[token]
+            ahead = sum(1 for other in self._queue.values() if other < score)
+            if ahead >= free:
+                return False
+            del self._queue[token]
+            self._holders.add(token)
+            return True
+
+    def _release(self, token: str):
+        with self._condition:
+            self._holders.discard(token)
+            self._queue.pop(token, None)
+            user_key = self._owners.pop(token, None)
+            if user_key is not None:
+                remaining = self._outstanding[user_key] - 1
+                if remaining > 0:
+                    self._outstanding[user_key] = remaining
+                else:
+                    del self._outstanding[user_key]
+            self._condition.notify_all()
+
+    def _wait(self, seconds: float):
+        with self._condition:
+            self._condition.wait(seconds)
+
+    def depth(self) -> Dict[str, int]:
+        with self._condition:
+            return {'running': len(self._holders), 'queued': len(self._queue)}
+
+
+# Drops holders whose lease ran out and waiters that stopped polling, and
+# gives their users' outstanding counts back. KEYS: holders, queue, waiters,
+# owners, outstanding. ARGV[1]: now.
+_CLEANUP = """
+local function forget(token)
+    redis.call('ZREM', KEYS[1], token)
+    redis.call('ZREM', KEYS[2], token)
+    redis.call('ZREM', KEYS[3], token)
+    local user = redis.call('HGET', KEYS[4], token)
+    if user then
+        redis.call('HDEL', KEYS[4], token)
+        if redis.call('HINCRBY', KEYS[5], user, -1) <= 0 then
+            redis.call('HDEL', KEYS[5], user)
+        end
+    end
+end
+local now = tonumber(ARGV[1])
+for _, token in ipairs(redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now)) do forget(token) end
+for _, token in ipairs(redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', now)) do forget(token) end
+"""
+
+# ARGV: now, token, user, max_queue, heartbeat ttl, rank weight, rank offset
+_ENQUEUE = _CLEANUP + """
+if redis.call('ZCARD', KEYS[2]) >= tonumber(ARGV[4]) then
+    return 0
+end
+local rank = redis.call('HINCRBY', KEYS[5], ARGV[3], 1)
+redis.call('HSET', KEYS[4], ARGV[2], ARGV[3])
+redis.call('ZADD', KEYS[2], (rank + tonumber(ARGV[7])) * tonumber(ARGV[6]) + now, ARGV[2])
+redis.call('ZADD', KEYS[3], now + tonumber(ARGV[5]), ARGV[2])
+return 1
+"""
+
+# ARGV: now, token, capacity, lease seconds, heartbeat ttl, reserved slots
+_TRY_ACQUIRE = _CLEANUP + """
+local position = redis.call('ZRANK', KEYS[2], ARGV[2])
+if not position then
+    return -1
+end
+local free = tonumber(ARGV[3]) - redis.call('ZCARD', KEYS[1]) - tonumber(ARGV[6])
+if position < free then
+    redis.call('ZREM', KEYS[2], ARGV[2])
+    redis.call('ZREM', KEYS[3], ARGV[2])
+    redis.call('ZADD', KEYS[1], now + tonumber(ARGV[4]), ARGV[2])
+    return 1
+end
+redis.call('ZADD', KEYS[3], now + tonumber(ARGV[5]), ARGV[2])
+return 0
+"""
+
+# ARGV: now, token
+_RELEASE = _CLEANUP + """
+forget(ARGV[2])
+return 1
+"""
+
+
+class RedisGovernor(ExecutionGovernor):
+    """Cluster-wide governor backed by Redis (atomic Lua scripts)."""
+
+    backend = 'redis'
+
+    def __init__(self, client, *args, **kwargs):
+        """
+        Initialize governor.
+
+        Args:
+            client: redis.Redis connection shared by every process
+        """
+        super().__init__(*args, **kwargs)
+        self.client = client
+        self.keys = [f'{REDIS_KEY_PREFIX}:{name}' for name in ('holders', 'queue', 'waiters', 'owners', 'outstanding')]
+        self._enqueue_script = client.register_script(_ENQUEUE)
+        self._acquire_script = client.register_script(_TRY_ACQUIRE)
+        self._release_script = client.register_script(_RELEASE)
+
+    def _enqueue(self, token: str, user_key: str) -> bool:
+        return self._enqueue_script(
+            keys=self.keys,
+            args=[time.time(), token, user_key, self.max_queue, HEARTBEAT_TTL, RANK_WEIGHT, _rank_offset(user_key)]
+        ) == 1
+
+    def _try_acquire(self, token: str, reserve: int = 0) -> bool:
+        status = self._acquire_script(
+            keys=self.keys, args=[time.time(), token, self.capacity, LEASE_SECONDS, HEARTBEAT_TTL, reserve]
+        )
+        if status == -1:
+            # Dropped from the queue (e.g. a long pause past the heartbeat)
+            raise AdmissionRejected('Lost place in the execution queue.', self.retry_after())
+        return status == 1
+
+    def _release(self, token: str):
+        try:
+            self._release_script(keys=self.keys, args=[time.time(), token])
+        except Exception:
+            # The lease expires on its own
+            pass
+
+    def depth(self) -> Dict[str, int]:
+        pipe = self.client.pipeline()
+        pipe.zcard(self.keys[0])
+        pipe.zcard(self.keys[1])
+        running, queued = pipe.execute()
+        return {'running': running, 'queued': queued}
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def admission_enabled() -> bool:
+    """Check if admission control is enabled (PYTHON_ADMISSION, default on)."""
+    return os.environ.get('PYTHON_ADMISSION', '1').lower() not in ('0', 'false', 'off')
+
+
+def get_governor() -> Optional[ExecutionGovernor]:
+    """
+    Get the process-wide governor, or None if admission control is disabled.
+
+    Uses Redis once the cache manager is connected (unless PYTHON_ADMISSION
+    is 'local') and the per-process stand-in until then.
+    """
+    global _governor
+    if not admission_enabled():
+        return None
+
+    want_redis = os.environ.get('PYTHON_ADMISSION', '').lower() != 'local' and cache_manager.redis_client is not None
+    with _governor_lock:
+        if _governor is None or (want_redis and _governor.backend != 'redis'):
+            if want_redis:
+                _governor = RedisGovernor(cache_manager.redis_client)
+            else:
+                _governor = LocalGovernor()
+        return _governor
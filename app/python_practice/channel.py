@@ -0,0 +1,359 @@
+"""
+Result channel and bounded output capture for Python execution.
+
+Test results travel on a dedicated file descriptor as length-prefixed JSON
+frames, so nothing the student prints can corrupt grading. Frames are signed
+with a per-run nonce (see runner.py); the reader drops any frame without it,
+so a submission that writes to the descriptor itself cannot forge results. The child's
+stdout/stderr are read as streams and only the first MAX_OUTPUT_LENGTH
+characters are kept (the rest is drained and discarded), so the reading
+process' memory stays flat no matter how much the child prints.
+
+Standard library only: this module is shared by the web/Celery process, the
+fork servers and the runner child.
+"""
+
+import codecs
+import importlib.util
+import json
+import os
+import queue
+import selectors
+import signal
+import struct
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+FRAME_HEADER = struct.Struct('>I')
+READ_CHUNK = 65536
+
+SECURITY_CONFIG_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', 'sandbox', 'python', 'security_config.py'
+)
+DEFAULT_MAX_OUTPUT_LENGTH = 5000
+
+# Upper bound on result-channel bytes accepted from one child
+MAX_RESULT_BYTES = 16 * 1024 * 1024
+
+
+def _load_max_output_length() -> int:
+    """Read MAX_OUTPUT_LENGTH from sandbox/python/security_config.py."""
+    try:
+        spec = importlib.util.spec_from_file_location('sandbox_security_config', SECURITY_CONFIG_PATH)
+        config = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(config)
+        return int(config.MAX_OUTPUT_LENGTH)
+    except Exception:
+        return DEFAULT_MAX_OUTPUT_LENGTH
+
+
+MAX_OUTPUT_LENGTH = _load_max_output_length()
+
+
+def rusage_to_resources(usage) -> Dict[str, int]:
+    """
+    Summarize a child's rusage (from os.wait4).
+
+    Returns:
+        Dictionary with cpu_user_ms, cpu_system_ms and max_rss_kb
+    """
+    max_rss = usage.ru_maxrss
+    if sys.platform == 'darwin':
+        # macOS reports bytes, Linux kilobytes
+        max_rss //= 1024
+    return {
+        'cpu_user_ms': int(usage.ru_utime * 1000),
+        'cpu_system_ms': int(usage.ru_stime * 1000),
+        'max_rss_kb': int(max_rss)
+    }
+
+
+def encode_frame(message: Dict[str, Any]) -> bytes:
+    """Encode a message as a length-prefixed JSON frame."""
+    payload = json.dumps(message, default=repr, separators=(',', ':')).encode('utf-8')
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+def write_frame(fd: int, message: Dict[str, Any]):
+    """Write one frame to a file descriptor."""
+    data = encode_frame(message)
+    while data:
+        written = os.write(fd, data)
+        data = data[written:]
+
+
+class FrameDecoder:
+    """Incrementally decode frames from a byte stream."""
+
+    def __init__(self):
+        """Initialize an empty decode buffer."""
+        self._buffer = b''
+
+    def feed(self, data: bytes) -> List[Dict[str, Any]]:
+        """
+        Add bytes and return every frame that is now complete.
+
+        Args:
+            data: Bytes read from the channel
+
+        Returns:
+            List of decoded messages
+        """
+        self._buffer += data
+        messages = []
+        while len(self._buffer) >= FRAME_HEADER.size:
+            (length,) = FRAME_HEADER.unpack_from(self._buffer)
+            end = FRAME_HEADER.size + length
+            if len(self._buffer) < end:
+                break
+            messages.append(json.loads(self._buffer[FRAME_HEADER.size:end]))
+            self._buffer = self._buffer[end:]
+        return messages
+
+
+def read_frame(fd: int, deadline: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Read exactly one frame from a blocking file descriptor.
+
+    Args:
+        fd: File descriptor to read from
+        deadline: Optional time.monotonic() deadline
+
+    Returns:
+        Decoded message
+
+    Raises:
+        EOFError: If the stream ends before a full frame
+        TimeoutError: If the deadline passes first
+    """
+    header = _read_exact(fd, FRAME_HEADER.size, deadline)
+    (length,) = FRAME_HEADER.unpack(header)
+    return json.loads(_read_exact(fd, length, deadline))
+
+
+def _read_exact(fd: int, size: int, deadline: Optional[float]) -> bytes:
+    """Read `size` bytes from a file descriptor."""
+    chunks = []
+    while size:
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError('Timed out waiting for frame')
+            with selectors.DefaultSelector() as selector:
+                selector.register(fd, selectors.EVENT_READ)
+                if not selector.select(remaining):
+                    continue
+        data = os.read(fd, min(size, READ_CHUNK))
+        if not data:
+            raise EOFError('Channel closed')
+        chunks.append(data)
+        size -= len(data)
+    return b''.join(chunks)
+
+
+class BoundedCapture:
+    """Keep the first `limit` characters of a byte stream, drop the rest."""
+
+    def __init__(self, limit: int = MAX_OUTPUT_LENGTH):
+        """
+        Initialize capture.
+
+        Args:
+            limit: Maximum number of characters to keep
+        """
+        self.limit = limit
+        # UTF-8 needs at most 4 bytes per character
+        self._byte_limit = limit * 4
+        self._chunks = []
+        self._size = 0
+        self.truncated = False
+
+    def feed(self, data: bytes) -> bytes:
+        """Keep what fits and return the part that was kept."""
+        room = self._byte_limit - self._size
+        if len(data) > room:
+            self.truncated = True
+            data = data[:max(room, 0)]
+        if data:
+            self._chunks.append(data)
+            self._size += len(data)
+        return data
+
+    def getvalue(self) -> str:
+        """Get the captured text, cut to `limit` characters."""
+        text = b''.join(self._chunks).decode('utf-8', errors='replace')
+        if len(text) > self.limit:
+            self.truncated = True
+            text = text[:self.limit]
+        return text
+
+
+def kill_process_group(pid: int):
+    """
+    Kill a child's process group (the child and anything it started).
+
+    Children run as the leader of their own process group, so a submission
+    that forks or spawns background processes is stopped as a unit.
+    """
+    try:
+        if hasattr(os, 'killpg'):
+            os.killpg(pid, signal.SIGKILL)
+        else:
+            os.kill(pid, signal.SIGTERM)
+    except OSError:
+        pass  # already gone (Windows reports an invalid handle)
+
+
+def _select_chunks(fds: List[int], deadline: float):
+    """
+    Yield (fd, data) as the descriptors become readable; b'' marks the end
+    of one.
+
+    Raises:
+        TimeoutError: If the deadline passes before every descriptor ends
+    """
+    with selectors.DefaultSelector() as selector:
+        for fd in fds:
+            selector.register(fd, selectors.EVENT_READ)
+        open_fds = len(fds)
+        while open_fds:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError
+            for key, _ in selector.select(remaining):
+                data = os.read(key.fd, READ_CHUNK)
+                if not data:
+                    selector.unregister(key.fd)
+                    open_fds -= 1
+                yield key.fd, data
+
+
+def _threaded_chunks(fds: List[int], deadline: float):
+    """
+    Same as _select_chunks with a reader thread per descriptor, for Windows,
+    where select() only accepts sockets.
+    """
+    chunks = queue.Queue()
+
+    def pump(fd):
+        try:
+            while True:
+                data = os.read(fd, READ_CHUNK)
+                chunks.put((fd, data))
+                if not data:
+                    return
+        except OSError:
+            chunks.put((fd, b''))
+
+    for fd in fds:
+        threading.Thread(target=pump, args=(fd,), name='channel-reader', daemon=True).start()
+    open_fds = len(fds)
+    while open_fds:
+        try:
+            fd, data = chunks.get(timeout=max(deadline - time.monotonic(), 0))
+        except queue.Empty:
+            raise TimeoutError
+        if not data:
+            open_fds -= 1
+        yield fd, data
+
+
+# Reads the child's pipes without blocking on any one of them
+read_chunks = _threaded_chunks if sys.platform == 'win32' else _select_chunks
+
+
+def collect_child(
+    stdout_fd: int,
+    stderr_fd: int,
+    result_fd: int,
+    timeout: float,
+    output_limit: int = MAX_OUTPUT_LENGTH,
+    on_frame: Optional[Callable[[Dict[str, Any]], None]] = None,
+    on_output: Optional[Callable[[str, str], None]] = None,
+    nonce: Optional[str] = None,
+    grader=None
+) -> Dict[str, Any]:
+    """
+    Read a child's stdout, stderr and result channel until they close.
+
+    Args:
+        stdout_fd: Read end of the child's stdout pipe
+        stderr_fd: Read end of the child's stderr pipe
+        result_fd: Read end of the child's result channel
+        timeout: Seconds to wait before giving up on the child
+        output_limit: Characters of stdout/stderr to keep
+        on_frame: Optional callback for each result frame as it arrives
+        on_output: Optional callback called with ('stdout' | 'stderr', text)
+            for each chunk of kept output as it arrives
+        nonce: The run's nonce; frames that do not carry it are dropped, and
+            so is the rest of the channel after bytes that do not decode
+        grader: Optional Grader (see grading.py) that turns the runner's
+            observations into test results before they are kept or passed
+            to `on_frame`; reading stops when it stops the run (fail-fast)
+
+    Returns:
+        Dictionary with stdout, stderr, stdout_truncated, frames, timed_out
+        and stopped (the caller is responsible for killing a timed-out or
+        stopped child)
+    """
+    decoder = FrameDecoder()
+    frames = []
+    result_bytes = 0
+
+    streams = {stdout_fd: 'stdout', stderr_fd: 'stderr'}
+    captures = {stdout_fd: BoundedCapture(output_limit), stderr_fd: BoundedCapture(output_limit)}
+    decoders = {fd: codecs.getincrementaldecoder('utf-8')(errors='replace') for fd in streams}
+
+    timed_out = False
+    stopped = False
+    try:
+        for fd, data in read_chunks([stdout_fd, stderr_fd, result_fd], time.monotonic() + timeout):
+            if not data:
+                continue
+            if fd == result_fd:
+                result_bytes += len(data)
+                if result_bytes > MAX_RESULT_BYTES:
+                    continue
+                try:
+                    received = decoder.feed(data)
+                except ValueError:
+                    # Not written by the runner; ignore the channel from here on
+                    result_bytes = MAX_RESULT_BYTES + 1
+                    continue
+                for frame in received:
+                    if not isinstance(frame, dict) or frame.pop('nonce', None) != nonce:
+                        continue
+                    for kept_frame in grader.grade(frame) if grader else [frame]:
+                        frames.append(kept_frame)
+                        if on_frame:
+                            on_frame(kept_frame)
+                if grader and grader.stopped:
+                    stopped = True
+                    break
+            else:
+                kept = captures[fd].feed(data)
+                if on_output and kept:
+                    text = decoders[fd].decode(kept)
+                    if text:
+                        on_output(streams[fd], text)
+    except TimeoutError:
+        timed_out = True
+
+    if stopped:
+        for frame in grader.stopped_frames():
+            frames.append(frame)
+            if on_frame:
+                on_frame(frame)
+
+    stdout, stderr = captures[stdout_fd], captures[stderr_fd]
+
+    return {
+        'stdout': stdout.getvalue(),
+        'stderr': stderr.getvalue(),
+        'stdout_truncated': stdout.truncated,
+        'frames': frames,
+        'timed_out': timed_out,
+        'stopped': stopped
+    }
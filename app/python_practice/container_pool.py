@@ -0,0 +1,294 @@
+"""
+Warm container pool for Docker-sandboxed Python execution.
+
+Starting a container per submission (create, start, wait, remove) costs well
+over a second. The pool keeps a few locked-down containers running an idle
+process and runs each submission with `docker exec` in a fresh working
+directory that is removed afterwards, together with anything the run left in
+/tmp. A container is retired and replaced
+after `max_uses` runs, when a health check fails, or when a run leaves
+anything behind (files outside its directory or stray processes), since that
+is a sign the submission tampered with its environment.
+"""
+
+import os
+import queue
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+POOL_LABEL = 'coding.python-sandbox-pool'
+WORK_ROOT = '/sandbox'
+TMP_ROOT = '/tmp'
+
+# Exit status of a program killed with SIGKILL, whether by `timeout -s KILL`
+# or by the kernel's OOM killer
+KILLED_EXIT_CODE = 137
+
+# Creates the run directory, runs the code under a hard time limit and always
+# removes the directory and empties /tmp, which outlives the run otherwise.
+# Arguments: run directory, timeout, code.
+RUN_SCRIPT = (
+    'mkdir -p "$1" && cd "$1" || exit 126; '
+    'timeout -s KILL "$2" python -c "$3"; status=$?; '
+    f'cd / && rm -rf "$1"; find {TMP_ROOT} -mindepth 1 -delete 2>/dev/null; exit $status'
+)
+
+# Run as its own process so the only expected processes are the container's
+# idle process (PID 1) and this check.
+HEALTH_CHECK = (
+    'import os, sys\n'
+    "stray = [p for p in os.listdir('/proc') if p.isdigit() and int(p) not in (1, os.getpid())]\n"
+    f"leftovers = os.listdir({WORK_ROOT!r}) + os.listdir({TMP_ROOT!r})\n"
+    'sys.exit(1 if stray or leftovers else 0)\n'
+)
+
+
+class ContainerPoolError(Exception):
+    """Raised when no sandbox container can be provided."""
+
+
+class PooledContainer:
+    """A running sandbox container and its usage count."""
+
+    def __init__(self, container):
+        """
+        Wrap a started container.
+
+        Args:
+            container: Docker SDK container object
+        """
+        self.container = container
+        self.uses = 0
+        self.created_at = time.time()
+
+
+class ContainerPool:
+    """Bounded pool of pre-started sandbox containers."""
+
+    def __init__(
+        self,
+        client,
+        image: str = 'python:3.11-alpine',
+        size: Optional[int] = None,
+        max_uses: Optional[int] = None,
+        mem_limit: str = '128m',
+        cpu_period: int = 100000,
+        cpu_quota: int = 50000,
+        pids_limit: int = 64,
+        acquire_timeout: float = 30
+    ):
+        """
+        Initialize container pool.
+
+        Args:
+            client: Docker client (docker.from_env() or a compatible fake)
+            image: Image the containers run
+            size: Maximum number of containers (default: PYTHON_SANDBOX_POOL_SIZE or 4)
+            max_uses: Runs before a container is replaced (default: PYTHON_SANDBOX_MAX_USES or 50)
+            mem_limit: Memory limit per container
+            cpu_period: CFS period in microseconds
+            cpu_quota: CFS quota in microseconds per period
+            pids_limit: Maximum processes per container
+            acquire_timeout: Seconds to wait for an idle container
+        """
+        self.client = client
+        self.image = image
+        self.size = size or int(os.environ.get('PYTHON_SANDBOX_POOL_SIZE', 4))
+        self.max_uses = max_uses or int(os.environ.get('PYTHON_SANDBOX_MAX_USES', 50))
+        self.mem_limit = mem_limit
+        self.cpu_period = cpu_period
+        self.cpu_quota = cpu_quota
+        self.pids_limit = pids_limit
+        self.acquire_timeout = acquire_timeout
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+        self.metrics = {
+            'runs': 0,
+            'containers_started': 0,
+            'retired_max_uses': 0,
+            'retired_tampered': 0,
+            'retired_unhealthy': 0,
+            'start_failures': 0,
+            'acquire_wait_ms': 0
+        }
+
+    def _start_container(self) -> PooledContainer:
+        """Start a locked-down container that idles until given work."""
+        try:
+            container = self.client.containers.run(
+                image=self.image,
+                command=['sleep', 'infinity'],
+                detach=True,
+                labels={POOL_LABEL: 'idle'},
+                mem_limit=self.mem_limit,
+                memswap_limit=self.mem_limit,
+                cpu_period=self.cpu_period,
+                cpu_quota=self.cpu_quota,
+                pids_limit=self.pids_limit,
+                network_disabled=True,
+                read_only=True,
+                tmpfs={WORK_ROOT: 'rw,nosuid,nodev,size=16m,mode=1777', TMP_ROOT: 'rw,nosuid,nodev,size=16m'},
+                user='nobody',
+                cap_drop=['ALL'],
+                security_opt=['no-new-privileges'],
+                working_dir=WORK_ROOT
+            )
+        except Exception:
+            self.metrics['start_failures'] += 1
+            raise
+        self.metrics['containers_started'] += 1
+        return PooledContainer(container)
+
+    def warm(self, count: Optional[int] = None):
+        """Start containers ahead of the first submission."""
+        count = min(count or self.size, self.size)
+        while True:
+            with self._lock:
+                if self._created >= count:
+                    return
+                self._created += 1
+            try:
+                pooled = self._start_container()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+            self._idle.put(pooled)
+
+    def _acquire(self) -> PooledContainer:
+        """Take a healthy idle container, starting one if the pool is not full."""
+        if self._closed:
+            raise ContainerPoolError('Container pool is shut down')
+
+        started = time.monotonic()
+        while True:
+            pooled = None
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_start = self._created < self.size
+                    if can_start:
+                        self._created += 1
+                if can_start:
+                    try:
+                        pooled = self._start_container()
+                    except Exception as e:
+                        with self._lock:
+                            self._created -= 1
+                        raise ContainerPoolError(f'Could not start sandbox container: {e}')
+                else:
+                    remaining = self.acquire_timeout - (time.monotonic() - started)
+                    try:
+                        pooled = self._idle.get(timeout=max(remaining, 0))
+                    except queue.Empty:
+                        raise ContainerPoolError('No sandbox container became available')
+
+            if self._is_running(pooled):
+                self.metrics['acquire_wait_ms'] += int((time.monotonic() - started) * 1000)
+                return pooled
+            self._retire(pooled, 'retired_unhealthy')
+
+    def _release(self, pooled: PooledContainer):
+        """Return a container to the pool or replace it."""
+        if pooled.uses >= self.max_uses:
+            self._retire(pooled, 'retired_max_uses')
+        elif not self._is_clean(pooled):
+            self._retire(pooled, 'retired_tampered')
+        elif self._closed:
+            self._retire(pooled, None)
+        else:
+            self._idle.put(pooled)
+
+    def _is_running(self, pooled: PooledContainer) -> bool:
+        """Check the container is still up."""
+        try:
+            pooled.container.reload()
+            return pooled.container.status == 'running'
+        except Exception:
+            return False
+
+    def _is_clean(self, pooled: PooledContainer) -> bool:
+        """Check nothing outlived the last run (files, including in /tmp, or processes)."""
+        try:
+            exit_code, _ = pooled.container.exec_run(['python', '-c', HEALTH_CHECK], user='nobody')
+            return exit_code == 0
+        except Exception:
+            return False
+
+    def _retire(self, pooled: PooledContainer, reason: Optional[str]):
+        """Remove a container; the next acquire starts a replacement."""
+        if reason:
+            self.metrics[reason] += 1
+        with self._lock:
+            self._created -= 1
+        try:
+            pooled.container.remove(force=True)
+        except Exception:
+            pass
+
+    def execute(self, code: str, timeout: int = 30) -> Dict[str, Any]:
+        """
+        Run code in a pooled container.
+
+        Args:
+            code: Python code to execute
+            timeout: Execution timeout in seconds
+
+        Returns:
+            Dictionary with exit_code, stdout, stderr, timed_out and oom_killed
+        """
+        pooled = self._acquire()
+        run_dir = f'{WORK_ROOT}/run-{uuid.uuid4().hex}'
+        started = time.monotonic()
+        try:
+            exit_code, (stdout, stderr) = pooled.container.exec_run(
+                ['sh', '-c', RUN_SCRIPT, 'sh', run_dir, str(timeout), code],
+                user='nobody',
+                demux=True
+            )
+        except Exception:
+            # The container's state is unknown after a failed exec
+            self._retire(pooled, 'retired_unhealthy')
+            raise
+        elapsed = time.monotonic() - started
+        pooled.uses += 1
+        self.metrics['runs'] += 1
+        self._release(pooled)
+
+        # `timeout` only kills once the time limit is up, so a program killed
+        # before then ran out of memory
+        killed = exit_code == KILLED_EXIT_CODE
+        timed_out = killed and elapsed >= timeout
+        return {
+            'exit_code': exit_code,
+            'stdout': (stdout or b'').decode('utf-8', errors='replace'),
+            'stderr': (stderr or b'').decode('utf-8', errors='replace'),
+            'timed_out': timed_out,
+            'oom_killed': killed and not timed_out
+        }
+
+    def shutdown(self):
+        """Remove every idle container."""
+        self._closed = True
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._retire(pooled, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get pool statistics and metrics."""
+        return {
+            'size': self.size,
+            'max_uses': self.max_uses,
+            'created': self._created,
+            'idle': self._idle.qsize(),
+            **self.metrics
+        }
@@ -8,6 +8,10 @@ This module provides enhanced debugging capabilities:
 - Standalone CLI for testing
 - Detailed error reporting
 - Test case replay functionality
+
+Executions are saved to an append-only journal (see journal.py) under
+`<log_dir>/journal`; directories written by older versions can still be
+replayed.
 """
 
 import json
@@ -23,6 +27,7 @@ from datetime import datetime
 
 # Import the base executor
 from app.python_practice.executor_enhanced import execute_python_code_enhanced
+from app.python_practice.journal import ExecutionJournal
 
 
 class DebugExecutor:
@@ -53,6 +58,7 @@ class DebugExecutor:
         self.log_dir.mkdir(exist_ok=True)
         
         self.logger = self._setup_logger()
+        self.journal = ExecutionJournal(str(self.log_dir / 'journal'))
         self.execution_count = 0
         
     def _setup_logger(self) -> logging.Logger:
@@ -95,7 +101,7 @@ class DebugExecutor:
             code: Python code to execute
             test_cases: List of test case dictionaries
             timeout: Maximum execution time in seconds
-            save_execution: Save execution details to file
+            save_execution: Save execution details to the journal
             
         Returns:
             Execution result with additional debug info
@@ -143,7 +149,7 @@ class DebugExecutor:
             
             # Save execution details
             if save_execution:
-                self._save_execution(exec_id, code, test_cases, result)
+                exec_id = self._save_execution(exec_id, code, test_cases, result, timeout, execution_time)
             
             # Add debug info to result
             result['debug_info'] = {
@@ -158,79 +164,66 @@ class DebugExecutor:
             self.logger.exception(f"Execution failed with exception: {str(e)}")
             raise
     
-    def _save_execution(self, exec_id: str, code: str, test_cases: List[Dict], result: Dict):
-        """Save execution details to file."""
-        exec_dir = self.log_dir / exec_id
-        exec_dir.mkdir(exist_ok=True)
-        
-        # Save code
-        code_file = exec_dir / 'code.py'
-        code_file.write_text(code, encoding='utf-8')
-        self.logger.debug(f"Saved code to {code_file}")
-        
-        # Save test cases
-        test_file = exec_dir / 'test_cases.json'
-        test_file.write_text(json.dumps(test_cases, indent=2), encoding='utf-8')
-        self.logger.debug(f"Saved test cases to {test_file}")
-        
-        # Save results
-        result_file = exec_dir / 'result.json'
-        result_file.write_text(json.dumps(result, indent=2, default=str), encoding='utf-8')
-        self.logger.debug(f"Saved results to {result_file}")
-        
-        # Create summary report
-        summary_file = exec_dir / 'summary.txt'
-        with open(summary_file, 'w', encoding='utf-8') as f:
-            f.write(f"Execution Summary - {exec_id}\n")
-            f.write("="*60 + "\n\n")
-            f.write(f"Status: {result.get('status')}\n")
-            f.write(f"Tests Passed: {result.get('tests_passed', 0)}/{len(test_cases)}\n")
-            f.write(f"Execution Time: {result.get('execution_time_ms', 0)}ms\n\n")
-            
-            if result.get('output'):
-                f.write(f"Output:\n{result['output']}\n\n")
-            
-            if result.get('error'):
-                f.write(f"Error:\n{result['error']}\n\n")
-            
-            f.write("Test Results:\n")
-            for tr in result.get('test_results', []):
-                status = "PASS" if tr.get('passed') else "FAIL"
-                f.write(f"  [{status}] Test {tr.get('test_number')}: {tr.get('description')}\n")
-                if not tr.get('passed'):
-                    f.write(f"       Expected: {tr.get('expected')}\n")
-                    f.write(f"       Actual: {tr.get('actual')}\n")
-                    if tr.get('error'):
-                        f.write(f"       Error: {tr.get('error')}\n")
+    def _save_execution(self, exec_id: str, code: str, test_cases: List[Dict], result: Dict,
+                        timeout: int = 30, execution_time: Optional[float] = None) -> str:
+        """
+        Append execution details to the journal.
         
-        self.logger.info(f"Execution saved to {exec_dir}")
+        Returns:
+            Journal record id (as a string), used as the execution ID
+        """
+        record_id = self.journal.append(
+            code, test_cases, result, timeout=timeout,
+            wall_ms=int(execution_time * 1000) if execution_time is not None else None,
+            meta={'log_execution_id': exec_id}
+        )
+        self.logger.info(f"Execution saved to journal {self.journal.path} as {record_id}")
+        return str(record_id)
     
     def replay_execution(self, exec_id: str) -> Dict[str, Any]:
         """
         Replay a saved execution.
         
         Args:
-            exec_id: Execution ID to replay
+            exec_id: Execution ID to replay (a journal record id, or the
+                     directory name of an execution saved by older versions)
             
         Returns:
             New execution result
         """
+        exec_id = str(exec_id)
         exec_dir = self.log_dir / exec_id
         
-        if not exec_dir.exists():
+        if exec_id.isdigit():
+            try:
+                record = self.journal.get(int(exec_id))
+            except KeyError:
+                raise FileNotFoundError(f"Execution {exec_id} not found")
+            code, test_cases = record['code'], record['tests']
+        elif exec_dir.is_dir():
+            # Load code and test cases
+            code = (exec_dir / 'code.py').read_text(encoding='utf-8')
+            test_cases = json.loads((exec_dir / 'test_cases.json').read_text(encoding='utf-8'))
+        else:
             raise FileNotFoundError(f"Execution {exec_id} not found")
         
-        # Load code and test cases
-        code = (exec_dir / 'code.py').read_text(encoding='utf-8')
-        test_cases = json.loads((exec_dir / 'test_cases.json').read_text(encoding='utf-8'))
-        
         self.logger.info(f"Replaying execution {exec_id}")
         return self.execute(code, test_cases)
     
-    def list_executions(self) -> List[str]:
-        """List all saved executions."""
-        executions = [d.name for d in self.log_dir.iterdir() if d.is_dir() and d.name.startswith('exec_')]
-        return sorted(executions, reverse=True)
+    def list_executions(self, limit: Optional[int] = None) -> List[str]:
+        """
+        List saved executions, newest first.
+        
+        Args:
+            limit: Maximum number of journal executions to list
+        """
+        count = len(self.journal)
+        start = max(0, count - limit) if limit else 0
+        executions = [str(record_id) for record_id in range(count - 1, start - 1, -1)]
+        
+        # Executions saved as directories by older versions
+        legacy = [d.name for d in self.log_dir.iterdir() if d.is_dir() and d.name.startswith('exec_')]
+        return executions + sorted(legacy, reverse=True)
 
 
 def execute_with_debug(
@@ -267,8 +260,8 @@ def main():
     import argparse
     
     parser = argparse.ArgumentParser(description='Debug Python code execution')
-    parser.add_argument('code_file', help='Python file to execute')
-    parser.add_argument('test_file', help='JSON file with test cases')
+    parser.add_argument('code_file', nargs='?', help='Python file to execute')
+    parser.add_argument('test_file', nargs='?', help='JSON file with test cases')
     parser.add_argument('--timeout', type=int, default=30, help='Timeout in seconds')
     parser.add_argument('--preserve', action='store_true', help='Preserve temp files')
     parser.add_argument('--quiet', action='store_true', help='Quiet mode (no console output)')
@@ -297,6 +290,9 @@ def main():
         print(f"Tests Passed: {result['tests_passed']}")
         return
     
+    if not args.code_file or not args.test_file:
+        parser.error('code_file and test_file are required unless --list or --replay is given')
+    
     # Load code and test cases
     with open(args.code_file, 'r', encoding='utf-8') as f:
         code = f.read()
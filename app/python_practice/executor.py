@@ -2,27 +2,101 @@
 """Python code execution engine with Docker sandbox."""
 
 import json
+import hashlib
 import time
 import subprocess
 import tempfile
 import os
-from typing import Dict, List, Any
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from typing import Callable, Dict, List, Any, Iterable, Iterator, Optional, Tuple
 
 # Import enhanced executor
-from app.python_practice.executor_enhanced import execute_python_code_enhanced
+from app.python_practice.executor_enhanced import default_backend, execute_python_code_enhanced
+from app.python_practice.result_cache import result_cache, cache_key
+from app.python_practice.plan_cache import exercise_plans, compile_plan
+from app.python_practice.admission import BATCH_KEY, AdmissionRejected, get_governor
+from app.python_practice.worker_pool import get_worker_pool
+from app.python_practice.journal import ExecutionJournal
+from flask import current_app, has_app_context
 
+# Time limits: exercises without a calibrated limit get DEFAULT_TIMEOUT;
+# calibrated ones get TIME_LIMIT_FLOOR_MS plus TIME_LIMIT_FACTOR times the
+# reference solution's runtime (never more than DEFAULT_TIMEOUT)
+DEFAULT_TIMEOUT = 30
+TIME_LIMIT_FACTOR = 10
+TIME_LIMIT_FLOOR_MS = 500
+CALIBRATION_RUNS = 3
 
-def execute_python_code(code: str, test_cases: List[Dict], timeout: int = 30) -> Dict[str, Any]:
+# Directory of an execution journal (see journal.py) that records every run
+# that actually executed, for replaying production load with
+# `python -m app.python_practice.journal bench`; unset disables it
+JOURNAL_DIR = os.environ.get('PYTHON_EXECUTION_JOURNAL')
+
+_journal = None
+_journal_lock = threading.Lock()
+
+
+def get_journal() -> Optional[ExecutionJournal]:
+    """Get the production execution journal, or None if disabled."""
+    global _journal
+    if not JOURNAL_DIR:
+        return None
+    with _journal_lock:
+        if _journal is None:
+            _journal = ExecutionJournal(JOURNAL_DIR)
+        return _journal
+
+
+def journal_execution(code: str, test_cases: List[Dict], result: Dict[str, Any],
+                      timeout: float, mode: str, backend: Optional[str] = None):
+    """Append a run to the execution journal (errors are logged, not raised)."""
+    try:
+        journal = get_journal()
+        if journal is not None:
+            journal.append(code, test_cases, result, timeout=timeout, mode=mode, meta={'backend': backend})
+    except Exception as e:
+        print(f'Could not journal execution: {e}')
+
+
+def execute_python_code(code: str, test_cases: List[Dict], timeout: int = 30,
+                        use_cache: bool = True, mode: str = 'sequential',
+                        on_event: Optional[Callable[[Dict], None]] = None,
+                        backend: Optional[str] = None,
+                        step_limit: Optional[int] = None,
+                        admission_key: Optional[str] = None) -> Dict[str, Any]:
     """
     Execute Python code with test cases in a secure sandbox.
     
+    Results of deterministic code are served from the content-addressed
+    result cache when the same code (modulo whitespace and comments) was
+    already graded against the same test cases. Other runs wait for an
+    execution slot from the admission governor when an admission_key is
+    given.
+    
     Args:
         code: Python code to execute
         test_cases: List of test case dictionaries
         timeout: Maximum execution time in seconds
+        use_cache: Look up and store results in the result cache
+        mode: 'sequential', 'parallel' (one process per test) or 'fail_fast'
+              (stop at the first failing test)
+        on_event: Optional progress callback (see execute_python_code_enhanced);
+                  a cached result replays its test results through it
+        backend: 'local' or 'isolated' (default: PYTHON_EXECUTOR_BACKEND)
+        step_limit: Lines of user code the run may execute (default:
+                    PYTHON_STEP_LIMIT, 0 for no limit)
+        admission_key: Fairness key for admission control (e.g. 'user:42',
+                       or BATCH_KEY for server-side work); None runs without
+                       a slot
     
     Returns:
         Dictionary with execution results
+    
+    Raises:
+        AdmissionRejected: If no execution slot could be obtained
     """
     result = {
         'status': 'error',
@@ -31,17 +105,43 @@ def execute_python_code(code: str, test_cases: List[Dict], timeout: int = 30) ->
         'test_results': [],
         'tests_passed': 0,
         'tests_failed': 0,
+        'tests_skipped': 0,
         'execution_time_ms': 0,
         'is_flagged': False,
         'flagged_reason': None
     }
     
     start_time = time.time()
+    key = cache_key(code, test_cases, timeout, backend or default_backend()) if use_cache else None
+    if key and mode == 'fail_fast':
+        # Fail-fast results are partial; never serve them for a full run
+        key += ':fail_fast'
+    if key and step_limit is not None:
+        # A tighter budget can turn a pass into steps_exceeded
+        key += f':steps={step_limit}'
     
     try:
-        # Use enhanced executor with flexible test validation
-        result = execute_python_code_enhanced(code, test_cases, timeout)
+        cached = result_cache.get(key) if key else None
+        if cached is not None:
+            result = cached
+            result['cached'] = True
+            if on_event:
+                for test_result in result['test_results']:
+                    on_event({'event': 'test_result', 'result': test_result})
+        else:
+            governor = get_governor() if admission_key else None
+            if governor:
+                with governor.slot(admission_key):
+                    result = execute_python_code_enhanced(code, test_cases, timeout, mode, on_event, backend, step_limit)
+            else:
+                # Use enhanced executor with flexible test validation
+                result = execute_python_code_enhanced(code, test_cases, timeout, mode, on_event, backend, step_limit)
+            if key:
+                result_cache.set(key, result)
+            journal_execution(code, test_cases, result, timeout, mode, backend)
         
+    except AdmissionRejected:
+        raise
     except Exception as e:
         result['status'] = 'error'
         result['error'] = f'Execution error: {str(e)}'
@@ -53,6 +153,211 @@ def execute_python_code(code: str, test_cases: List[Dict], timeout: int = 30) ->
     return result
 
 
+def execute_python_code_stream(code: str, test_cases: List[Dict], timeout: int = 30,
+                               mode: str = 'sequential',
+                               step_limit: Optional[int] = None,
+                               admission_key: Optional[str] = None,
+                               on_complete: Optional[Callable[[Dict], Any]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Execute Python code and yield progress events as they happen.
+    
+    The code starts running on a background thread when this is called,
+    inside the caller's Flask app context when there is one (the shared
+    result cache uses current_app). The returned iterator relays its
+    test_started, test_result and output events and finishes with
+    {'event': 'complete', 'result': <execute_python_code result>}. If no
+    execution slot is available the result has status 'error' and a
+    `retry_after` hint in seconds.
+    
+    `on_complete` is called with the result on the background thread, in
+    the same app context, and the complete event carries its return value
+    instead. It runs whether or not the events are read to the end, so a
+    caller whose client disconnected still gets to store the result.
+    
+    Args:
+        code: Python code to execute
+        test_cases: List of test case dictionaries
+        timeout: Maximum execution time in seconds
+        mode: Execution mode (see execute_python_code)
+        step_limit: Step budget (see execute_python_code)
+        admission_key: Fairness key for admission control (see execute_python_code)
+        on_complete: Optional callback for the result
+    
+    Returns:
+        Iterator of event dictionaries
+    """
+    events = queue.Queue()
+    app = current_app._get_current_object() if has_app_context() else None
+    
+    def run():
+        result = None
+        try:
+            with app.app_context() if app is not None else nullcontext():
+                try:
+                    result = execute_python_code(code, test_cases, timeout, mode=mode, on_event=events.put,
+                                                 step_limit=step_limit, admission_key=admission_key)
+                except AdmissionRejected as e:
+                    result = {
+                        'status': 'error',
+                        'output': '',
+                        'error': str(e),
+                        'retry_after': e.retry_after,
+                        'test_results': [],
+                        'tests_passed': 0,
+                        'tests_failed': 0,
+                        'execution_time_ms': 0
+                    }
+                if on_complete:
+                    result = on_complete(result)
+        finally:
+            events.put({'event': 'complete', 'result': result})
+    
+    threading.Thread(target=run, name='python-stream', daemon=True).start()
+    return _relay_events(events)
+
+
+def _relay_events(events: queue.Queue) -> Iterator[Dict[str, Any]]:
+    """Yield queued events up to and including the complete event."""
+    while True:
+        event = events.get()
+        yield event
+        if event['event'] == 'complete':
+            return
+
+
+def load_test_cases(exercise) -> List[Dict]:
+    """
+    Get an exercise's parsed test cases from the plan cache.
+    
+    Args:
+        exercise: Exercise model instance
+    
+    Returns:
+        Compiled ExercisePlan, a list of test case dictionaries (empty if
+        missing or unparseable); shared between requests, do not modify
+    """
+    return exercise_plans.get(exercise)
+
+
+def exercise_timeout(exercise) -> float:
+    """Get the execution timeout for an exercise in seconds."""
+    time_limit_ms = getattr(exercise, 'time_limit_ms', None)
+    if time_limit_ms:
+        return time_limit_ms / 1000
+    return DEFAULT_TIMEOUT
+
+
+def calibration_fingerprint(exercise) -> str:
+    """Get a hash of everything an exercise's calibrated time limit depends on."""
+    inputs = [exercise.exercise_type, exercise.solution_code, exercise.test_cases, exercise.step_limit]
+    return hashlib.sha256(json.dumps(inputs, default=str).encode('utf-8')).hexdigest()
+
+
+def calibrate_time_limit(exercise, runs: int = CALIBRATION_RUNS) -> Optional[int]:
+    """
+    Measure the reference solution and set the exercise's time limit.
+    
+    The solution is run `runs` times (bypassing the result cache) and the
+    median runtime is used. Exercises without a passing reference solution
+    fall back to DEFAULT_TIMEOUT; if the runs cannot complete the current
+    limit is kept. The caller commits the session.
+    
+    Args:
+        exercise: Exercise model instance
+        runs: Number of timed runs
+    
+    Returns:
+        New time limit in milliseconds, or None if not calibrated
+    """
+    if exercise.exercise_type != 'python' or not exercise.solution_code:
+        exercise.time_limit_ms = None
+        return None
+    
+    try:
+        # Parse the current test cases instead of using the cached plan,
+        # which may predate the edit being calibrated
+        test_cases = compile_plan(exercise.test_cases)
+        timings = []
+        for _ in range(runs):
+            result = execute_python_code(
+                exercise.solution_code, test_cases, timeout=DEFAULT_TIMEOUT,
+                use_cache=False, step_limit=exercise.step_limit, admission_key=BATCH_KEY
+            )
+            if result['status'] != 'passed':
+                exercise.time_limit_ms = None
+                return None
+            timings.append(result['execution_time_ms'])
+    except Exception as e:
+        print(f'Could not calibrate time limit for exercise {exercise.id}: {e}')
+        return None
+    
+    reference_ms = sorted(timings)[len(timings) // 2]
+    exercise.time_limit_ms = min(DEFAULT_TIMEOUT * 1000, TIME_LIMIT_FLOOR_MS + TIME_LIMIT_FACTOR * reference_ms)
+    return exercise.time_limit_ms
+
+
+def schedule_time_limit_calibration(exercise):
+    """
+    Queue calibration of a saved exercise's time limit on the code_execution queue.
+    
+    Calibration runs the reference solution several times, which is too slow
+    for a web request. The exercise keeps its current limit until the task
+    finishes; if the task cannot be queued the limit falls back to
+    DEFAULT_TIMEOUT. Call after committing the exercise.
+    """
+    from app.extensions import db
+    from app.tasks.execution_tasks import calibrate_exercise_time_limit
+    
+    try:
+        calibrate_exercise_time_limit.delay(exercise.id, calibration_fingerprint(exercise))
+    except Exception as e:
+        print(f'Could not queue time limit calibration for exercise {exercise.id}: {e}')
+        exercise.time_limit_ms = None
+        db.session.commit()
+
+
+def execute_python_batch(exercise, codes: Iterable[str], timeout: Optional[float] = None,
+                         max_workers: int = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Grade many submissions of one exercise concurrently.
+    
+    The exercise's test cases are loaded once and the submissions are fanned
+    out across the warm worker pool (identical solutions are graded once via
+    the result cache). Each execution takes a slot under the shared BATCH_KEY,
+    so batch work never holds more than the governor's batch share.
+    
+    Args:
+        exercise: Exercise model instance
+        codes: Submitted code strings
+        timeout: Maximum execution time per submission in seconds (default:
+                 the exercise's calibrated limit)
+        max_workers: Concurrent executions (default: worker pool size)
+    
+    Yields:
+        (index into codes, execution result) tuples, in completion order
+    
+    Raises:
+        AdmissionRejected: If a submission could not get an execution slot
+    """
+    test_cases = load_test_cases(exercise)
+    timeout = timeout or exercise_timeout(exercise)
+    max_workers = max_workers or get_worker_pool().size
+    
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='python-batch') as pool:
+        futures = {
+            pool.submit(execute_python_code, code, test_cases, timeout,
+                        step_limit=getattr(exercise, 'step_limit', None), admission_key=BATCH_KEY): index
+            for index, code in enumerate(codes)
+        }
+        try:
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            # Stop queued work if the caller abandons the batch
+            for future in futures:
+                future.cancel()
+
+
 def execute_local_python(code: str, test_cases: List[Dict], timeout: int) -> Dict[str, Any]:
     """
     Execute Python code locally (temporary implementation).
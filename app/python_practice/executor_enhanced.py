@@ -2,18 +2,98 @@
 """Enhanced Python code execution engine with flexible test validation."""
 
 import json
+import os
+import secrets
+import signal
 import time
 import subprocess
-import tempfile
-import os
-import re
-from typing import Dict, List, Any
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Any, Optional
+
+from app.python_practice.channel import MAX_OUTPUT_LENGTH, collect_child, kill_process_group, rusage_to_resources
+from app.python_practice.fixtures import fixture_dir, fixture_refs, get_store
+from app.python_practice.grading import Grader, split_tests
+from app.python_practice.worker_pool import (
+    PRELOAD_MODULES, get_worker_pool, needs_preload, pool_enabled, PoolBusy, WorkerError
+)
+
+RUNNER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'runner.py')
+
+# sequential: every test in one process, in order
+# parallel:   one process (fresh namespace) per test, run concurrently
+# fail_fast:  in order, stopping at the first failing test
+EXECUTION_MODES = ('sequential', 'parallel', 'fail_fast')
+
+# Modes a student's submission may request: parallel fans one submission out
+# over several processes, so only server-side callers (regrades) use it
+SUBMISSION_MODES = ('sequential', 'fail_fast')
 
+# local:    warm forked workers (or a fresh interpreter) with memory, file
+#           size and process-count limits
+# isolated: the same, plus namespaces, a private tmpfs and a seccomp filter
+#           applied by the runner (see isolation.py)
+EXECUTION_BACKENDS = ('local', 'isolated')
+
+
+# Lines of user code a run may execute (0 disables the budget), and the CPU
+# seconds it may use; both stop runaway code long before the wall-clock
+# timeout. Exercises can override the step budget (Exercise.step_limit).
+# Counting lines costs ~0.5 us each (see runner.StepCounter), so the default
+# budget only starts after the grace period of CPU time: a runaway loop is
+# stopped after roughly 0.25 s + 500,000 traced lines, about half a second,
+# and code that finishes within the grace period is never traced. An
+# exercise's own budget counts from the first line.
+DEFAULT_STEP_LIMIT = int(os.environ.get('PYTHON_STEP_LIMIT', 500_000))
+DEFAULT_STEP_GRACE_SECONDS = float(os.environ.get('PYTHON_STEP_GRACE_SECONDS', 0.25))
+DEFAULT_CPU_SECONDS = int(os.environ.get('PYTHON_CPU_LIMIT', 5))
+
+# Address space and file size (MB) and processes of the user (RLIMIT_NPROC
+# counts all of them, so run workers as a dedicated user) for every run
+DEFAULT_MEMORY_MB = int(os.environ.get('PYTHON_MEMORY_LIMIT_MB', 256))
+DEFAULT_FILE_SIZE_MB = int(os.environ.get('PYTHON_FILE_SIZE_LIMIT_MB', 8))
+DEFAULT_PROCESS_LIMIT = int(os.environ.get('PYTHON_PROCESS_LIMIT', 64))
+
+
+def resource_limits() -> Dict[str, int]:
+    """Get the rlimits applied to every run (0 disables a limit)."""
+    return {
+        'memory_mb': DEFAULT_MEMORY_MB,
+        'file_size_mb': DEFAULT_FILE_SIZE_MB,
+        'processes': DEFAULT_PROCESS_LIMIT
+    }
 
-def execute_python_code_enhanced(code: str, test_cases: List[Dict], timeout: int = 30) -> Dict[str, Any]:
+
+def default_backend() -> str:
+    """Get the backend configured with PYTHON_EXECUTOR_BACKEND."""
+    return os.environ.get('PYTHON_EXECUTOR_BACKEND', 'local')
+
+
+def execute_python_code_enhanced(code: str, test_cases: List[Dict], timeout: int = 30,
+                                 mode: str = 'sequential',
+                                 on_event: Optional[Callable[[Dict], None]] = None,
+                                 backend: Optional[str] = None,
+                                 step_limit: Optional[int] = None) -> Dict[str, Any]:
     """
     Execute Python code with enhanced flexible test validation.
     
+    `mode` is one of EXECUTION_MODES. In fail_fast mode the tests after the
+    first failure are not run and are reported as `tests_skipped`.
+    
+    `backend` is one of EXECUTION_BACKENDS (default: default_backend()). The
+    isolated backend reports which protections took effect in `isolation`.
+    
+    `step_limit` is the number of lines of user code the run may execute
+    (default DEFAULT_STEP_LIMIT, counted after DEFAULT_STEP_GRACE_SECONDS of
+    CPU time; 0 for no limit); exceeding it ends the run
+    with status 'steps_exceeded'. Running out of memory or writing a file
+    over the size limit (see resource_limits) ends it with 'memory_exceeded'
+    or 'output_exceeded'.
+    
+    If `on_event` is given it is called while the code runs with progress
+    events: {'event': 'test_started', 'test_number', 'description'},
+    {'event': 'test_result', 'result'} and {'event': 'output', 'stream', 'text'}.
+    
     Supported test types:
     - assert_function: Test function return values
     - assert_output: Test exact output (with options for case_sensitive, strip_whitespace)
@@ -32,6 +112,7 @@ def execute_python_code_enhanced(code: str, test_cases: List[Dict], timeout: int
         'test_results': [],
         'tests_passed': 0,
         'tests_failed': 0,
+        'tests_skipped': 0,
         'execution_time_ms': 0,
         'is_flagged': False,
         'flagged_reason': None
@@ -40,7 +121,7 @@ def execute_python_code_enhanced(code: str, test_cases: List[Dict], timeout: int
     start_time = time.time()
     
     try:
-        result = execute_enhanced_local(code, test_cases, timeout)
+        result = execute_enhanced_local(code, test_cases, timeout, mode, on_event, backend, step_limit)
     except Exception as e:
         result['status'] = 'error'
         result['error'] = f'Execution error: {str(e)}'
@@ -51,9 +132,23 @@ def execute_python_code_enhanced(code: str, test_cases: List[Dict], timeout: int
     return result
 
 
-def execute_enhanced_local(code: str, test_cases: List[Dict], timeout: int) -> Dict[str, Any]:
+def execute_enhanced_local(code: str, test_cases: List[Dict], timeout: int,
+                           mode: str = 'sequential',
+                           on_event: Optional[Callable[[Dict], None]] = None,
+                           backend: Optional[str] = None,
+                           step_limit: Optional[int] = None) -> Dict[str, Any]:
     """Execute with enhanced test validation."""
     
+    backend = backend or default_backend()
+    step_grace_seconds = 0
+    if step_limit is None:
+        step_limit = DEFAULT_STEP_LIMIT
+        step_grace_seconds = DEFAULT_STEP_GRACE_SECONDS
+    if mode not in EXECUTION_MODES:
+        raise ValueError(f'Unknown execution mode: {mode}')
+    if backend not in EXECUTION_BACKENDS:
+        raise ValueError(f'Unknown execution backend: {backend}')
+    
     result = {
         'status': 'passed',
         'output': '',
@@ -61,275 +156,322 @@ def execute_enhanced_local(code: str, test_cases: List[Dict], timeout: int) -> D
         'test_results': [],
         'tests_passed': 0,
         'tests_failed': 0,
+        'tests_skipped': 0,
         'is_flagged': False
     }
     
-    # Create temporary file
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False, encoding='utf-8') as f:
-        temp_file = f.name
+    # The runner receives the code and test probes as data; nothing is
+    # generated. The expected values stay out of its process (see grading.py)
+    probes, checks = split_tests(test_cases)
+    plan = {
+        'code': code,
+        # Signs the runner's result frames (see runner.py)
+        'nonce': secrets.token_hex(16),
+        'tests': probes,
+        'output_limit': MAX_OUTPUT_LENGTH,
+        'fail_fast': mode == 'fail_fast',
+        'stream': on_event is not None,
+        'step_limit': step_limit or None,
+        'step_grace_seconds': step_grace_seconds,
+        'cpu_seconds': max(1, min(int(timeout), DEFAULT_CPU_SECONDS)),
+        'limits': resource_limits(),
+        # The CPU limit backs up the wall-clock timeout
+        'isolation': {
+            'limits': dict(resource_limits(), cpu_seconds=max(1, int(timeout)))
+        } if backend == 'isolated' else None,
+        'fixture_dir': fixture_dir() if _uses_fixtures(test_cases) else None,
+        # Heavy libraries are imported before the rlimits (and come warm from
+        # a preloading fork server)
+        'preload': list(PRELOAD_MODULES) if needs_preload(code) else None
+    }
+    relay = _progress_relay(on_event) if on_event else None
+    
+    try:
+        # Execute
+        started = time.monotonic()
+        if mode == 'parallel' and len(test_cases) > 1:
+            run = _run_plan_parallel(plan, checks, timeout, relay)
+        else:
+            run = _run_plan(plan, checks, timeout, relay)
+        elapsed = time.monotonic() - started
+        frames = run['frames']
+        complete = next((frame for frame in frames if frame.get('type') == 'complete'), None)
         
-        # Add test framework FIRST to capture all output
-        f.write('''
-# Test execution framework
-import json
-import sys
-import re
-from io import StringIO
-
-# Capture stdout for output tests
-original_stdout = sys.stdout
-captured_output = StringIO()
-sys.stdout = captured_output
-
-test_results = []
-''')
+        # Child CPU time and peak RSS, measured by the kernel
+        resources = run.get('resources')
+        if resources:
+            result['resources'] = resources
+            result['cpu_time_ms'] = resources['cpu_user_ms'] + resources['cpu_system_ms']
+            result['memory_used_mb'] = round(resources['max_rss_kb'] / 1024, 2)
         
-        # Write user code AFTER setting up stdout capture
-        f.write('\n# User code\n')
-        f.write(code)
-        f.write('\n\n')
+        result['output'] = run['stdout'].strip()
+        if run['stdout_truncated'] or (complete and complete.get('output_truncated')):
+            result['output'] += '\n\n... (output truncated)'
         
-        # Generate test code for each test case
-        for i, test in enumerate(test_cases):
-            test_type = test.get('type', 'assert_function')
-            description = test.get('description', f'Test {i+1}')
-            
-            f.write(f'\n# Test {i+1}: {description}\n')
-            f.write('try:\n')
-            
-            if test_type == 'assert_function':
-                # Test function return value
-                function_name = test.get('function_name', 'solution')
-                test_input = test.get('input', [])
-                expected = test.get('expected')
-                expected_any_of = test.get('expected_any_of', [])
-                
-                if isinstance(test_input, list):
-                    args = ', '.join([repr(arg) for arg in test_input])
-                else:
-                    args = repr(test_input)
-                
-                f.write(f'    actual = {function_name}({args})\n')
-                
-                if expected_any_of:
-                    f.write(f'    expected_any = {repr(expected_any_of)}\n')
-                    f.write('    passed = actual in expected_any\n')
-                    f.write(f'    expected = expected_any\n')
-                else:
-                    f.write(f'    expected = {repr(expected)}\n')
-                    f.write('    passed = actual == expected\n')
-                
-            elif test_type == 'assert_output':
-                # Test exact output
-                expected = test.get('expected', '')
-                case_sensitive = test.get('case_sensitive', True)
-                strip_whitespace = test.get('strip_whitespace', True)
-                
-                f.write('    output = captured_output.getvalue()\n')
-                if strip_whitespace:
-                    f.write('    output = output.strip()\n')
-                    f.write(f'    expected = {repr(expected)}.strip()\n')
-                else:
-                    f.write(f'    expected = {repr(expected)}\n')
-                
-                if not case_sensitive:
-                    f.write('    passed = output.lower() == expected.lower()\n')
-                else:
-                    f.write('    passed = output == expected\n')
-                
-                f.write('    actual = output\n')
-                
-            elif test_type == 'assert_output_contains':
-                # Check if output contains text
-                expected = test.get('expected', '')
-                case_sensitive = test.get('case_sensitive', True)
-                
-                f.write('    output = captured_output.getvalue()\n')
-                f.write(f'    expected = {repr(expected)}\n')
-                
-                if not case_sensitive:
-                    f.write('    passed = expected.lower() in output.lower()\n')
-                else:
-                    f.write('    passed = expected in output\n')
-                
-                f.write('    actual = output\n')
-                
-            elif test_type == 'assert_output_regex':
-                # Match output with regex
-                pattern = test.get('pattern', '')
-                flags_str = test.get('flags', '')
-                
-                f.write('    output = captured_output.getvalue().strip()\n')
-                f.write(f'    pattern = {repr(pattern)}\n')
-                
-                flags_code = '0'
-                if 'IGNORECASE' in flags_str or 'I' in flags_str:
-                    flags_code = 're.IGNORECASE'
-                
-                f.write(f'    passed = bool(re.match(pattern, output, {flags_code}))\n')
-                f.write('    actual = output\n')
-                f.write(f'    expected = "matches pattern: {pattern}"\n')
-                
-            elif test_type == 'assert_variable_exists':
-                # Check if variable exists
-                var_name = test.get('variable_name', '')
-                f.write(f'    passed = {repr(var_name)} in dir()\n')
-                f.write(f'    expected = "Variable {var_name} exists"\n')
-                f.write(f'    actual = "Variable {var_name} " + ("exists" if passed else "not found")\n')
-                
-            elif test_type == 'assert_variable_type':
-                # Check variable type
-                var_name = test.get('variable_name', '')
-                expected_type = test.get('expected_type', 'str')
-                
-                f.write(f'    if {repr(var_name)} in dir():\n')
-                f.write(f'        actual_type = type({var_name}).__name__\n')
-                f.write(f'        passed = actual_type == {repr(expected_type)}\n')
-                f.write(f'        expected = {repr(expected_type)}\n')
-                f.write('        actual = actual_type\n')
-                f.write('    else:\n')
-                f.write('        passed = False\n')
-                f.write(f'        expected = {repr(expected_type)}\n')
-                f.write(f'        actual = "Variable {var_name} not found"\n')
-                
-            elif test_type == 'assert_variable_length':
-                # Check collection length
-                var_name = test.get('variable_name', '')
-                expected_length = test.get('expected_length', 0)
-                
-                f.write(f'    if {repr(var_name)} in dir():\n')
-                f.write(f'        actual_length = len({var_name})\n')
-                f.write(f'        passed = actual_length == {expected_length}\n')
-                f.write(f'        expected = {expected_length}\n')
-                f.write('        actual = actual_length\n')
-                f.write('    else:\n')
-                f.write('        passed = False\n')
-                f.write(f'        expected = {expected_length}\n')
-                f.write(f'        actual = "Variable {var_name} not found"\n')
-                
-            elif test_type == 'assert_variable_value':
-                # Check variable value
-                var_name = test.get('variable_name', '')
-                expected_value = test.get('expected_value')
-                
-                f.write(f'    if {repr(var_name)} in dir():\n')
-                f.write(f'        actual = {var_name}\n')
-                f.write(f'        expected = {repr(expected_value)}\n')
-                f.write('        passed = actual == expected\n')
-                f.write('    else:\n')
-                f.write('        passed = False\n')
-                f.write(f'        expected = {repr(expected_value)}\n')
-                f.write(f'        actual = "Variable {var_name} not found"\n')
-                
-            elif test_type == 'assert_custom':
-                # Custom validation code
-                validation_code = test.get('code', 'True')
-                f.write(f'    passed = bool({validation_code})\n')
-                f.write('    expected = "Custom validation passed"\n')
-                f.write('    actual = "Custom validation " + ("passed" if passed else "failed")\n')
-            
+        if run['timed_out']:
+            result['status'] = 'timeout'
+            result['error'] = f'Code execution exceeded {timeout:g} second time limit'
+            return result
+        
+        # A fail-fast run is killed after its first failing test; a timed-out
+        # one returned above. Those are the only kills we send
+        returncode = None if run.get('stopped') else run.get('returncode')
+        
+        if returncode == -getattr(signal, 'SIGXCPU', -1):
+            result['status'] = 'timeout'
+            result['error'] = 'Code execution exceeded its CPU time limit'
+            return result
+        
+        if returncode == -getattr(signal, 'SIGKILL', -1):
+            # The kernel also sends SIGKILL at the hard CPU limit; before any
+            # deadline it is the OOM killer
+            cpu_ms = result.get('cpu_time_ms', 0)
+            if elapsed >= timeout or cpu_ms >= plan['cpu_seconds'] * 1000:
+                result['status'] = 'timeout'
+                result['error'] = f'Code execution exceeded {timeout:g} second time limit'
             else:
-                # Unknown test type
-                f.write('    passed = False\n')
-                f.write(f'    expected = "Unknown test type: {test_type}"\n')
-                f.write('    actual = "Error"\n')
-            
-            # Append result
-            f.write('    test_results.append({\n')
-            f.write(f'        "test_number": {i+1},\n')
-            f.write(f'        "description": {repr(description)},\n')
-            f.write('        "passed": passed,\n')
-            f.write('        "expected": expected,\n')
-            f.write('        "actual": actual,\n')
-            f.write('        "error": None\n')
-            f.write('    })\n')
-            
-            f.write('except Exception as e:\n')
-            f.write('    test_results.append({\n')
-            f.write(f'        "test_number": {i+1},\n')
-            f.write(f'        "description": {repr(description)},\n')
-            f.write('        "passed": False,\n')
-            f.write('        "expected": "Test should not raise exception",\n')
-            f.write('        "actual": None,\n')
-            f.write('        "error": str(e)\n')
-            f.write('    })\n')
+                result['status'] = 'memory_exceeded'
+                result['error'] = 'Code execution was stopped for using too much memory'
+            return result
         
-        # Output results
-        f.write('''
-# Restore stdout and print results
-sys.stdout = original_stdout
-print("__USER_OUTPUT__")
-print(captured_output.getvalue())
-print("__TEST_RESULTS__")
-print(json.dumps(test_results))
-''')
-    
-    try:
-        # Execute
-        process = subprocess.Popen(
-            ['python', temp_file],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            encoding='utf-8'
-        )
+        limit = next((frame for frame in frames if frame.get('type') == 'limit'), None)
+        if limit:
+            result['status'], result['error'] = _limit_exceeded(limit)
+            result['test_results'] = [frame['result'] for frame in frames if frame.get('type') == 'test']
+            return result
         
-        stdout, stderr = process.communicate(timeout=timeout)
+        if complete and complete.get('isolation') is not None:
+            result['isolation'] = complete['isolation']
         
-        # Parse results
-        if '__TEST_RESULTS__' in stdout:
-            parts = stdout.split('__USER_OUTPUT__')
-            if len(parts) > 1:
-                output_and_results = parts[1]
-                result_parts = output_and_results.split('__TEST_RESULTS__')
-                
-                if len(result_parts) > 1:
-                    result['output'] = result_parts[0].strip()
-                    test_results_json = result_parts[1].strip()
-                    
-                    try:
-                        test_results = json.loads(test_results_json)
-                        result['test_results'] = test_results
-                        
-                        for test in test_results:
-                            if test.get('passed', False):
-                                result['tests_passed'] += 1
-                            else:
-                                result['tests_failed'] += 1
-                        
-                        if result['tests_failed'] == 0 and result['tests_passed'] > 0:
-                            result['status'] = 'passed'
-                        else:
-                            result['status'] = 'failed'
-                    except json.JSONDecodeError as e:
-                        result['status'] = 'error'
-                        result['error'] = f'Failed to parse test results: {e}'
+        # Results arrive as frames on the result channel, never via stdout
+        if complete:
+            test_results = [frame['result'] for frame in frames if frame.get('type') == 'test']
+            result['test_results'] = test_results
+            result['tests_skipped'] = complete.get('tests_skipped', 0)
+            
+            for test in test_results:
+                if test.get('passed', False):
+                    result['tests_passed'] += 1
+                else:
+                    result['tests_failed'] += 1
+            
+            if result['tests_failed'] == 0 and result['tests_passed'] > 0:
+                result['status'] = 'passed'
+            else:
+                result['status'] = 'failed'
         else:
-            result['output'] = stdout
             result['status'] = 'error'
             result['error'] = 'No test results found'
         
-        if stderr:
-            result['error'] = stderr
+        if run['stderr']:
+            result['error'] = run['stderr']
             if result['status'] == 'passed':
                 result['status'] = 'error'
     
-    except subprocess.TimeoutExpired:
-        result['status'] = 'timeout'
-        result['error'] = f'Code execution exceeded {timeout} second time limit'
-        try:
-            process.kill()
-        except:
-            pass
-    
     except Exception as e:
         result['status'] = 'error'
         result['error'] = f'Execution error: {str(e)}'
     
+    return result
+
+
+def _limit_exceeded(limit: Dict[str, Any]) -> tuple:
+    """Get the status and message for a runner `limit` frame."""
+    if limit.get('limit') == 'memory':
+        return 'memory_exceeded', (
+            f"Memory limit exceeded: your code tried to use more than {limit['value']} MB. "
+            'Look for data structures that grow without bound.'
+        )
+    if limit.get('limit') == 'file_size':
+        return 'output_exceeded', (
+            f"Output limit exceeded: your code tried to write a file larger than {limit['value']} MB."
+        )
+    return 'steps_exceeded', (
+        f"Too much work: your code ran more than {limit['value']:,} steps. "
+        'Look for an infinite loop or a less expensive approach.'
+    )
+
+
+def _uses_fixtures(test_cases: List[Dict]) -> bool:
+    """Check if tests reference fixtures (precomputed on an ExercisePlan)."""
+    uses_fixtures = getattr(test_cases, 'uses_fixtures', None)
+    if uses_fixtures is None:
+        uses_fixtures = bool(fixture_refs(test_cases))
+    return uses_fixtures
+
+
+def _progress_relay(on_event: Callable[[Dict], None]) -> Callable[[Dict], None]:
+    """Translate raw runner events into the progress events callers see."""
+    def relay(event: Dict[str, Any]):
+        if event['event'] == 'output':
+            on_event({'event': 'output', 'stream': event['stream'], 'text': event['text']})
+            return
+        frame = event['frame']
+        if frame.get('type') == 'test_started':
+            on_event({
+                'event': 'test_started',
+                'test_number': frame['test_number'],
+                'description': frame['description']
+            })
+        elif frame.get('type') == 'test':
+            on_event({'event': 'test_result', 'result': frame['result']})
+    
+    return relay
+
+
+def _run_plan_parallel(plan: Dict[str, Any], checks: List[Dict], timeout: int,
+                       on_event: Optional[Callable[[Dict], None]] = None) -> Dict[str, Any]:
+    """
+    Run each test of a plan in its own child, concurrently.
+    
+    Every child re-executes the user code, so each test gets a fresh
+    namespace. The per-test runs are merged back into the shape of a single
+    run: results in test order, the first run's stdout (top-level output is
+    the same in all of them) and a `complete` frame only if every run
+    completed.
+    """
+    tests = plan['tests']
+    plans = [dict(plan, tests=[test], test_offset=i) for i, test in enumerate(tests)]
+    workers = get_worker_pool().size if pool_enabled() else os.cpu_count() or 2
+    
+    with ThreadPoolExecutor(max_workers=min(len(plans), workers)) as executor:
+        runs = list(executor.map(
+            lambda i: _run_plan(plans[i], checks[i:i + 1], timeout, on_event), range(len(plans))
+        ))
+    
+    test_frames = []
+    limits = []
+    completes = []
+    for run in runs:
+        test_frames.extend(frame for frame in run['frames'] if frame.get('type') == 'test')
+        limits.extend(frame for frame in run['frames'] if frame.get('type') == 'limit')
+        completes.extend(frame for frame in run['frames'] if frame.get('type') == 'complete')
+    test_frames.sort(key=lambda frame: frame['result']['test_number'])
+    
+    frames = test_frames + limits[:1]
+    if len(completes) == len(runs):
+        frames.append({
+            'type': 'complete',
+            'output_truncated': any(frame.get('output_truncated') for frame in completes),
+            'tests_skipped': 0,
+            'isolation': completes[0].get('isolation')
+        })
+    
+    return {
+        'stdout': runs[0]['stdout'],
+        'stderr': next((run['stderr'] for run in runs if run['stderr']), ''),
+        'stdout_truncated': runs[0]['stdout_truncated'],
+        'frames': frames,
+        'returncode': next((run['returncode'] for run in runs if run['returncode']), 0),
+        'timed_out': any(run['timed_out'] for run in runs),
+        'stopped': any(run.get('stopped') for run in runs),
+        'resources': _merge_resources([run.get('resources') for run in runs])
+    }
+
+
+def _merge_resources(usages: List[Optional[Dict[str, int]]]) -> Optional[Dict[str, int]]:
+    """Total the CPU time and take the peak memory of several runs."""
+    usages = [usage for usage in usages if usage]
+    if not usages:
+        return None
+    return {
+        'cpu_user_ms': sum(usage['cpu_user_ms'] for usage in usages),
+        'cpu_system_ms': sum(usage['cpu_system_ms'] for usage in usages),
+        'max_rss_kb': max(usage['max_rss_kb'] for usage in usages)
+    }
+
+
+def _run_plan(plan: Dict[str, Any], checks: List[Dict], timeout: int,
+              on_event: Optional[Callable[[Dict], None]] = None) -> Dict[str, Any]:
+    """
+    Run a test plan through the static runner, preferring a warm forked worker.
+    
+    The runner reports an observation per probe in `plan['tests']`; the fork
+    server, or this process on the fallback path, grades them against
+    `checks` (see grading.py).
+    
+    Falls back to a fresh interpreter running runner.py (plan on stdin) when
+    fork is unavailable (Windows) or the pool is disabled with
+    PYTHON_EXECUTOR_POOL=0, and when a worker fails before it received the
+    plan. A worker that fails later may already have run the code (and
+    streamed its events), so the WorkerError is raised instead of running it
+    twice; so is PoolBusy, since a saturated pool needs no extra processes.
+    Raw result frames and output chunks are passed to `on_event` as
+    they arrive on either path.
+    """
+    if pool_enabled():
+        try:
+            return get_worker_pool(preloaded=bool(plan.get('preload'))).run(plan, timeout, on_event, checks)
+        except WorkerError as e:
+            if e.started or isinstance(e, PoolBusy):
+                raise
+    
+    result_r, result_w = os.pipe()
+    try:
+        if os.name == 'nt':
+            # No pass_fds on Windows: the child inherits the pipe's handle
+            import msvcrt
+            handle = msvcrt.get_osfhandle(result_w)
+            os.set_handle_inheritable(handle, True)
+            channel_args = ['--result-handle', str(handle)]
+            options = {'startupinfo': subprocess.STARTUPINFO(lpAttributeList={'handle_list': [handle]})}
+        else:
+            channel_args = ['--result-fd', str(result_w)]
+            # Own process group, so a timeout kills what the code spawns too
+            options = {'pass_fds': (result_w,), 'start_new_session': True}
+        process = subprocess.Popen(
+            [sys.executable, RUNNER_SCRIPT] + channel_args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=dict(os.environ, PYTHONIOENCODING='utf-8'),
+            **options
+        )
     finally:
+        os.close(result_w)
+    
+    try:
         try:
-            os.unlink(temp_file)
-        except:
+            process.stdin.write(json.dumps(plan).encode('utf-8'))
+            process.stdin.close()
+        except BrokenPipeError:
             pass
+        
+        callbacks = {}
+        if on_event:
+            callbacks = {
+                'on_frame': lambda frame: on_event({'event': 'frame', 'frame': frame}),
+                'on_output': lambda stream, text: on_event({'event': 'output', 'stream': stream, 'text': text})
+            }
+        fixtures = get_store(plan['fixture_dir']) if plan.get('fixture_dir') else None
+        grader = Grader(checks, plan.get('test_offset', 0), plan.get('fail_fast', False), fixtures)
+        run = collect_child(
+            process.stdout.fileno(), process.stderr.fileno(), result_r, timeout,
+            output_limit=plan['output_limit'],
+            nonce=plan.get('nonce'),
+            grader=grader,
+            **callbacks
+        )
+        if run['timed_out'] or run['stopped']:
+            kill_process_group(process.pid)
+        run['resources'] = None
+        if hasattr(os, 'wait4'):
+            # Reap the child ourselves to get its rusage (includes the
+            # interpreter's own startup on this cold path)
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            run['resources'] = rusage_to_resources(usage)
+            # ru_maxrss survives exec, so it would report our own peak;
+            # prefer the runner's measurement of its fresh process image
+            complete = next((frame for frame in run['frames'] if frame.get('type') == 'complete'), None)
+            if complete and complete.get('max_rss_kb'):
+                run['resources']['max_rss_kb'] = complete['max_rss_kb']
+        run['returncode'] = process.wait()
+        # Stragglers the child left running in the background
+        kill_process_group(process.pid)
+    finally:
+        os.close(result_r)
+        process.stdout.close()
+        process.stderr.close()
     
-    return result
+    return run
@@ -0,0 +1,252 @@
+"""
+Fixture blobs for exercises with large test inputs or expected values.
+
+Instead of inlining thousands of records in `Exercise.test_cases`, a test
+value can be a reference to a fixture stored once on disk:
+
+    {"function_name": "dedupe", "input": [{"$fixture": "<id>"}],
+     "expected": {"$fixture": "<id>"}}
+
+A fixture file is a short header followed by the value in marshal format;
+its id is the SHA-256 of the value's repr (marshal output depends on how
+objects are shared, repr only on the data), so identical data is stored
+once and a reference can never point at changed content (result cache keys
+stay valid). The runner memory-maps fixtures read-only and decodes a fresh copy
+for every reference, so a submission that mutates its input cannot affect
+another test. Fork servers map the fixtures of a plan before forking, so the
+children share the mapping instead of opening and reading the files.
+
+Exercises' large values are moved to fixtures when the exercise is saved
+(see plan_cache.store_exercise_fixtures), and submissions are graded on
+other hosts (Celery workers, other web servers), so PYTHON_FIXTURE_DIR must
+be storage shared by all of them (e.g. an NFS mount). The default,
+instance/python_fixtures, is only good enough for a single host.
+
+Standard library only: this module runs inside the runner child.
+
+    python -m app.python_practice.fixtures store data.json   # prints the reference
+"""
+
+import hashlib
+import json
+import marshal
+import mmap
+import os
+import re
+import tempfile
+from typing import Any, Dict, Iterable, Optional, Set
+
+FIXTURE_KEY = '$fixture'
+FIXTURE_SUFFIX = '.pyfx'
+
+# 4-byte magic, format version, marshal version, 2 reserved bytes
+FIXTURE_MAGIC = b'PYFX'
+FORMAT_VERSION = 1
+HEADER = FIXTURE_MAGIC + bytes([FORMAT_VERSION, marshal.version, 0, 0])
+
+FIXTURE_ID = re.compile(r'^[0-9a-f]{64}$')
+
+# Test fields whose values are moved to fixtures when they are large
+EXTERNALIZABLE_FIELDS = ('input', 'expected', 'expected_any_of', 'expected_value')
+
+# Value types a fixture may contain (no code objects)
+_PLAIN_TYPES = (type(None), bool, int, float, complex, str, bytes)
+_CONTAINER_TYPES = (list, tuple, set, frozenset)
+
+
+class FixtureError(Exception):
+    """Raised when a fixture is missing, corrupt or not storable."""
+
+
+def fixture_dir() -> str:
+    """Get the fixture directory (PYTHON_FIXTURE_DIR or instance/python_fixtures)."""
+    default = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'instance', 'python_fixtures')
+    return os.path.abspath(os.environ.get('PYTHON_FIXTURE_DIR') or default)
+
+
+def is_fixture_ref(value: Any) -> bool:
+    """Check if a value is a {"$fixture": "<id>"} reference."""
+    return isinstance(value, dict) and len(value) == 1 and FIXTURE_KEY in value
+
+
+def fixture_refs(value: Any) -> Set[str]:
+    """Collect the fixture ids referenced anywhere in a value."""
+    found = set()
+    pending = [value]
+    while pending:
+        item = pending.pop()
+        if is_fixture_ref(item):
+            found.add(item[FIXTURE_KEY])
+        elif isinstance(item, dict):
+            pending.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            pending.extend(item)
+    return found
+
+
+def _check_storable(value: Any):
+    """Reject values marshal could store but a fixture must not contain."""
+    pending = [value]
+    while pending:
+        item = pending.pop()
+        if isinstance(item, dict):
+            pending.extend(item.keys())
+            pending.extend(item.values())
+        elif isinstance(item, _CONTAINER_TYPES):
+            pending.extend(item)
+        elif not isinstance(item, _PLAIN_TYPES):
+            raise FixtureError(f'Fixtures cannot contain {type(item).__name__} values')
+
+
+def store_fixture(value: Any, directory: Optional[str] = None) -> str:
+    """
+    Store a value as a fixture (a no-op if the same data is already stored).
+
+    Args:
+        value: Test data (lists, dicts, strings, numbers, ...)
+        directory: Fixture directory (default: fixture_dir())
+
+    Returns:
+        Fixture id
+    """
+    _check_storable(value)
+    fixture_id = hashlib.sha256(repr(value).encode('utf-8')).hexdigest()
+    directory = directory or fixture_dir()
+    path = os.path.join(directory, fixture_id + FIXTURE_SUFFIX)
+
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(HEADER + marshal.dumps(value))
+            os.chmod(tmp_path, 0o444)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+    return fixture_id
+
+
+def externalize(test: Dict[str, Any], inline_limit: int, directory: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Move large values of a test case into fixtures.
+
+    Args:
+        test: Test case dictionary
+        inline_limit: Values whose JSON is longer than this many characters
+                      are replaced by fixture references
+        directory: Fixture directory (default: fixture_dir())
+
+    Returns:
+        The test case (a new dictionary if anything was moved)
+    """
+    moved = {}
+    for field in EXTERNALIZABLE_FIELDS:
+        value = test.get(field)
+        if value is None or is_fixture_ref(value) or not isinstance(value, (list, dict, str)):
+            continue
+        if len(json.dumps(value, separators=(',', ':'), default=str)) <= inline_limit:
+            continue
+        if field == 'input' and isinstance(value, list):
+            # Keep the argument list so each argument stays a separate value
+            moved[field] = [
+                {FIXTURE_KEY: store_fixture(arg, directory)} if isinstance(arg, (list, dict, str)) else arg
+                for arg in value
+            ]
+        else:
+            moved[field] = {FIXTURE_KEY: store_fixture(value, directory)}
+    return dict(test, **moved) if moved else test
+
+
+class FixtureStore:
+    """Read-only memory-mapped fixtures of one directory."""
+
+    def __init__(self, directory: str):
+        """
+        Initialize store.
+
+        Args:
+            directory: Fixture directory
+        """
+        self.directory = directory
+        self._maps = {}
+
+    def map(self, fixture_id: str) -> mmap.mmap:
+        """Map a fixture file read-only (once per process)."""
+        mapped = self._maps.get(fixture_id)
+        if mapped is not None:
+            return mapped
+        if not isinstance(fixture_id, str) or not FIXTURE_ID.match(fixture_id):
+            raise FixtureError(f'Invalid fixture id: {fixture_id!r}')
+        path = os.path.join(self.directory, fixture_id + FIXTURE_SUFFIX)
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            raise FixtureError(f'Fixture not found: {fixture_id}')
+        try:
+            mapped = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+        if mapped[:len(FIXTURE_MAGIC)] != FIXTURE_MAGIC or mapped[4] != FORMAT_VERSION or mapped[5] != marshal.version:
+            mapped.close()
+            raise FixtureError(f'Unsupported fixture format: {fixture_id}')
+        self._maps[fixture_id] = mapped
+        return mapped
+
+    def load(self, fixture_id: str) -> Any:
+        """Decode a fresh copy of a fixture straight from its mapping."""
+        return marshal.loads(memoryview(self.map(fixture_id))[len(HEADER):])
+
+    def preload(self, tests: Iterable[Dict]):
+        """Map every fixture referenced by a list of tests."""
+        for fixture_id in fixture_refs(list(tests or [])):
+            self.map(fixture_id)
+
+    def resolve(self, value: Any) -> Any:
+        """Replace fixture references in a value by their data."""
+        if is_fixture_ref(value):
+            return self.load(value[FIXTURE_KEY])
+        if isinstance(value, dict):
+            return {key: self.resolve(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.resolve(item) for item in value]
+        return value
+
+    def close(self):
+        """Unmap every fixture of this store."""
+        for mapped in self._maps.values():
+            mapped.close()
+        self._maps.clear()
+
+
+_stores = {}
+
+
+def get_store(directory: str) -> FixtureStore:
+    """Get the process-wide store of a directory (its mappings are reused)."""
+    store = _stores.get(directory)
+    if store is None:
+        store = _stores[directory] = FixtureStore(directory)
+    return store
+
+
+def main():
+    """Command-line interface: store a JSON file as a fixture."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Manage Python exercise fixtures')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    store_parser = subparsers.add_parser('store', help='Store a JSON file and print its reference')
+    store_parser.add_argument('json_file')
+    store_parser.add_argument('--dir', help='Fixture directory (default: PYTHON_FIXTURE_DIR)')
+
+    args = parser.parse_args()
+    with open(args.json_file, encoding='utf-8') as f:
+        value = json.load(f)
+    print(json.dumps({FIXTURE_KEY: store_fixture(value, args.dir)}))
+
+
+if __name__ == '__main__':
+    main()
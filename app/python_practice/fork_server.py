@@ -0,0 +1,245 @@
+"""
+Fork server for warm Python code execution.
+
+This script is started (never imported) by app.python_practice.worker_pool.
+It pays interpreter startup and imports the static test runner once, then
+forks a fresh child for every test plan it receives, so each submission starts
+from an already-initialised interpreter instead of a cold `python` process.
+
+Protocol on this process' stdin/stdout, length-prefixed JSON frames (see
+channel.py):
+    request:  {"plan": {"code": "...", "tests": [...]}, "timeout": 30}
+    checks:   {"checks": [...]}
+    response: {"stdout": "...", "stderr": "...", "stdout_truncated": false,
+               "frames": [...], "returncode": 0, "timed_out": false,
+               "resources": {"cpu_user_ms": 0, "cpu_system_ms": 0, "max_rss_kb": 0}}
+
+The plan's tests are the runner's probes; the checks (the full tests, with
+the expected values) follow in their own frame, which the server reads only
+after forking the child, so no child ever has them in memory. The server
+grades the child's observations with them (see grading.py).
+
+A request with "stream": true is additionally answered, before its response,
+with one event frame per result frame or output chunk as the child produces
+them: {"event": "frame", "frame": {...}} or
+{"event": "output", "stream": "stdout", "text": "..."}.
+
+Started with `--preload numpy,pandas`, the server imports those modules
+before serving, so every child starts with them already imported.
+"""
+
+import importlib
+import os
+import signal
+import sys
+import traceback
+
+import channel
+import fixtures
+import grading
+import runner
+
+# The child's result channel is always this descriptor
+RESULT_FD = 3
+
+
+def _run_in_child(plan: dict, out_w: int, err_w: int, result_w: int):
+    """Body of the forked child: run the plan and never return."""
+    exit_code = 0
+    try:
+        # Lead a new process group, so a timeout kills what we spawn too
+        os.setpgid(0, 0)
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(out_w, 1)
+        os.dup2(err_w, 2)
+        os.dup2(result_w, RESULT_FD)
+        os.closerange(RESULT_FD + 1, os.sysconf('SC_OPEN_MAX') if hasattr(os, 'sysconf') else 1024)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+        sys.argv = [runner.SUBMISSION_FILENAME]
+        try:
+            exit_code = runner.run_plan(plan, RESULT_FD)
+        except SystemExit as e:
+            if e.code is None:
+                exit_code = 0
+            elif isinstance(e.code, int):
+                exit_code = e.code
+            else:
+                print(e.code, file=sys.stderr)
+                exit_code = 1
+        except BaseException:
+            traceback.print_exc()
+            exit_code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except Exception:
+            exit_code = exit_code or 1
+        os._exit(exit_code)
+
+
+class PendingChecks:
+    """The checks frame that follows a request, read once the child is forked."""
+
+    def __init__(self, fd: int):
+        self.fd = fd
+        self.checks = None
+
+    def read(self) -> list:
+        """Read the checks (once; later calls return them again)."""
+        if self.checks is None:
+            self.checks = channel.read_frame(self.fd).get('checks') or []
+        return self.checks
+
+
+def run_program(plan: dict, timeout: float, checks: PendingChecks, events_fd: int = None) -> dict:
+    """
+    Fork a child to run a test plan, collect its output and grade its results.
+
+    When `events_fd` is given, graded result frames and output chunks are
+    relayed to it as event frames while the child runs.
+    """
+    if plan.get('fixture_dir'):
+        # Map fixtures here once; every child inherits the mappings
+        try:
+            fixtures.get_store(plan['fixture_dir']).preload(plan.get('tests'))
+        except fixtures.FixtureError:
+            pass
+
+    out_r, out_w = os.pipe()
+    err_r, err_w = os.pipe()
+    result_r, result_w = os.pipe()
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+        os.close(out_r)
+        os.close(err_r)
+        os.close(result_r)
+        _run_in_child(plan, out_w, err_w, result_w)
+
+    os.close(out_w)
+    os.close(err_w)
+    os.close(result_w)
+    try:
+        # Also set here, so the group exists even before the child runs
+        os.setpgid(pid, pid)
+    except OSError:
+        pass
+
+    store = None
+    response = None
+    try:
+        # A store of its own, closed after the run: the expected fixtures are
+        # never mapped in this process while a later child is forked
+        store = fixtures.FixtureStore(plan['fixture_dir']) if plan.get('fixture_dir') else None
+        grader = grading.Grader(checks.read(), plan.get('test_offset', 0), plan.get('fail_fast', False), store)
+        callbacks = {}
+        if events_fd is not None:
+            callbacks = {
+                'on_frame': lambda frame: channel.write_frame(events_fd, {'event': 'frame', 'frame': frame}),
+                'on_output': lambda stream, text: channel.write_frame(
+                    events_fd, {'event': 'output', 'stream': stream, 'text': text}
+                )
+            }
+        response = channel.collect_child(
+            out_r, err_r, result_r, timeout,
+            output_limit=plan.get('output_limit') or channel.MAX_OUTPUT_LENGTH,
+            nonce=plan.get('nonce'),
+            grader=grader,
+            **callbacks
+        )
+        if response['timed_out'] or response['stopped']:
+            channel.kill_process_group(pid)
+    finally:
+        if response is None:
+            # Failed before collecting: do not wait for the child's timeout
+            channel.kill_process_group(pid)
+        if store is not None:
+            store.close()
+        os.close(out_r)
+        os.close(err_r)
+        os.close(result_r)
+        _, status, usage = os.wait4(pid, 0)
+        # Stragglers the child left running in the background
+        channel.kill_process_group(pid)
+
+    response['returncode'] = os.waitstatus_to_exitcode(status)
+    response['resources'] = channel.rusage_to_resources(usage)
+    return response
+
+
+def preload(modules: str):
+    """Import a comma-separated list of modules so children inherit them."""
+    for name in filter(None, modules.split(',')):
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass  # not installed; the child's own import reports it
+
+
+def serve(request: dict, requests: int, responses: int) -> bool:
+    """
+    Run one request and write its response.
+
+    The checks and the graded results are local to this call, so they are
+    gone before the next child is forked.
+
+    Returns:
+        False if the parent closed the pipe
+    """
+    checks = PendingChecks(requests)
+    try:
+        response = run_program(
+            request['plan'],
+            float(request.get('timeout', 30)),
+            checks,
+            events_fd=responses if request.get('stream') else None
+        )
+    except EOFError:
+        return False
+    except Exception as e:
+        response = {
+            'stdout': '',
+            'stderr': f'Fork server error: {e}',
+            'stdout_truncated': False,
+            'frames': [],
+            'returncode': -1,
+            'timed_out': False,
+            'resources': None
+        }
+    try:
+        # A run that failed before forking still consumes its checks
+        checks.read()
+    except EOFError:
+        return False
+    channel.write_frame(responses, response)
+    return True
+
+
+def main():
+    """Serve test plans from stdin until the parent closes the pipe."""
+    # The parent owns our lifetime; a Ctrl+C in the terminal must not kill
+    # the server in the middle of a request.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    runner.isolate_import_path()
+    if len(sys.argv) > 2 and sys.argv[1] == '--preload':
+        preload(sys.argv[2])
+
+    requests = sys.stdin.fileno()
+    responses = sys.stdout.fileno()
+
+    while True:
+        try:
+            request = channel.read_frame(requests)
+        except EOFError:
+            break
+        if not serve(request, requests, responses):
+            break
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,358 @@
+"""
+Grading of test observations outside the submission's process.
+
+The user code runs in the runner's process and can reach everything in it,
+so the runner is not trusted with the answers. It receives each test as a
+probe (see split_tests): what it needs to exercise the code, such as the
+function name and inputs or the variable name. The expected values, the
+checks, stay with the process that reads the result channel: the executor
+on the fresh-interpreter path, or the fork server on the warm path, which
+receives them only after forking the child. The runner reports what it
+observed and a Grader turns each observation into the test result. Code that
+tampers with the runner can report any observation it likes, but it cannot
+learn which one is right.
+
+Return values and variable values are compared by value_digest(), a SHA-256
+of a canonical form that is equal exactly when `==` is for test data (None,
+numbers, str, bytes, list, tuple, set, frozenset, dict). Numbers compare by
+exact value (True == 1 == 1.0), sets and dicts ignore order, and NumPy values
+compare as their tolist(). Any other value (other objects, NaN, recursive
+containers) has no digest and never equals an expected value, so a custom
+__eq__ cannot claim a match.
+
+`assert_custom` tests evaluate instructor code against the submission's
+namespace, so they run in the child and its verdict is used as reported.
+
+Standard library only: this module is shared by the web/Celery process, the
+fork servers and the runner child.
+"""
+
+import hashlib
+import json
+import numbers
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from app.python_practice.fixtures import FixtureError, fixture_refs
+except ImportError:
+    # Inside a fork server or the runner script: siblings are top-level
+    from fixtures import FixtureError, fixture_refs
+
+# Test fields the runner needs; everything else (expected values, patterns,
+# comparison options) stays with the grader
+PROBE_FIELDS = ('type', 'description', 'function_name', 'input', 'variable_name', 'code')
+
+# Fixture-backed values are reported in test results as a repr this long
+FIXTURE_SUMMARY_LENGTH = 200
+
+
+def split_tests(tests: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Split test cases into runner probes and grader checks.
+
+    Args:
+        tests: Normalized test case dictionaries
+
+    Returns:
+        (probes, checks); a probe is marked `summarize` when its test uses
+        fixtures, so the runner reports a short repr of the value it observed
+    """
+    probes = []
+    checks = []
+    for test in tests:
+        probe = {field: test[field] for field in PROBE_FIELDS if field in test}
+        if fixture_refs(test):
+            probe['summarize'] = True
+        probes.append(probe)
+        checks.append(test)
+    return probes, checks
+
+
+def summarize_value(value: Any) -> Any:
+    """Shorten a (possibly huge) fixture-backed value for a test result."""
+    text = repr(value)
+    if len(text) <= FIXTURE_SUMMARY_LENGTH:
+        return value
+    size = f' ({len(value)} items)' if hasattr(value, '__len__') else ''
+    return text[:FIXTURE_SUMMARY_LENGTH] + '...' + size
+
+
+class Incomparable(Exception):
+    """A value that has no canonical form."""
+
+
+def _canonical_number(value) -> list:
+    """Canonical form of a number: its exact value."""
+    if not isinstance(value, numbers.Real) and isinstance(value, numbers.Complex):
+        if value.imag != 0:
+            return ['c', [_canonical_number(value.real), _canonical_number(value.imag)]]
+        value = value.real
+    if isinstance(value, numbers.Integral):
+        return ['i', int.__int__(value) if isinstance(value, int) else int(value)]
+    try:
+        if isinstance(value, float):
+            numerator, denominator = float.as_integer_ratio(value)
+        else:
+            numerator, denominator = value.as_integer_ratio()
+    except OverflowError:
+        return ['f', repr(float(value))]
+    except ValueError:
+        # nan is not equal to anything, itself included
+        raise Incomparable('nan')
+    return ['i', numerator] if denominator == 1 else ['q', [numerator, denominator]]
+
+
+def _sort_key(item) -> str:
+    return json.dumps(item, separators=(',', ':'))
+
+
+def canonical(value: Any, _active: Optional[set] = None) -> list:
+    """
+    Get the canonical, JSON-serializable form of a test value.
+
+    The base types' own methods are used to read a value, so a subclass that
+    overrides iteration or conversion is read for the data it holds.
+
+    Raises:
+        Incomparable: If the value has no canonical form
+    """
+    if _active is None:
+        _active = set()
+    if value is None:
+        return ['n']
+    if isinstance(value, numbers.Number):
+        return _canonical_number(value)
+    if isinstance(value, str):
+        return ['s', str.__str__(value)]
+    if isinstance(value, bytes):
+        return ['b', bytes.hex(value)]
+    if isinstance(value, bytearray):
+        return ['b', bytearray.hex(value)]
+
+    if id(value) in _active:
+        raise Incomparable('recursive value')
+    _active.add(id(value))
+    try:
+        if isinstance(value, list):
+            return ['l', [canonical(item, _active) for item in list.__iter__(value)]]
+        if isinstance(value, tuple):
+            return ['t', [canonical(item, _active) for item in tuple.__iter__(value)]]
+        if isinstance(value, (set, frozenset)):
+            items = set.__iter__(value) if isinstance(value, set) else frozenset.__iter__(value)
+            return ['S', sorted((canonical(item, _active) for item in items), key=_sort_key)]
+        if isinstance(value, dict):
+            pairs = [[canonical(key, _active), canonical(item, _active)] for key, item in dict.items(value)]
+            return ['d', sorted(pairs, key=_sort_key)]
+        if callable(getattr(type(value), 'tolist', None)) and type(value).__module__.startswith('numpy'):
+            return canonical(value.tolist(), _active)
+    finally:
+        _active.discard(id(value))
+    raise Incomparable(type(value).__qualname__)
+
+
+def value_digest(value: Any) -> Optional[str]:
+    """Hash a test value so that equal digests mean equal values (None if it has no digest)."""
+    try:
+        form = canonical(value)
+    except Exception:
+        # Incomparable, or a number or array type that failed to convert
+        return None
+    return hashlib.sha256(_sort_key(form).encode('ascii')).hexdigest()
+
+
+def _matches(digest: Optional[str], expected: Any) -> bool:
+    """Check an observed digest against an expected value."""
+    return digest is not None and digest == value_digest(expected)
+
+
+def _resolve(check: Dict, fixtures) -> Dict:
+    """Replace the fixture references in a check by their data."""
+    if fixtures is None or not fixture_refs(check):
+        return check
+    return fixtures.resolve(check)
+
+
+def grade_test(index: int, check: Dict, observation: Dict, fixtures=None) -> Dict[str, Any]:
+    """
+    Turn the runner's observation of one test into its result.
+
+    Args:
+        index: Zero-based test position
+        check: The full test case dictionary
+        observation: What the runner reported for the test
+        fixtures: FixtureStore that resolves {"$fixture": id} references
+
+    Returns:
+        Test result dictionary
+    """
+    test_type = check.get('type', 'assert_function')
+    description = check.get('description', f'Test {index + 1}')
+    result = {
+        'test_number': index + 1,
+        'description': description,
+        'passed': False,
+        'expected': 'Test should not raise exception',
+        'actual': None,
+        'error': observation.get('error')
+    }
+    if 'duration_ms' in observation:
+        result['duration_ms'] = observation['duration_ms']
+    if result['error'] is not None:
+        return result
+
+    uses_fixtures = bool(fixture_refs(check))
+    try:
+        test = _resolve(check, fixtures)
+    except FixtureError as e:
+        result['error'] = str(e)
+        return result
+    actual = observation.get('value')
+
+    if test_type == 'assert_function':
+        expected_any_of = test.get('expected_any_of', [])
+        if expected_any_of:
+            expected = expected_any_of
+            passed = any(_matches(observation.get('digest'), option) for option in expected_any_of)
+        else:
+            expected = test.get('expected')
+            passed = _matches(observation.get('digest'), expected)
+
+    elif test_type in ('assert_output', 'assert_output_contains', 'assert_output_regex'):
+        output = observation.get('output')
+        if not isinstance(output, str):
+            output = ''
+        expected = test.get('expected', '')
+        if test_type == 'assert_output':
+            if test.get('strip_whitespace', True):
+                output = output.strip()
+                expected = expected.strip()
+            if not test.get('case_sensitive', True):
+                passed = output.lower() == expected.lower()
+            else:
+                passed = output == expected
+        elif test_type == 'assert_output_contains':
+            if not test.get('case_sensitive', True):
+                passed = expected.lower() in output.lower()
+            else:
+                passed = expected in output
+        else:
+            output = output.strip()
+            pattern = test.get('pattern', '')
+            flags_str = test.get('flags', '')
+            flags = re.IGNORECASE if 'IGNORECASE' in flags_str or 'I' in flags_str else 0
+            passed = bool(re.match(pattern, output, flags))
+            expected = f'matches pattern: {pattern}'
+        actual = output
+
+    elif test_type == 'assert_variable_exists':
+        var_name = test.get('variable_name', '')
+        passed = bool(observation.get('exists'))
+        expected = f'Variable {var_name} exists'
+        actual = f'Variable {var_name} ' + ('exists' if passed else 'not found')
+
+    elif test_type in ('assert_variable_type', 'assert_variable_length', 'assert_variable_value'):
+        var_name = test.get('variable_name', '')
+        if test_type == 'assert_variable_type':
+            expected = test.get('expected_type', 'str')
+            actual = observation.get('type_name')
+            passed = actual == expected
+        elif test_type == 'assert_variable_length':
+            expected = test.get('expected_length', 0)
+            actual = observation.get('length')
+            passed = actual == expected
+        else:
+            expected = test.get('expected_value')
+            passed = _matches(observation.get('digest'), expected)
+        if not observation.get('exists'):
+            passed = False
+            actual = f'Variable {var_name} not found'
+
+    elif test_type == 'assert_custom':
+        passed = bool(observation.get('passed'))
+        expected = 'Custom validation passed'
+        actual = 'Custom validation ' + ('passed' if passed else 'failed')
+
+    else:
+        passed = False
+        expected = f'Unknown test type: {test_type}'
+        actual = 'Error'
+
+    if uses_fixtures:
+        expected = summarize_value(expected)
+
+    result.update(passed=bool(passed), expected=expected, actual=actual)
+    return result
+
+
+class Grader:
+    """
+    Grades the frames of one run as the reading process receives them.
+
+    Test frames are matched to checks by arrival order, whatever test number
+    the runner claims. In fail-fast mode the grader stops at the first failing
+    test; the caller then stops the child and adds stopped_frames().
+    """
+
+    def __init__(self, checks: List[Dict], offset: int = 0, fail_fast: bool = False, fixtures=None):
+        """
+        Initialize grader.
+
+        Args:
+            checks: Full test cases of the run, in order
+            offset: Index of the first test in the exercise (parallel mode)
+            fail_fast: Stop at the first failing test
+            fixtures: FixtureStore that resolves fixture references in checks
+        """
+        self.checks = checks
+        self.offset = offset
+        self.fail_fast = fail_fast
+        self.fixtures = fixtures
+        self.graded = 0
+        self.stopped = False
+        self.isolation = None
+
+    def grade(self, frame: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Grade one frame from the runner.
+
+        Returns:
+            The frames to pass on (test observations become test results)
+        """
+        if self.stopped:
+            return []
+        kind = frame.get('type')
+        if kind == 'started':
+            self.isolation = frame.get('isolation')
+            return []
+        if kind == 'test':
+            if self.graded >= len(self.checks):
+                return []
+            index = self.graded
+            self.graded += 1
+            observation = frame.get('observation')
+            result = grade_test(self.offset + index, self.checks[index],
+                                observation if isinstance(observation, dict) else {}, self.fixtures)
+            if self.fail_fast and not result['passed']:
+                self.stopped = True
+            return [{'type': 'test', 'result': result}]
+        if kind == 'complete':
+            # Tests the runner finished without reporting count as failed
+            frames = [
+                {'type': 'test', 'result': grade_test(
+                    self.offset + index, self.checks[index], {'error': 'No result was reported for this test'}
+                )}
+                for index in range(self.graded, len(self.checks))
+            ]
+            self.graded = len(self.checks)
+            return frames + [dict(frame, tests_skipped=0)]
+        return [frame]
+
+    def stopped_frames(self) -> List[Dict[str, Any]]:
+        """Get the `complete` frame of a run stopped at its first failure."""
+        return [{
+            'type': 'complete',
+            'output_truncated': False,
+            'tests_skipped': len(self.checks) - self.graded,
+            'isolation': self.isolation
+        }]
@@ -0,0 +1,291 @@
+"""
+Process isolation for the "isolated" execution backend.
+
+Applied by the runner to its own process right before the user code runs, so
+it costs a few system calls instead of a container start:
+
+- namespaces (unshare): no network, private mounts, IPC and hostname
+- a fresh size-limited tmpfs mounted over /tmp as the working directory
+- resource limits (setrlimit): CPU seconds, address space, file size,
+  open files, processes, no core dumps
+- a seccomp filter that makes a short list of system calls (sockets,
+  ptrace, mount, namespace and kernel-module calls) fail with EPERM
+
+Every step is best effort: what could be applied is reported back so the
+caller can see how isolated a run actually was (namespaces need unprivileged
+user namespaces or root; seccomp needs x86_64 or aarch64 Linux).
+
+Standard library only: this module runs inside the runner child.
+"""
+
+import ctypes
+import errno
+import os
+import platform
+import shutil
+import struct
+import sys
+import tempfile
+from typing import Any, Dict, Optional
+
+try:
+    import resource
+except ImportError:
+    # No rlimits on Windows; the wall-clock timeout still applies
+    resource = None
+
+CLONE_NEWNS = 0x00020000
+CLONE_NEWUTS = 0x04000000
+CLONE_NEWIPC = 0x08000000
+CLONE_NEWUSER = 0x10000000
+CLONE_NEWNET = 0x40000000
+
+MS_REC = 0x4000
+MS_PRIVATE = 1 << 18
+MS_NOSUID = 0x2
+MS_NODEV = 0x4
+
+PR_SET_NO_NEW_PRIVS = 38
+PR_SET_SECCOMP = 22
+SECCOMP_MODE_FILTER = 2
+SECCOMP_RET_KILL_PROCESS = 0x80000000
+SECCOMP_RET_ERRNO = 0x00050000
+SECCOMP_RET_ALLOW = 0x7fff0000
+
+# Classic BPF opcodes used by the filter
+BPF_LD_W_ABS = 0x20
+BPF_JEQ_K = 0x15
+BPF_JGE_K = 0x35
+BPF_RET_K = 0x06
+
+X32_SYSCALL_BIT = 0x40000000
+
+DEFAULT_LIMITS = {
+    'cpu_seconds': 10,
+    'memory_mb': 256,
+    'file_size_mb': 8,
+    'open_files': 64,
+    'processes': 64,
+    'tmpfs_mb': 16
+}
+
+# (audit arch, {syscall name: number}) per machine
+SECCOMP_ARCHES = {
+    'x86_64': (0xC000003E, {
+        'socket': 41, 'connect': 42, 'accept': 43, 'bind': 49, 'listen': 50,
+        'accept4': 288, 'ptrace': 101, 'mount': 165, 'umount2': 166,
+        'unshare': 272, 'setns': 308, 'chroot': 161, 'pivot_root': 155,
+        'reboot': 169, 'swapon': 167, 'kexec_load': 246, 'init_module': 175,
+        'finit_module': 313, 'delete_module': 176, 'keyctl': 250, 'bpf': 321,
+        'perf_event_open': 298, 'process_vm_readv': 310, 'process_vm_writev': 311
+    }),
+    'aarch64': (0xC00000B7, {
+        'socket': 198, 'connect': 203, 'accept': 202, 'bind': 200, 'listen': 201,
+        'accept4': 242, 'ptrace': 117, 'mount': 40, 'umount2': 39,
+        'unshare': 97, 'setns': 268, 'chroot': 51, 'pivot_root': 41,
+        'reboot': 142, 'swapon': 224, 'kexec_load': 104, 'init_module': 105,
+        'finit_module': 273, 'delete_module': 106, 'keyctl': 219, 'bpf': 280,
+        'perf_event_open': 241, 'process_vm_readv': 270, 'process_vm_writev': 271
+    })
+}
+
+
+class _SockFilter(ctypes.Structure):
+    _fields_ = [('code', ctypes.c_ushort), ('jt', ctypes.c_ubyte), ('jf', ctypes.c_ubyte), ('k', ctypes.c_uint)]
+
+
+class _SockFprog(ctypes.Structure):
+    _fields_ = [('len', ctypes.c_ushort), ('filter', ctypes.POINTER(_SockFilter))]
+
+
+def _libc():
+    """Load the C library, or None off Linux."""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        return ctypes.CDLL(None, use_errno=True)
+    except OSError:
+        return None
+
+
+def _write(path: str, text: str):
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def enter_namespaces(libc) -> bool:
+    """
+    Move this (single-threaded) process into new namespaces.
+
+    Returns:
+        True if network, mount, IPC and UTS namespaces were created
+    """
+    flags = CLONE_NEWNS | CLONE_NEWNET | CLONE_NEWIPC | CLONE_NEWUTS
+    uid, gid = os.getuid(), os.getgid()
+
+    if libc.unshare(flags | CLONE_NEWUSER) == 0:
+        # Keep our own ids inside the user namespace
+        try:
+            _write('/proc/self/setgroups', 'deny')
+            _write('/proc/self/uid_map', f'{uid} {uid} 1')
+            _write('/proc/self/gid_map', f'{gid} {gid} 1')
+        except OSError:
+            pass
+        return True
+
+    # Root without user namespaces (e.g. some containers) can still unshare
+    return os.geteuid() == 0 and libc.unshare(flags) == 0
+
+
+def mount_private_tmp(libc, size_mb: int) -> bool:
+    """Mount a fresh tmpfs over /tmp, visible only to this process."""
+    if libc.mount(b'none', b'/', None, MS_REC | MS_PRIVATE, None) != 0:
+        return False
+    options = f'size={size_mb}m,mode=1777'.encode()
+    return libc.mount(b'tmpfs', b'/tmp', b'tmpfs', MS_NOSUID | MS_NODEV, options) == 0
+
+
+def _address_space() -> int:
+    """Current virtual memory size of this process in bytes (Linux), or 0."""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmSize:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def apply_rlimits(limits: Dict[str, int]):
+    """
+    Apply resource limits to this process.
+
+    Only the limits present are applied (cpu_seconds, memory_mb,
+    file_size_mb, open_files, processes); core dumps are always disabled.
+    `memory_mb` is address space on top of what the process already maps
+    (the interpreter and any preloaded libraries). RLIMIT_NPROC counts
+    every process of the user, not just our children.
+
+    Raises:
+        OSError: On a platform without rlimits (Windows)
+    """
+    if resource is None:
+        raise OSError('Resource limits are not supported on this platform')
+    mb = 1024 * 1024
+    settings = [(resource.RLIMIT_CORE, (0, 0))]
+    if limits.get('cpu_seconds'):
+        settings.append((resource.RLIMIT_CPU, (limits['cpu_seconds'], limits['cpu_seconds'] + 1)))
+    if limits.get('memory_mb'):
+        settings.append((resource.RLIMIT_AS, (_address_space() + limits['memory_mb'] * mb,) * 2))
+    if limits.get('file_size_mb'):
+        settings.append((resource.RLIMIT_FSIZE, (limits['file_size_mb'] * mb,) * 2))
+    if limits.get('open_files'):
+        settings.append((resource.RLIMIT_NOFILE, (limits['open_files'],) * 2))
+    if limits.get('processes') and hasattr(resource, 'RLIMIT_NPROC'):
+        settings.append((resource.RLIMIT_NPROC, (limits['processes'],) * 2))
+
+    for name, value in settings:
+        soft, hard = resource.getrlimit(name)
+        # Never raise a limit that is already lower
+        if hard != resource.RLIM_INFINITY:
+            value = (min(value[0], hard), min(value[1], hard))
+        resource.setrlimit(name, value)
+
+
+def seccomp_filter(machine: Optional[str] = None) -> Optional[bytes]:
+    """
+    Build the BPF program that denies the blocked system calls.
+
+    Returns:
+        Packed sock_filter array, or None if the machine is not supported
+    """
+    arch = SECCOMP_ARCHES.get(machine or platform.machine())
+    if arch is None:
+        return None
+    audit_arch, syscalls = arch
+    numbers = sorted(set(syscalls.values()))
+
+    instructions = [
+        (BPF_LD_W_ABS, 0, 0, 4),                     # seccomp_data.arch
+        (BPF_JEQ_K, 1, 0, audit_arch),
+        (BPF_RET_K, 0, 0, SECCOMP_RET_KILL_PROCESS),
+        (BPF_LD_W_ABS, 0, 0, 0),                     # seccomp_data.nr
+    ]
+    if audit_arch == SECCOMP_ARCHES['x86_64'][0]:
+        # Deny the x32 ABI, which would bypass the numbers below
+        instructions += [(BPF_JGE_K, 0, 1, X32_SYSCALL_BIT), (BPF_RET_K, 0, 0, SECCOMP_RET_KILL_PROCESS)]
+    for number in numbers:
+        instructions += [(BPF_JEQ_K, 0, 1, number), (BPF_RET_K, 0, 0, SECCOMP_RET_ERRNO | errno.EPERM)]
+    instructions.append((BPF_RET_K, 0, 0, SECCOMP_RET_ALLOW))
+
+    return b''.join(struct.pack('=HBBI', *instruction) for instruction in instructions)
+
+
+def install_seccomp(libc) -> bool:
+    """Install the syscall filter on this process (irreversible)."""
+    program = seccomp_filter()
+    if program is None:
+        return False
+    count = len(program) // ctypes.sizeof(_SockFilter)
+    filters = (_SockFilter * count).from_buffer_copy(program)
+    prog = _SockFprog(count, ctypes.cast(filters, ctypes.POINTER(_SockFilter)))
+
+    if libc.prctl(PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0) != 0:
+        return False
+    return libc.prctl(PR_SET_SECCOMP, SECCOMP_MODE_FILTER, ctypes.byref(prog), 0, 0) == 0
+
+
+class Isolation:
+    """Isolation applied to a runner process, and what actually took effect."""
+
+    def __init__(self, options: Dict[str, Any]):
+        """
+        Initialize isolation.
+
+        Args:
+            options: Plan `isolation` section; `limits` overrides DEFAULT_LIMITS
+        """
+        self.limits = dict(DEFAULT_LIMITS, **(options.get('limits') or {}))
+        self.applied = {'namespaces': False, 'tmpfs': False, 'rlimits': False, 'seccomp': False}
+        self.workdir = None
+        self._owns_workdir = False
+
+    def apply(self) -> Dict[str, bool]:
+        """
+        Isolate the current process.
+
+        Returns:
+            Which protections are in effect
+        """
+        libc = _libc()
+        if libc is not None:
+            self.applied['namespaces'] = enter_namespaces(libc)
+            if self.applied['namespaces']:
+                self.applied['tmpfs'] = mount_private_tmp(libc, self.limits['tmpfs_mb'])
+
+        if self.applied['tmpfs']:
+            self.workdir = '/tmp'
+        else:
+            # Without a private tmpfs, use a throwaway directory we remove
+            self.workdir = tempfile.mkdtemp(prefix='pyrun-')
+            self._owns_workdir = True
+        os.chdir(self.workdir)
+        os.environ['HOME'] = os.environ['TMPDIR'] = self.workdir
+        tempfile.tempdir = self.workdir
+
+        try:
+            apply_rlimits(self.limits)
+            self.applied['rlimits'] = True
+        except (ValueError, OSError):
+            pass
+
+        if libc is not None:
+            self.applied['seccomp'] = install_seccomp(libc)
+        return dict(self.applied)
+
+    def cleanup(self):
+        """Remove the working directory if it is not a private tmpfs."""
+        if self._owns_workdir and self.workdir:
+            os.chdir('/')
+            shutil.rmtree(self.workdir, ignore_errors=True)
@@ -0,0 +1,366 @@
+"""
+Append-only, compressed journal of Python executions.
+
+DebugExecutor used to write a directory with four files per execution, which
+stops scaling after a few thousand runs. The journal keeps two files:
+
+- `journal.log`: one zlib-compressed JSON record per execution (code, tests,
+  result and timings), each prefixed with its length
+- `journal.idx`: a fixed-size entry per record (offset, length, time,
+  status, wall time), so record n is found with a single seek and slices
+  can be filtered by status without decompressing anything
+
+Records are numbered from 0 in append order. Appends take an exclusive
+file lock (flock, or msvcrt.locking on Windows), so several processes can
+share a journal. A crash between the
+two writes leaves an unindexed tail that the next append overwrites.
+
+The replay benchmark pushes a slice of the journal through the executor
+concurrently and reports throughput and latency percentiles, to reproduce
+production load locally and compare executor versions:
+
+    python -m app.python_practice.journal bench debug_logs/journal --concurrency 8
+
+Production executions are journaled when PYTHON_EXECUTION_JOURNAL is set
+(see executor.py).
+"""
+
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+LOG_FILE = 'journal.log'
+INDEX_FILE = 'journal.idx'
+
+# offset, compressed length, created (unix time), wall time ms, status code
+INDEX_ENTRY = struct.Struct('<QIdIB3x')
+LENGTH_PREFIX = struct.Struct('<I')
+
+# Stored as one byte in the index; anything else is UNKNOWN_STATUS
+STATUSES = ('passed', 'failed', 'error', 'timeout', 'steps_exceeded', 'memory_exceeded', 'output_exceeded')
+UNKNOWN_STATUS = 255
+
+
+def lock_file(f):
+    """Take an exclusive lock on an open file, waiting for other processes."""
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        return
+    # msvcrt locks a byte range from the current position; LK_LOCK gives up
+    # after ten seconds, so keep trying
+    f.seek(0)
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            pass
+
+
+def unlock_file(f):
+    """Release a lock taken with lock_file."""
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_UN)
+        return
+    f.seek(0)
+    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class ExecutionJournal:
+    """Append-only execution journal with a fixed-size index."""
+
+    def __init__(self, path: str):
+        """
+        Open (or create) a journal.
+
+        Args:
+            path: Directory holding journal.log and journal.idx
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.log_path = os.path.join(path, LOG_FILE)
+        self.index_path = os.path.join(path, INDEX_FILE)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        try:
+            return os.path.getsize(self.index_path) // INDEX_ENTRY.size
+        except FileNotFoundError:
+            return 0
+
+    def append(self, code: str, test_cases: List[Dict], result: Dict[str, Any],
+               timeout: float = 30, mode: str = 'sequential', wall_ms: Optional[int] = None,
+               meta: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Record an execution.
+
+        Args:
+            code: Executed code
+            test_cases: Test cases it ran against
+            result: Executor result
+            timeout: Timeout the run had
+            mode: Execution mode
+            wall_ms: Wall time seen by the caller (default: result execution_time_ms)
+            meta: Extra fields (e.g. exercise id)
+
+        Returns:
+            Record id
+        """
+        created = time.time()
+        wall_ms = int(wall_ms if wall_ms is not None else result.get('execution_time_ms', 0))
+        record = {
+            'created': created,
+            'code': code,
+            'tests': test_cases,
+            'timeout': timeout,
+            'mode': mode,
+            'result': result,
+            'timings': {
+                'wall_ms': wall_ms,
+                'execution_time_ms': result.get('execution_time_ms'),
+                'cpu_time_ms': result.get('cpu_time_ms'),
+                'memory_used_mb': result.get('memory_used_mb')
+            },
+            'meta': meta or {}
+        }
+        payload = zlib.compress(json.dumps(record, default=str, separators=(',', ':')).encode('utf-8'), 6)
+        status = result.get('status')
+        status_code = STATUSES.index(status) if status in STATUSES else UNKNOWN_STATUS
+
+        with self._lock, open(self.log_path, 'ab') as log, open(self.index_path, 'ab') as index:
+            lock_file(index)
+            try:
+                record_id = self._repair(log, index)
+                offset = log.tell()
+                log.write(LENGTH_PREFIX.pack(len(payload)) + payload)
+                log.flush()
+                index.write(INDEX_ENTRY.pack(offset, len(payload), created, wall_ms, status_code))
+                index.flush()
+            finally:
+                unlock_file(index)
+        return record_id
+
+    def _repair(self, log, index) -> int:
+        """Drop a torn index entry and unindexed log tail; return the next id."""
+        index_size = os.fstat(index.fileno()).st_size
+        count = index_size // INDEX_ENTRY.size
+        if index_size != count * INDEX_ENTRY.size:
+            index.truncate(count * INDEX_ENTRY.size)
+
+        end = 0
+        if count:
+            offset, length = self.entry(count - 1)[:2]
+            end = offset + LENGTH_PREFIX.size + length
+        if os.fstat(log.fileno()).st_size != end:
+            log.truncate(end)
+        log.seek(end)
+        return count
+
+    def entry(self, record_id: int) -> tuple:
+        """Read a raw index entry (offset, length, created, wall_ms, status code)."""
+        if record_id < 0 or record_id >= len(self):
+            raise KeyError(record_id)
+        with open(self.index_path, 'rb') as index:
+            index.seek(record_id * INDEX_ENTRY.size)
+            return INDEX_ENTRY.unpack(index.read(INDEX_ENTRY.size))
+
+    def get(self, record_id: int) -> Dict[str, Any]:
+        """
+        Load a record.
+
+        Raises:
+            KeyError: If there is no such record
+        """
+        offset, length = self.entry(record_id)[:2]
+        with open(self.log_path, 'rb') as log:
+            log.seek(offset + LENGTH_PREFIX.size)
+            record = json.loads(zlib.decompress(log.read(length)))
+        record['id'] = record_id
+        return record
+
+    def entries(self, start: int = 0, stop: Optional[int] = None,
+                status: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate index entries without reading the records.
+
+        Args:
+            start: First record id
+            stop: Record id to stop before (default: end of journal)
+            status: Only entries with this result status
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        if start >= stop:
+            return
+        with open(self.index_path, 'rb') as index:
+            index.seek(start * INDEX_ENTRY.size)
+            data = index.read((stop - start) * INDEX_ENTRY.size)
+        for i, (offset, length, created, wall_ms, status_code) in enumerate(INDEX_ENTRY.iter_unpack(data)):
+            entry_status = STATUSES[status_code] if status_code < len(STATUSES) else None
+            if status is None or entry_status == status:
+                yield {'id': start + i, 'created': created, 'wall_ms': wall_ms, 'status': entry_status}
+
+    def records(self, start: int = 0, stop: Optional[int] = None,
+                status: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Iterate full records of a slice (see entries)."""
+        for entry in self.entries(start, stop, status):
+            yield self.get(entry['id'])
+
+
+def format_summary(record: Dict[str, Any]) -> str:
+    """Render a record as the human-readable execution summary."""
+    result = record['result']
+    lines = [
+        f"Execution Summary - {record['id']}",
+        '=' * 60,
+        '',
+        f"Status: {result.get('status')}",
+        f"Tests Passed: {result.get('tests_passed', 0)}/{len(record['tests'])}",
+        f"Execution Time: {result.get('execution_time_ms', 0)}ms",
+        ''
+    ]
+    if result.get('output'):
+        lines += ['Output:', result['output'], '']
+    if result.get('error'):
+        lines += ['Error:', result['error'], '']
+
+    lines.append('Test Results:')
+    for tr in result.get('test_results', []):
+        status = 'PASS' if tr.get('passed') else 'FAIL'
+        lines.append(f"  [{status}] Test {tr.get('test_number')}: {tr.get('description')}")
+        if not tr.get('passed'):
+            lines.append(f"       Expected: {tr.get('expected')}")
+            lines.append(f"       Actual: {tr.get('actual')}")
+            if tr.get('error'):
+                lines.append(f"       Error: {tr.get('error')}")
+    return '\n'.join(lines) + '\n'
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(fraction * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def replay_benchmark(journal: ExecutionJournal, start: int = 0, stop: Optional[int] = None,
+                     status: Optional[str] = None, concurrency: int = 4,
+                     repeat: int = 1) -> Dict[str, Any]:
+    """
+    Replay a journal slice through the executor concurrently.
+
+    Runs bypass the result cache. Recorded and replayed latencies are
+    reported side by side, with the number of runs whose status changed.
+
+    Args:
+        journal: Journal to read
+        start: First record id
+        stop: Record id to stop before
+        status: Only replay records with this status
+        concurrency: Executions in flight at once
+        repeat: Times to replay the slice
+
+    Returns:
+        Benchmark report
+    """
+    from app.python_practice.executor import execute_python_code
+    from app.python_practice.worker_pool import get_worker_pool, pool_enabled
+
+    records = list(journal.records(start, stop, status)) * repeat
+    if pool_enabled():
+        # Keep interpreter start-up out of the measured latencies
+        get_worker_pool().warm()
+
+    def replay(record):
+        started = time.perf_counter()
+        result = execute_python_code(record['code'], record['tests'], record.get('timeout', 30),
+                                     use_cache=False, mode=record.get('mode', 'sequential'))
+        return record, result, (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        runs = list(pool.map(replay, records))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for _, _, latency in runs)
+    recorded = sorted(record['timings']['wall_ms'] for record, _, _ in runs)
+    statuses = {}
+    for _, result, _ in runs:
+        statuses[result['status']] = statuses.get(result['status'], 0) + 1
+
+    def summary(values):
+        return {
+            'p50_ms': round(percentile(values, 0.50), 1),
+            'p90_ms': round(percentile(values, 0.90), 1),
+            'p99_ms': round(percentile(values, 0.99), 1),
+            'max_ms': round(values[-1], 1) if values else 0.0
+        }
+
+    return {
+        'runs': len(runs),
+        'concurrency': concurrency,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_per_s': round(len(runs) / elapsed, 2) if elapsed else 0.0,
+        'latency': summary(latencies),
+        'recorded_latency': summary(recorded),
+        'statuses': statuses,
+        'status_changed': sum(1 for record, result, _ in runs if record['result'].get('status') != result['status'])
+    }
+
+
+def main():
+    """Command-line interface: list, show and bench."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Inspect and replay an execution journal')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    list_parser = subparsers.add_parser('list', help='List recent records')
+    list_parser.add_argument('journal', help='Journal directory')
+    list_parser.add_argument('--limit', type=int, default=20)
+    list_parser.add_argument('--status', choices=STATUSES)
+
+    show_parser = subparsers.add_parser('show', help='Print a record summary')
+    show_parser.add_argument('journal', help='Journal directory')
+    show_parser.add_argument('record_id', type=int)
+
+    bench_parser = subparsers.add_parser('bench', help='Replay a slice concurrently')
+    bench_parser.add_argument('journal', help='Journal directory')
+    bench_parser.add_argument('--start', type=int, default=0)
+    bench_parser.add_argument('--stop', type=int)
+    bench_parser.add_argument('--status', choices=STATUSES)
+    bench_parser.add_argument('--concurrency', type=int, default=4)
+    bench_parser.add_argument('--repeat', type=int, default=1)
+
+    args = parser.parse_args()
+    journal = ExecutionJournal(args.journal)
+
+    if args.command == 'list':
+        entries = list(journal.entries(status=args.status))[-args.limit:]
+        print(f'{len(journal)} record(s) in {args.journal}')
+        for entry in reversed(entries):
+            created = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['created']))
+            print(f"  {entry['id']:>8}  {created}  {entry['status'] or '?':<15} {entry['wall_ms']:>7} ms")
+
+    elif args.command == 'show':
+        print(format_summary(journal.get(args.record_id)))
+
+    elif args.command == 'bench':
+        report = replay_benchmark(journal, args.start, args.stop, args.status, args.concurrency, args.repeat)
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
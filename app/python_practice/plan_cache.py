@@ -0,0 +1,204 @@
+"""
+Per-process cache of parsed exercise test plans.
+
+Every submission used to re-parse `Exercise.test_cases` (JSON, falling back
+to a Python literal) and re-hash it for the result cache key. The parsed,
+normalized plan is now kept in a bounded LRU keyed by exercise id and
+`updated_at`, so an edited exercise is picked up on its next submission.
+The instructor test-case APIs also invalidate their exercise explicitly.
+
+The runner receives tests as data (there is no generated harness), so the
+"compiled" part of a plan is what the parent would otherwise recompute per
+run: the normalized test list, its result-cache fingerprint and whether its
+results may be cached at all.
+
+Inline test values larger than PYTHON_FIXTURE_INLINE_LIMIT characters of
+JSON are moved to fixtures (see fixtures.py) when an exercise is saved
+(store_exercise_fixtures), so `Exercise.test_cases` holds references and the
+data is not re-sent and re-parsed on every run. Compiling a plan never
+writes fixtures: it runs on whichever host grades the submission.
+"""
+
+import ast
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from app.python_practice.fixtures import FixtureError, externalize, fixture_refs
+from app.python_practice.result_cache import CACHEABLE_TEST_TYPES, tests_fingerprint
+
+FIXTURE_INLINE_LIMIT = int(os.environ.get('PYTHON_FIXTURE_INLINE_LIMIT', 64 * 1024))
+
+
+class ExercisePlan(list):
+    """
+    Normalized test cases of one exercise.
+
+    A list, so it can be passed anywhere test cases are expected (including
+    Celery task arguments); the extra attributes are computed once.
+    """
+
+    def __init__(self, test_cases: List[Dict]):
+        """
+        Build a plan.
+
+        Args:
+            test_cases: Normalized test case dictionaries
+        """
+        super().__init__(test_cases)
+        self.fingerprint = tests_fingerprint(test_cases)
+        self.cacheable = bool(test_cases) and all(
+            test['type'] in CACHEABLE_TEST_TYPES for test in test_cases
+        )
+        self.uses_fixtures = bool(fixture_refs(test_cases))
+
+
+def parse_test_cases(text: Optional[str]) -> List[Dict]:
+    """
+    Parse stored test cases.
+
+    Args:
+        text: `Exercise.test_cases` (JSON, or a Python literal for older exercises)
+
+    Returns:
+        List of test case dictionaries (empty if missing or unparseable)
+    """
+    if not text:
+        return []
+    try:
+        # First try parsing as JSON
+        return json.loads(text)
+    except json.JSONDecodeError:
+        # If JSON parsing fails, try Python literal eval (for backwards compatibility)
+        try:
+            return ast.literal_eval(text)
+        except (ValueError, SyntaxError):
+            return []
+
+
+def compile_plan(text: Optional[str]) -> ExercisePlan:
+    """
+    Parse, validate and normalize stored test cases.
+
+    A single test object is treated as a one-test list, entries that are not
+    objects are dropped and every test gets an explicit `type`.
+    """
+    test_cases = parse_test_cases(text)
+    if isinstance(test_cases, dict):
+        test_cases = [test_cases]
+    elif not isinstance(test_cases, (list, tuple)):
+        test_cases = []
+
+    normalized = []
+    for test in test_cases:
+        if isinstance(test, dict):
+            normalized.append(dict(test, type=test.get('type') or 'assert_function'))
+    return ExercisePlan(normalized)
+
+
+def store_exercise_fixtures(exercise):
+    """
+    Move large inline test values of a Python exercise to fixtures.
+
+    Called when an exercise is saved, before it is committed. The fixtures
+    are written to PYTHON_FIXTURE_DIR, which must be storage shared by every
+    web and Celery host that grades submissions. Test cases with nothing to
+    move, or that cannot be stored, are left unchanged.
+
+    Args:
+        exercise: Exercise model instance
+    """
+    if exercise.exercise_type != 'python' or not exercise.test_cases:
+        return
+    test_cases = parse_test_cases(exercise.test_cases)
+    single = isinstance(test_cases, dict)
+    if not isinstance(test_cases, (list, dict)):
+        return
+
+    try:
+        stored = [
+            externalize(test, FIXTURE_INLINE_LIMIT) if isinstance(test, dict) else test
+            for test in ([test_cases] if single else test_cases)
+        ]
+    except (FixtureError, OSError) as e:
+        # Keep the values inline (e.g. read-only fixture directory)
+        print(f'Could not store test fixture: {e}')
+        return
+
+    if any(new is not old for new, old in zip(stored, [test_cases] if single else test_cases)):
+        exercise.test_cases = json.dumps(stored[0] if single else stored)
+
+
+class ExercisePlanCache:
+    """Bounded LRU of compiled exercise plans."""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        """
+        Initialize plan cache.
+
+        Args:
+            max_entries: Maximum plans kept (default: PYTHON_PLAN_CACHE_SIZE or 512)
+        """
+        self.max_entries = max_entries or int(os.environ.get('PYTHON_PLAN_CACHE_SIZE', 512))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, exercise) -> ExercisePlan:
+        """
+        Get the compiled plan of an exercise, compiling it on a miss.
+
+        Args:
+            exercise: Exercise model instance (unsaved exercises are not cached)
+
+        Returns:
+            Compiled plan (shared; do not modify)
+        """
+        exercise_id = getattr(exercise, 'id', None)
+        if exercise_id is None:
+            return compile_plan(exercise.test_cases)
+
+        version = getattr(exercise, 'updated_at', None)
+        with self._lock:
+            entry = self._entries.get(exercise_id)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(exercise_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        plan = compile_plan(exercise.test_cases)
+        with self._lock:
+            self._entries[exercise_id] = (version, plan)
+            self._entries.move_to_end(exercise_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return plan
+
+    def invalidate(self, exercise_id: int):
+        """Drop an exercise's plan after its test cases changed."""
+        with self._lock:
+            self._entries.pop(exercise_id, None)
+
+    def clear(self):
+        """Drop every plan held by this process."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total * 100, 2) if total else 0.0
+        }
+
+
+# Global plan cache instance
+exercise_plans = ExercisePlanCache()
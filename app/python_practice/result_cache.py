@@ -0,0 +1,197 @@
+"""
+Content-addressed cache of Python execution results.
+
+Students resubmit the same code and many submit byte-identical solutions, so
+results are cached under a hash of the normalized code (its AST dump, which
+ignores whitespace and comments) plus a fingerprint of the test cases, the time limit and the backend. When
+an instructor edits `Exercise.test_cases` the fingerprint changes, so stale
+results are never served; they simply age out of the LRU. A hit only reuses
+the verdict: the resource usage of the run that was cached belongs to another
+submission and is dropped.
+
+Entries live in a bounded per-process LRU and, when Redis is available, in
+the shared cache (see app/cache.py) so all web and Celery workers benefit.
+"""
+
+import ast
+import copy
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from app.cache import cache_manager
+
+# Code that imports these modules (or calls these builtins) can give a
+# different answer on every run and is never cached: clocks, randomness
+# (numpy.random, os.urandom), process and environment state, and threads
+NONDETERMINISTIC_MODULES = {
+    'random', 'time', 'datetime', 'uuid', 'secrets',
+    'numpy', 'pandas', 'scipy', 'os', 'sys', 'platform', 'socket',
+    'tempfile', 'threading', 'multiprocessing', 'concurrent', 'asyncio'
+}
+NONDETERMINISTIC_CALLS = {'id', 'hash'}
+
+# Test types whose verdict depends only on the code's behaviour
+CACHEABLE_TEST_TYPES = {
+    'assert_function', 'assert_output', 'assert_output_contains',
+    'assert_output_regex', 'assert_variable_exists', 'assert_variable_type',
+    'assert_variable_length', 'assert_variable_value'
+}
+
+# Only verdicts of completed runs are cached; timeouts and infrastructure
+# errors may not repeat
+CACHEABLE_STATUSES = {'passed', 'failed'}
+
+# Measurements of the run itself, never served from the cache
+RESOURCE_FIELDS = ('resources', 'cpu_time_ms', 'memory_used_mb')
+
+REDIS_KEY_PREFIX = 'pyexec'
+REDIS_TIMEOUT = 3600
+
+
+def normalize_code(code: str) -> Optional[ast.AST]:
+    """Parse code, returning None if it is not valid Python."""
+    try:
+        return ast.parse(code)
+    except (SyntaxError, ValueError):
+        return None
+
+
+def is_deterministic(tree: ast.AST) -> bool:
+    """Check that the code does not use time, randomness or object identity."""
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            if any(alias.name.split('.')[0] in NONDETERMINISTIC_MODULES for alias in node.names):
+                return False
+        elif isinstance(node, ast.ImportFrom):
+            if (node.module or '').split('.')[0] in NONDETERMINISTIC_MODULES:
+                return False
+        elif isinstance(node, ast.Call):
+            if isinstance(node.func, ast.Name) and node.func.id in NONDETERMINISTIC_CALLS:
+                return False
+    return True
+
+
+def tests_fingerprint(test_cases: List[Dict]) -> str:
+    """Get a stable hash of an exercise's test cases."""
+    canonical = json.dumps(test_cases, sort_keys=True, separators=(',', ':'), default=repr)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def cache_key(code: str, test_cases: List[Dict], timeout: Optional[float] = None,
+              backend: Optional[str] = None) -> Optional[str]:
+    """
+    Build the cache key for a submission.
+
+    Args:
+        code: Submitted code
+        test_cases: Test cases, or a compiled ExercisePlan (whose fingerprint
+                    and cacheability are reused)
+        timeout: Time limit of the run; a tighter limit can turn a pass
+                 into a timeout
+        backend: Executor backend; runs are limited differently on each
+
+    Returns:
+        Key string, or None if this submission must not be cached
+    """
+    fingerprint = getattr(test_cases, 'fingerprint', None)
+    if fingerprint is not None:
+        if not test_cases.cacheable:
+            return None
+    elif not test_cases or any(t.get('type', 'assert_function') not in CACHEABLE_TEST_TYPES for t in test_cases):
+        return None
+
+    tree = normalize_code(code)
+    if tree is None or not is_deterministic(tree):
+        return None
+
+    code_hash = hashlib.sha256(ast.dump(tree).encode('utf-8')).hexdigest()
+    key = f'{code_hash}:{fingerprint or tests_fingerprint(test_cases)}'
+    if timeout is not None:
+        key += f':timeout={timeout:g}'
+    if backend is not None:
+        key += f':backend={backend}'
+    return key
+
+
+def strip_resources(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Remove the resource usage of the run that produced a result."""
+    for field in RESOURCE_FIELDS:
+        result.pop(field, None)
+    return result
+
+
+class ResultCache:
+    """Bounded LRU of execution results, backed by Redis when available."""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        """
+        Initialize result cache.
+
+        Args:
+            max_entries: Maximum results kept in this process
+        """
+        self.max_entries = max_entries or int(os.environ.get('PYTHON_RESULT_CACHE_SIZE', 2048))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get a cached result (a copy, safe to modify)."""
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+
+        if result is None:
+            result = cache_manager.get(f'{REDIS_KEY_PREFIX}:{key}')
+            if result is not None:
+                self._store(key, result)
+
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        # Entries cached before resources were stripped may still carry them
+        return strip_resources(copy.deepcopy(result))
+
+    def set(self, key: str, result: Dict[str, Any]):
+        """Cache a result if its status is deterministic."""
+        if result.get('status') not in CACHEABLE_STATUSES:
+            return
+        result = strip_resources(copy.deepcopy(result))
+        self._store(key, result)
+        cache_manager.set(f'{REDIS_KEY_PREFIX}:{key}', result, REDIS_TIMEOUT)
+
+    def _store(self, key: str, result: Dict[str, Any]):
+        """Insert into the LRU, evicting the least recently used entries."""
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every result held by this process."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total * 100, 2) if total else 0.0
+        }
+
+
+# Global result cache instance
+result_cache = ResultCache()
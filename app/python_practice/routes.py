@@ -5,14 +5,18 @@ Updated: Added course_subtopics route for displaying lesson overview.
 
 import json
 from datetime import datetime
-from flask import render_template, redirect, url_for, flash, request, jsonify, abort
+from flask import render_template, redirect, url_for, flash, request, jsonify, abort, Response, stream_with_context, current_app
 from flask_login import login_required, current_user
 from app.python_practice import python_practice_bp
 from app.extensions import db
 from app.models import (
     Exercise, ExerciseSubmission, TutorialEnrollment, NewTutorial, Lesson
 )
-from app.python_practice.executor import execute_python_code
+from app.python_practice.executor import (
+    execute_python_code, execute_python_code_stream, load_test_cases, exercise_timeout
+)
+from app.python_practice.executor_enhanced import SUBMISSION_MODES
+from app.python_practice.admission import AdmissionRejected, get_governor
 from app.python_practice.validators import validate_python_code, check_rate_limit
 from app.python_practice.forms import CodeSubmissionForm
 from app.utils.markdown_helper import render_markdown
@@ -138,6 +142,7 @@ def view_exercise(exercise_id):
                          next_exercise=next_exercise,
                          prev_exercise=prev_exercise,
                          exercises_completed_count=exercises_completed_count,
+                         async_submit=current_app.config.get('PYTHON_ASYNC_SUBMIT', False),
                          total_exercises_in_lesson=total_exercises_in_lesson,
                          subtopic_progress_percentage=subtopic_progress_percentage,
                          exercise_completion_map=exercise_completion_map,
@@ -152,32 +157,180 @@ def view_exercise(exercise_id):
 @login_required
 def submit_code(exercise_id):
     """Submit Python code for execution and validation."""
+    exercise, submission, mode, error_response = _create_submission(exercise_id)
+    if error_response:
+        return error_response
+    
+    if current_app.config.get('PYTHON_ASYNC_SUBMIT'):
+        # Grade on the code_execution queue; the client polls for the result
+        from app.tasks.execution_tasks import execute_python_code_async, submission_job_id
+        
+        timeout = exercise_timeout(exercise)
+        job = execute_python_code_async.apply_async(
+            args=(submission.id, submission.submitted_code, load_test_cases(exercise), timeout),
+            kwargs={'mode': mode, 'step_limit': exercise.step_limit},
+            task_id=submission_job_id(submission.id),
+            # Tight task limits follow the exercise's own time limit
+            soft_time_limit=int(timeout) + 20,
+            time_limit=int(timeout) + 30
+        )
+        return _pending_response(submission, job_id=job.id, status_url=url_for(
+            'python_practice.submission_status', exercise_id=exercise_id, submission_id=submission.id
+        ))
+    
+    # Execute code with test cases
+    try:
+        execution_result = execute_python_code(
+            code=submission.submitted_code,
+            test_cases=load_test_cases(exercise),
+            timeout=exercise_timeout(exercise),
+            mode=mode,
+            step_limit=exercise.step_limit,
+            admission_key=f'user:{current_user.id}'
+        )
+    except AdmissionRejected as e:
+        return _busy_response(e, submission)
+    
+    return jsonify(_finish_submission(submission, execution_result))
+
+
+@python_practice_bp.route('/exercise/<int:exercise_id>/submission/<int:submission_id>/status')
+@login_required
+def submission_status(exercise_id, submission_id):
+    """
+    Get the result of an asynchronously graded submission.
+    
+    With `?wait=<seconds>` the request waits on the Celery result backend
+    until grading finishes or the wait runs out. The wait is capped by
+    PYTHON_SUBMIT_POLL_WAIT_SECONDS (1 second by default) so a poll never
+    holds a web worker for long. Returns 202 with a Retry-After hint while
+    pending.
+    """
+    submission = ExerciseSubmission.query.filter_by(
+        id=submission_id,
+        exercise_id=exercise_id,
+        user_id=current_user.id
+    ).first_or_404()
+    
+    wait = min(max(request.args.get('wait', 0, type=float), 0),
+               current_app.config.get('PYTHON_SUBMIT_POLL_WAIT_SECONDS', 1))
+    tests_skipped = 0
+    
+    if submission.status == 'pending':
+        from celery.exceptions import TimeoutError as JobTimeoutError
+        from app.celery_app import celery
+        from app.tasks.execution_tasks import submission_job_id
+        
+        job = celery.AsyncResult(submission_job_id(submission.id))
+        if wait > 0:
+            try:
+                job.get(timeout=wait, propagate=False)
+            except JobTimeoutError:
+                pass
+        if job.ready() and isinstance(job.result, dict):
+            tests_skipped = job.result.get('tests_skipped', 0)
+        # The task commits the result from another process
+        db.session.refresh(submission)
+        
+        if submission.status == 'pending' and job.ready():
+            # The worker died or hit the hard time limit before saving
+            submission.status = 'error'
+            submission.error_message = 'Grading did not complete. Please try again.'
+            submission.executed_at = datetime.utcnow()
+            db.session.commit()
+    
+    if submission.status == 'pending':
+        return _pending_response(submission)
+    
+    test_results = json.loads(submission.test_results) if submission.test_results else []
+    return jsonify(_submission_payload(submission, test_results, tests_skipped))
+
+
+@python_practice_bp.route('/exercise/<int:exercise_id>/submit/stream', methods=['POST'])
+@login_required
+def submit_code_stream(exercise_id):
+    """
+    Submit Python code and stream per-test progress as Server-Sent Events.
+    
+    Emits `test_started`, `test_result` and `output` events while the code
+    runs and a final `complete` event carrying the same payload that
+    submit_code returns.
+    """
+    exercise, submission, mode, error_response = _create_submission(exercise_id)
+    if error_response:
+        return error_response
+    
+    submission_id = submission.id
+    
+    def finish(execution_result):
+        # Runs on the execution thread, with a session of its own, so the
+        # submission is stored even if the client has disconnected
+        return _finish_submission(ExerciseSubmission.query.get(submission_id), execution_result)
+    
+    events = execute_python_code_stream(
+        submission.submitted_code, load_test_cases(exercise), timeout=exercise_timeout(exercise),
+        mode=mode, step_limit=exercise.step_limit, admission_key=f'user:{current_user.id}',
+        on_complete=finish
+    )
+    
+    def generate():
+        # Open the stream immediately so the browser gets its first byte
+        yield ': started\n\n'
+        for event in events:
+            yield f"event: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+def _create_submission(exercise_id):
+    """
+    Validate a code submission request and record the submission.
+    
+    Returns:
+        Tuple of (exercise, submission, mode, error_response); error_response
+        is set (and the rest None) when the request is rejected
+    """
     exercise = Exercise.query.get_or_404(exercise_id)
     
     # Ensure this is a Python exercise
     if exercise.exercise_type != 'python':
-        return jsonify({'error': 'Invalid exercise type'}), 400
+        return None, None, None, (jsonify({'error': 'Invalid exercise type'}), 400)
     
     # Check rate limiting
     rate_limit_ok, rate_limit_msg = check_rate_limit(current_user.id)
     if not rate_limit_ok:
-        return jsonify({'error': rate_limit_msg}), 429
+        return None, None, None, (jsonify({'error': rate_limit_msg}), 429)
+    
+    # Shed load when the cluster-wide execution queue is backed up
+    governor = get_governor()
+    if governor:
+        try:
+            governor.admit()
+        except AdmissionRejected as e:
+            return None, None, None, _busy_response(e)
     
     # Get submitted code
     data = request.get_json()
     if not data or 'code' not in data:
-        return jsonify({'error': 'No code provided'}), 400
+        return None, None, None, (jsonify({'error': 'No code provided'}), 400)
     
     submitted_code = data.get('code', '')
+    mode = data.get('mode', 'sequential')
+    if mode not in SUBMISSION_MODES:
+        return None, None, None, (jsonify({'error': 'Invalid execution mode'}), 400)
     
     # Validate code for security
     is_valid, validation_msg = validate_python_code(submitted_code)
     if not is_valid:
-        return jsonify({
+        return None, None, None, (jsonify({
             'status': 'error',
             'error': validation_msg,
             'is_security_violation': True
-        }), 400
+        }), 400)
     
     # Get enrollment (if applicable)
     enrollment = None
@@ -200,48 +353,36 @@ def submit_code(exercise_id):
     db.session.add(submission)
     db.session.commit()
     
-    # Parse test cases
-    test_cases = []
-    if exercise.test_cases:
-        try:
-            # First try parsing as JSON
-            test_cases = json.loads(exercise.test_cases)
-        except json.JSONDecodeError:
-            # If JSON parsing fails, try Python literal eval (for backwards compatibility)
-            try:
-                import ast
-                test_cases = ast.literal_eval(exercise.test_cases)
-            except (ValueError, SyntaxError):
-                test_cases = []
-    
-    # Execute code with test cases
-    execution_result = execute_python_code(
-        code=submitted_code,
-        test_cases=test_cases,
-        timeout=30
-    )
-    
+    return exercise, submission, mode, None
+
+
+def _pending_response(submission, **extra):
+    """Build the 202 response telling the client when to poll again."""
+    retry_after = current_app.config.get('PYTHON_SUBMIT_POLL_INTERVAL_SECONDS', 1)
+    response = jsonify({'status': 'pending', 'submission_id': submission.id, 'retry_after': retry_after, **extra})
+    response.status_code = 202
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def _busy_response(error, submission=None):
+    """Build the 503 response for a submission that could not be admitted."""
+    if submission is not None:
+        submission.status = 'error'
+        submission.error_message = str(error)
+        submission.executed_at = datetime.utcnow()
+        db.session.commit()
+    
+    response = jsonify({'status': 'error', 'error': str(error), 'retry_after': error.retry_after})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
+def _finish_submission(submission, execution_result):
+    """Store an execution result on a submission and build the response payload."""
     # Update submission with results
-    submission.status = execution_result['status']
-    submission.output = execution_result.get('output', '')
-    submission.error_message = execution_result.get('error', '')
-    submission.test_results = json.dumps(execution_result.get('test_results', []))
-    submission.tests_passed = execution_result.get('tests_passed', 0)
-    submission.tests_failed = execution_result.get('tests_failed', 0)
-    submission.execution_time_ms = execution_result.get('execution_time_ms', 0)
-    submission.executed_at = datetime.utcnow()
-    
-    # Calculate score
-    total_tests = submission.tests_passed + submission.tests_failed
-    if total_tests > 0:
-        submission.score = (submission.tests_passed / total_tests) * 100
-    else:
-        submission.score = 0
-    
-    # Check if flagged
-    if execution_result.get('is_flagged', False):
-        submission.is_flagged = True
-        submission.flagged_reason = execution_result.get('flagged_reason', 'Suspicious code detected')
+    submission.apply_execution_result(execution_result)
     
     db.session.commit()
     
@@ -249,20 +390,29 @@ def submit_code(exercise_id):
     if submission.status == 'passed':
         submission.mark_as_passed()
     
-    # Prepare response
-    response_data = {
+    return _submission_payload(
+        submission,
+        execution_result.get('test_results', []),
+        execution_result.get('tests_skipped', 0)
+    )
+
+
+def _submission_payload(submission, test_results, tests_skipped=0):
+    """Build the JSON payload describing a graded submission."""
+    return {
         'status': submission.status,
         'output': submission.output,
         'error': submission.error_message,
-        'test_results': execution_result.get('test_results', []),
+        'test_results': test_results,
         'tests_passed': submission.tests_passed,
         'tests_failed': submission.tests_failed,
+        'tests_skipped': tests_skipped,
         'score': float(submission.score),
         'execution_time_ms': submission.execution_time_ms,
+        'cpu_time_ms': submission.cpu_time_ms,
+        'memory_used_mb': float(submission.memory_used_mb) if submission.memory_used_mb is not None else None,
         'submission_id': submission.id
     }
-    
-    return jsonify(response_data)
 
 
 @python_practice_bp.route('/exercise/<int:exercise_id>/solution')
@@ -328,6 +478,8 @@ def get_submissions(exercise_id):
             'tests_passed': sub.tests_passed,
             'tests_failed': sub.tests_failed,
             'execution_time_ms': sub.execution_time_ms,
+            'cpu_time_ms': sub.cpu_time_ms,
+            'memory_used_mb': float(sub.memory_used_mb) if sub.memory_used_mb is not None else None,
             'submitted_at': sub.submitted_at.isoformat(),
             'code_preview': sub.submitted_code[:100] + '...' if len(sub.submitted_code) > 100 else sub.submitted_code
         })
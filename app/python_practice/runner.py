@@ -0,0 +1,485 @@
+"""
+Static test runner for Python submissions.
+
+The runner is a fixed module: it receives the user code and a structured test
+plan as data and exercises the code for every test itself, instead of the
+executor generating (and Python re-compiling) a new harness program per
+submission. User code runs in its own namespace, so it never sees harness
+variables.
+
+It only depends on the standard library because it runs inside the warm fork
+servers (fork_server.py) and, as a fallback, as a standalone script that reads
+a JSON plan on stdin:
+
+    {"code": "<user code>", "tests": [{"type": "assert_function", ...}, ...],
+     "output_limit": 5000, "test_offset": 0}
+
+The tests are probes (see grading.py): what the runner needs to exercise the
+code, without the expected values. `test_offset` numbers the tests of a plan
+that holds a slice of an exercise's tests (parallel mode);
+`stream` adds a {"type": "test_started"} frame before each test;
+`isolation` (see isolation.py) sandboxes the process before the code runs;
+`step_limit` caps the number of lines of user code executed (counted once
+the run has used `step_grace_seconds` of CPU time, see StepCounter) and
+`cpu_seconds` the CPU time, so runaway code is stopped early; `limits` holds
+the memory, file size and process rlimits of a run that is not isolated. A
+run that exceeds its step budget, memory or file size ends with a
+{"type": "limit", "limit": "steps" | "memory" | "file_size"} frame.
+`fixture_dir` is where {"$fixture": id} references in the tests are
+memory-mapped from (see fixtures.py); `preload` lists modules imported before
+the limits are applied (a no-op in a fork server that preloaded them).
+
+Results are written as frames on a dedicated result channel (see channel.py):
+a {"type": "started"} frame once the sandbox is applied, one {"type": "test"}
+frame with the observation of each test and a final {"type": "complete"}
+frame. The reader of the channel grades the observations (see grading.py).
+What the user code prints goes to the real stdout, where the reading process
+captures it with a size bound.
+
+The user code runs in this process and can reach the result channel's
+descriptor, so every frame carries the plan's `nonce`, a per-run secret the
+reader checks (see collect_child). The runner removes it from the plan before
+the code runs; frames the code writes itself cannot carry it. Code that
+tampers with the runner could still report observations of its choosing, but
+without the expected values it cannot tell which ones pass.
+"""
+
+import argparse
+import builtins
+import dis
+import errno
+import importlib
+import json
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+import types
+from io import StringIO
+from typing import Dict, List, Any
+
+if __package__:
+    from app.python_practice.channel import MAX_OUTPUT_LENGTH, write_frame
+    from app.python_practice.fixtures import FixtureError, fixture_refs, get_store
+    from app.python_practice.grading import summarize_value, value_digest
+    from app.python_practice.isolation import Isolation, apply_rlimits
+else:
+    # Running as a script or inside a fork server: siblings are top-level
+    from channel import MAX_OUTPUT_LENGTH, write_frame
+    from fixtures import FixtureError, fixture_refs, get_store
+    from grading import summarize_value, value_digest
+    from isolation import Isolation, apply_rlimits
+
+SUBMISSION_FILENAME = '<submission>'
+
+# Top-level modules of the runner and the fork server, removed from
+# sys.modules before the submission runs
+HIDDEN_MODULES = ('runner', 'channel', 'fixtures', 'grading', 'isolation', 'fork_server')
+
+class StepCounter:
+    """
+    Trace function counting line events in the submission's frames.
+
+    When the budget runs out `on_exceeded` is called from inside the trace
+    hook and must end the process: raising instead would let the submission
+    catch the exception, and CPython unsets a trace function that raises.
+
+    A loop written on a single line (`while True: pass`) produces no line
+    events after its first pass, so code objects containing one are traced
+    per opcode instead.
+
+    Tracing costs about 0.5 us per line: a tight 300,000-iteration loop takes
+    ~8x longer traced (23 ms -> 186 ms). With `grace_seconds`, counting only
+    starts once the process has used that much CPU time (ITIMER_PROF), so
+    code that finishes quickly, nearly every submission, runs untraced; the
+    timer's handler then traces the frames already running. Without
+    setitimer (Windows) counting starts right away.
+    """
+
+    def __init__(self, limit: int, on_exceeded, grace_seconds: float = 0):
+        """
+        Initialize counter.
+
+        Args:
+            limit: Maximum number of line events
+            on_exceeded: Callable that reports the overrun and exits
+            grace_seconds: CPU seconds to run untraced before counting
+        """
+        self.limit = limit
+        self.steps = 0
+        self.on_exceeded = on_exceeded
+        self.grace_seconds = grace_seconds
+        self._single_line_loops = {}
+
+    def __call__(self, frame, event, arg):
+        """Global trace hook: only trace frames of the submission."""
+        code = frame.f_code
+        if code.co_filename != SUBMISSION_FILENAME:
+            return None
+        if code not in self._single_line_loops:
+            self._single_line_loops[code] = has_single_line_loop(code)
+        if self._single_line_loops[code]:
+            frame.f_trace_opcodes = True
+        return self._trace_line
+
+    def _trace_line(self, frame, event, arg):
+        if event == 'line' or event == 'opcode':
+            self.steps += 1
+            if self.steps > self.limit:
+                self.uninstall()
+                self.on_exceeded()
+        return self._trace_line
+
+    def install(self):
+        """Start counting (after the grace period) in this thread and in threads the user starts."""
+        if self.grace_seconds and hasattr(signal, 'setitimer'):
+            signal.signal(signal.SIGPROF, self._start_counting)
+            signal.setitimer(signal.ITIMER_PROF, self.grace_seconds)
+        else:
+            self._start_counting(None, None)
+
+    def _start_counting(self, signum, frame):
+        """Trace new frames and the submission's frames already running."""
+        sys.settrace(self)
+        threading.settrace(self)
+        while frame is not None:
+            frame.f_trace = self(frame, 'call', None)
+            frame = frame.f_back
+
+    def uninstall(self):
+        """Stop counting."""
+        if hasattr(signal, 'setitimer'):
+            signal.setitimer(signal.ITIMER_PROF, 0)
+        sys.settrace(None)
+        threading.settrace(None)
+
+
+def has_single_line_loop(code) -> bool:
+    """Check for a backward jump that stays on one source line."""
+    instructions = list(dis.get_instructions(code))
+    lines = {instruction.offset: instruction.positions.lineno for instruction in instructions}
+    for instruction in instructions:
+        if 'BACKWARD' in instruction.opname and lines.get(instruction.argval) == instruction.positions.lineno:
+            return True
+    return False
+
+
+def exceeded_limit(error: BaseException):
+    """Get the resource limit an exception signals ('memory', 'file_size'), if any."""
+    if isinstance(error, MemoryError):
+        return 'memory'
+    if isinstance(error, OSError) and error.errno == errno.EFBIG:
+        # Python ignores SIGXFSZ, so RLIMIT_FSIZE surfaces as EFBIG
+        return 'file_size'
+    return None
+
+
+def limit_cpu_time(seconds: int):
+    """Cap this process' CPU time; the kernel sends SIGXCPU when it runs out."""
+    try:
+        import resource
+    except ImportError:
+        # No rlimits on Windows; the wall-clock timeout still applies
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY:
+        seconds = min(seconds, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (seconds, hard))
+
+
+class CapturedOutput(StringIO):
+    """
+    Stdout replacement for the user code.
+
+    Forwards what is printed to the real stdout and keeps a copy for the
+    output assertions, both bounded to `limit` characters.
+    """
+
+    def __init__(self, stream, limit: int = MAX_OUTPUT_LENGTH):
+        """
+        Initialize capture.
+
+        Args:
+            stream: Real stdout to forward to
+            limit: Maximum number of characters to keep and forward
+        """
+        super().__init__()
+        self.stream = stream
+        self.limit = limit
+        self.size = 0
+        self.truncated = False
+
+    def write(self, text: str) -> int:
+        """Keep and forward what fits under the limit."""
+        room = self.limit - self.size
+        if len(text) > room:
+            self.truncated = True
+            text = text[:max(room, 0)]
+        if text:
+            super().write(text)
+            self.stream.write(text)
+            self.size += len(text)
+        return len(text)
+
+    def flush(self):
+        """Flush the real stdout."""
+        self.stream.flush()
+
+
+def observe_test(test: Dict, namespace: Dict, captured_output: CapturedOutput, fixtures=None) -> Dict[str, Any]:
+    """
+    Exercise the user's code for one test probe and report what was observed.
+
+    The runner has no expected values (see grading.py): the reader of the
+    result channel grades the observation.
+
+    Args:
+        test: Test probe dictionary
+        namespace: Globals the user code was executed in
+        captured_output: Buffer holding everything the user code printed
+        fixtures: FixtureStore that resolves {"$fixture": id} references
+
+    Returns:
+        Observation dictionary
+    """
+    test_type = test.get('type', 'assert_function')
+    summarize = summarize_value if test.get('summarize') else (lambda value: value)
+
+    try:
+        if fixtures is not None and fixture_refs(test):
+            # A fresh copy per test, so mutating an input cannot leak
+            test = fixtures.resolve(test)
+
+        if test_type == 'assert_function':
+            # Test function return value
+            function_name = test.get('function_name', 'solution')
+            if function_name not in namespace:
+                raise NameError(f"name '{function_name}' is not defined")
+            function = namespace[function_name]
+            test_input = test.get('input', [])
+
+            if isinstance(test_input, list):
+                actual = function(*test_input)
+            else:
+                actual = function(test_input)
+            return {'digest': value_digest(actual), 'value': summarize(actual)}
+
+        if test_type in ('assert_output', 'assert_output_contains', 'assert_output_regex'):
+            return {'output': captured_output.getvalue()}
+
+        if test_type in ('assert_variable_exists', 'assert_variable_type',
+                         'assert_variable_length', 'assert_variable_value'):
+            var_name = test.get('variable_name', '')
+            if var_name not in namespace:
+                return {'exists': False}
+            value = namespace[var_name]
+            observation = {'exists': True}
+            if test_type == 'assert_variable_type':
+                observation['type_name'] = type(value).__name__
+            elif test_type == 'assert_variable_length':
+                observation['length'] = len(value)
+            elif test_type == 'assert_variable_value':
+                observation.update(digest=value_digest(value), value=summarize(value))
+            return observation
+
+        if test_type == 'assert_custom':
+            # Custom validation expression, evaluated against the user's
+            # globals with the captured output available by name
+            helpers = {
+                'captured_output': captured_output,
+                'output': captured_output.getvalue()
+            }
+            return {'passed': bool(eval(test.get('code', 'True'), namespace, helpers))}
+
+        # Unknown test type, reported by the grader
+        return {}
+
+    except Exception as e:
+        if exceeded_limit(e):
+            # Resource limits end the run, not just this test
+            raise
+        return {'error': str(e)}
+
+
+def _user_traceback(tb):
+    """Drop runner frames so tracebacks start at the submission."""
+    while tb is not None and tb.tb_frame.f_code.co_filename != SUBMISSION_FILENAME:
+        tb = tb.tb_next
+    return tb
+
+
+def hide_runner_modules(namespace: Dict[str, Any]):
+    """
+    Keep the runner's own modules out of the submission's imports.
+
+    Run as a script or in a fork server child, the runner and its siblings
+    are top-level modules and `__main__` is the runner (or the fork server);
+    the submission gets its own namespace as `__main__` instead.
+    """
+    for name in HIDDEN_MODULES:
+        sys.modules.pop(name, None)
+    main_module = types.ModuleType('__main__')
+    main_module.__dict__.update(namespace)
+    sys.modules['__main__'] = main_module
+    return main_module.__dict__
+
+
+def run_plan(plan: Dict[str, Any], result_fd: int) -> int:
+    """
+    Execute the user code and report an observation per test probe.
+
+    Each observation is sent on the result channel as soon as it is known;
+    an uncaught exception in the user code is reported on stderr like
+    `python file.py` would, and no `complete` frame is sent.
+
+    Args:
+        plan: Dictionary with `code`, `tests` (probes, see grading.py) and
+            optional `nonce`, `output_limit`, `test_offset`, `stream`,
+            `isolation`, `limits`, `step_limit`, `cpu_seconds`, `fixture_dir`
+            and `preload`
+        result_fd: File descriptor of the result channel
+
+    Returns:
+        Process exit code
+    """
+    # Out of the plan (and the user code's reach) before the code runs
+    nonce = plan.pop('nonce', None)
+    # Bound here, so replacing the module globals does not change them
+    write = write_frame
+    observe = observe_test
+
+    def send(message: Dict[str, Any]):
+        if nonce is not None:
+            message['nonce'] = nonce
+        write(result_fd, message)
+
+    original_stdout = sys.stdout
+    captured_output = CapturedOutput(original_stdout, plan.get('output_limit') or MAX_OUTPUT_LENGTH)
+    namespace = {'__name__': '__main__', '__builtins__': builtins}
+    tests: List[Dict] = plan.get('tests') or []
+    offset = plan.get('test_offset', 0)
+    fixtures = get_store(plan['fixture_dir']) if plan.get('fixture_dir') else None
+    if fixtures:
+        # Map fixtures before isolation hides the filesystem
+        try:
+            fixtures.preload(tests)
+        except FixtureError:
+            pass  # reported by the tests that use them
+    for name in plan.get('preload') or ():
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass  # the submission's own import reports it
+    isolation = Isolation(plan['isolation']) if plan.get('isolation') is not None else None
+    applied = isolation.apply() if isolation else None
+    limits = isolation.limits if isolation else plan.get('limits') or {}
+    if not isolation and limits:
+        try:
+            apply_rlimits(limits)
+        except (ValueError, OSError):
+            pass  # e.g. a limit the host does not support
+    if plan.get('cpu_seconds'):
+        limit_cpu_time(int(plan['cpu_seconds']))
+    if not __package__:
+        namespace = hide_runner_modules(namespace)
+    send({'type': 'started', 'isolation': applied})
+
+    def stop_runaway_code():
+        sys.stdout = original_stdout
+        original_stdout.flush()
+        send({'type': 'limit', 'limit': 'steps', 'value': plan['step_limit']})
+        if isolation:
+            isolation.cleanup()
+        os._exit(1)
+
+    step_counter = StepCounter(
+        plan['step_limit'], stop_runaway_code, plan.get('step_grace_seconds') or 0
+    ) if plan.get('step_limit') else None
+
+    sys.stdout = captured_output
+    try:
+        code = compile(plan.get('code', ''), SUBMISSION_FILENAME, 'exec')
+        if step_counter:
+            step_counter.install()
+        exec(code, namespace)
+        for i, test in enumerate(tests):
+            if plan.get('stream'):
+                send({
+                    'type': 'test_started',
+                    'test_number': offset + i + 1,
+                    'description': test.get('description', f'Test {offset + i + 1}')
+                })
+            test_started = time.perf_counter()
+            observation = observe(test, namespace, captured_output, fixtures)
+            observation['duration_ms'] = round((time.perf_counter() - test_started) * 1000, 3)
+            send({'type': 'test', 'observation': observation})
+    except SystemExit:
+        raise
+    except Exception as e:
+        sys.stdout = original_stdout
+        limit = exceeded_limit(e)
+        if limit:
+            value = limits.get('memory_mb' if limit == 'memory' else 'file_size_mb')
+            send({'type': 'limit', 'limit': limit, 'value': value})
+            return 1
+        traceback.print_exception(type(e), e, _user_traceback(e.__traceback__))
+        return 1
+    finally:
+        if step_counter:
+            step_counter.uninstall()
+        sys.stdout = original_stdout
+        original_stdout.flush()
+        if isolation:
+            isolation.cleanup()
+
+    send({
+        'type': 'complete',
+        'output_truncated': captured_output.truncated,
+        'isolation': applied,
+        'max_rss_kb': peak_rss_kb()
+    })
+    return 0
+
+
+def peak_rss_kb():
+    """Peak resident memory of this process image (Linux), or None."""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def isolate_import_path():
+    """Keep the application's own modules out of the submission's reach."""
+    runner_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path[:] = [p for p in sys.path if os.path.abspath(p or os.curdir) != runner_dir]
+
+
+def main():
+    """Run a plan read from stdin (used when no fork server is available)."""
+    parser = argparse.ArgumentParser(description='Run a Python test plan')
+    channel = parser.add_mutually_exclusive_group(required=True)
+    channel.add_argument('--result-fd', type=int, help='Result channel file descriptor')
+    channel.add_argument('--result-handle', type=int, help='Result channel pipe handle (Windows)')
+    args = parser.parse_args()
+
+    result_fd = args.result_fd
+    if args.result_handle is not None:
+        import msvcrt
+        result_fd = msvcrt.open_osfhandle(args.result_handle, os.O_WRONLY)
+
+    plan = json.loads(sys.stdin.read())
+    sys.stdin = open(os.devnull)
+    sys.argv = [SUBMISSION_FILENAME]
+    isolate_import_path()
+    sys.exit(run_plan(plan, result_fd))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,17 @@
 # app/python_practice/sandbox.py
 """Docker sandbox configuration for Python code execution."""
 
+import os
 import docker
 from typing import Dict, Any
 
+from app.python_practice.container_pool import ContainerPool, ContainerPoolError
+
+SANDBOX_BUILD_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', 'sandbox', 'python'
+)
+SANDBOX_IMAGE_TAG = 'coding-python-sandbox:latest'
+
 
 class PythonSandbox:
     """
@@ -11,14 +19,26 @@ class PythonSandbox:
     TODO: Implement full Docker sandboxing for production.
     """
     
-    def __init__(self):
-        """Initialize Docker client."""
-        self.client = None
-        self.container_image = 'python:3.11-alpine'
+    def __init__(self, client=None, use_pool: bool = None):
+        """
+        Initialize Docker client.
+        
+        Args:
+            client: Docker client to use instead of docker.from_env()
+            use_pool: Run code in warm pooled containers (default: on unless
+                      PYTHON_SANDBOX_POOL=0)
+        """
+        self.client = client
+        # Set PYTHON_SANDBOX_IMAGE to the image from build_custom_image()
+        self.container_image = os.environ.get('PYTHON_SANDBOX_IMAGE', 'python:3.11-alpine')
         self.max_memory = '128m'
         self.max_cpu_period = 100000
         self.max_cpu_quota = 50000  # 50% of one core
         self.network_disabled = True
+        if use_pool is None:
+            use_pool = os.environ.get('PYTHON_SANDBOX_POOL', '1') != '0'
+        self.use_pool = use_pool
+        self.pool = None
         
     def connect(self):
         """Connect to Docker daemon."""
@@ -48,6 +68,9 @@ class PythonSandbox:
                     'output': ''
                 }
         
+        if self.use_pool:
+            return self._execute_pooled(code, timeout)
+        
         result = {
             'status': 'error',
             'output': '',
@@ -64,6 +87,8 @@ class PythonSandbox:
                 cpu_period=self.max_cpu_period,
                 cpu_quota=self.max_cpu_quota,
                 network_disabled=self.network_disabled,
+                read_only=True,
+                tmpfs={'/tmp': 'rw,nosuid,nodev,size=16m'},
                 remove=True,
                 detach=False,
                 stdout=True,
@@ -94,12 +119,95 @@ class PythonSandbox:
         
         return result
     
-    def build_custom_image(self, requirements: list = None):
+    def get_pool(self) -> ContainerPool:
+        """Get the warm container pool, creating it on first use."""
+        if self.pool is None:
+            self.pool = ContainerPool(
+                self.client,
+                image=self.container_image,
+                mem_limit=self.max_memory,
+                cpu_period=self.max_cpu_period,
+                cpu_quota=self.max_cpu_quota
+            )
+        return self.pool
+    
+    def _execute_pooled(self, code: str, timeout: int) -> Dict[str, Any]:
+        """Execute code with `docker exec` in a warm pooled container."""
+        result = {
+            'status': 'error',
+            'output': '',
+            'error': '',
+            'exit_code': -1
+        }
+        
+        try:
+            run = self.get_pool().execute(code, timeout)
+            result['output'] = run['stdout']
+            result['exit_code'] = run['exit_code']
+            
+            if run['timed_out']:
+                result['status'] = 'timeout'
+                result['error'] = f'Code execution exceeded {timeout} second time limit'
+            elif run['oom_killed']:
+                result['status'] = 'memory_exceeded'
+                result['error'] = 'Code execution was stopped for using too much memory'
+            elif run['exit_code'] == 0:
+                result['status'] = 'success'
+            else:
+                result['error'] = run['stderr'] or f'Process exited with status {run["exit_code"]}'
+                
+        except ContainerPoolError as e:
+            result['error'] = str(e)
+            
+        except docker.errors.APIError as e:
+            result['error'] = f'Docker API error: {str(e)}'
+            
+        except Exception as e:
+            result['error'] = f'Unexpected error: {str(e)}'
+        
+        return result
+    
+    def pool_stats(self) -> Dict[str, Any]:
+        """Get container pool metrics (empty if the pool is not in use)."""
+        return self.pool.stats() if self.pool else {}
+    
+    def shutdown_pool(self):
+        """Remove the pooled containers."""
+        if self.pool:
+            self.pool.shutdown()
+            self.pool = None
+    
+    def build_custom_image(self, requirements: list = None, tag: str = SANDBOX_IMAGE_TAG) -> str:
         """
-        Build custom Docker image with allowed packages.
-        TODO: Implement for production use.
+        Build the hardened sandbox image from sandbox/python/Dockerfile.
+        
+        The allowed libraries are installed, byte-compiled and imported once
+        at build time, so runs on a read-only root never compile or warm
+        anything. New containers (including the pool's) use the built image.
+        
+        Args:
+            requirements: Pip requirement specifiers (default: sandbox/python/requirements.txt)
+            tag: Image tag
+            
+        Returns:
+            Tag of the built image
         """
-        pass
+        if not self.client and not self.connect():
+            raise RuntimeError('Docker is not available')
+        
+        buildargs = {'REQUIREMENTS': ' '.join(requirements)} if requirements else None
+        self.client.images.build(
+            path=os.path.abspath(SANDBOX_BUILD_DIR),
+            tag=tag,
+            buildargs=buildargs,
+            pull=True,
+            rm=True
+        )
+        
+        # Containers started from the old image are replaced
+        self.shutdown_pool()
+        self.container_image = tag
+        return tag
     
     def cleanup_containers(self):
         """Clean up stopped containers."""
@@ -114,3 +222,13 @@ class PythonSandbox:
 
 # Singleton instance
 sandbox = PythonSandbox()
+
+
+if __name__ == '__main__':
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Build the hardened Python sandbox image')
+    parser.add_argument('--tag', default=SANDBOX_IMAGE_TAG)
+    parser.add_argument('requirements', nargs='*', help='Override sandbox/python/requirements.txt')
+    args = parser.parse_args()
+    print(sandbox.build_custom_image(args.requirements or None, args.tag))
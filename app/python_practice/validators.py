@@ -1,9 +1,12 @@
 # app/python_practice/validators.py
 """Code validation and security checks for Python submissions."""
 
-import re
+import ast
+import hashlib
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Tuple
+from typing import Optional, Tuple
 from app.extensions import db
 
 
@@ -14,7 +17,11 @@ BANNED_IMPORTS = [
     'input', 'raw_input', 'execfile',
     'socket', 'urllib', 'requests', 'http',
     'pickle', 'shelve', 'marshal',
-    'ctypes', 'multiprocessing', 'threading'
+    'ctypes', 'multiprocessing', 'threading',
+    # The same functions under another name
+    'builtins', 'posix', 'nt', 'pty',
+    # The runner's own modules
+    'runner', 'channel', 'fixtures', 'grading', 'isolation', 'fork_server', '__main__'
 ]
 
 BANNED_KEYWORDS = [
@@ -31,11 +38,43 @@ ALLOWED_IMPORTS = [
     'statistics', 'decimal', 'fractions'
 ]
 
+# Builtins from BANNED_IMPORTS that are banned by name, so aliasing them
+# (`run = exec`) does not help
+BANNED_FUNCTIONS = {'eval', 'exec', 'compile', '__import__', 'open', 'file', 'input', 'raw_input', 'execfile'}
+
+# Names and attributes used to escape to objects the code should not reach
+BANNED_DUNDERS = {
+    '__builtins__', '__globals__', '__locals__', '__code__', '__dict__', '__class__',
+    '__subclasses__', '__bases__', '__base__', '__mro__', '__loader__', '__spec__',
+    '__closure__', '__func__', '__self__', '__getattribute__',
+    'f_globals', 'f_locals', 'f_builtins', 'f_back', 'tb_frame', 'gi_frame', 'cr_frame'
+}
+
+# Introspection builtins (reported as 'globals()' etc. like BANNED_KEYWORDS)
+BANNED_CALLS = {'globals', 'locals', 'vars', 'dir', 'help'}
+
+DYNAMIC_ATTRIBUTE_FUNCTIONS = {'getattr', 'setattr', 'delattr', 'hasattr'}
+
+# Size limits for constants
+MAX_RANGE = 100000
+MAX_EXPONENT = 1000
+MAX_REPEAT = 100000
+
+MAX_CODE_LENGTH = 10000
+VERDICT_CACHE_SIZE = 1024
+
+_verdicts = OrderedDict()
+_verdicts_lock = threading.Lock()
+
 
 def validate_python_code(code: str) -> Tuple[bool, str]:
     """
     Validate Python code for security issues.
     
+    The code is parsed once; a single walk of the tree checks imports,
+    names, attribute access and constant sizes, and the syntax check
+    compiles the same tree. Verdicts are cached by code hash.
+    
     Args:
         code: Python code to validate
         
@@ -46,40 +85,42 @@ def validate_python_code(code: str) -> Tuple[bool, str]:
         return False, 'Code cannot be empty'
     
     # Check code length
-    if len(code) > 10000:
+    if len(code) > MAX_CODE_LENGTH:
         return False, 'Code is too long (max 10,000 characters)'
     
-    # Check for banned imports
-    for banned in BANNED_IMPORTS:
-        patterns = [
-            rf'\bimport\s+{banned}\b',
-            rf'\bfrom\s+{banned}\b',
-            rf'__import__\s*\(\s*["\'{banned}]'
-        ]
-        for pattern in patterns:
-            if re.search(pattern, code, re.IGNORECASE):
-                return False, f'Banned import detected: {banned}'
-    
-    # Check for banned keywords
-    for keyword in BANNED_KEYWORDS:
-        if keyword in code:
-            return False, f'Banned keyword detected: {keyword}'
-    
-    # Check for suspicious patterns
-    suspicious_patterns = [
-        (r'while\s+True\s*:', 'Infinite loops are not allowed'),
-        (r'for\s+\w+\s+in\s+range\s*\(\s*\d{6,}', 'Loop range too large'),
-        (r'\*\*\s*\d{4,}', 'Exponentiation too large'),
-        (r'[\[\{].*[\]\}]\s*\*\s*\d{6,}', 'Data structure too large'),
-    ]
-    
-    for pattern, message in suspicious_patterns:
-        if re.search(pattern, code):
-            return False, message
-    
-    # Basic syntax check
+    key = hashlib.sha256(code.encode('utf-8', errors='surrogatepass')).hexdigest()
+    with _verdicts_lock:
+        verdict = _verdicts.get(key)
+        if verdict is not None:
+            _verdicts.move_to_end(key)
+            return verdict
+    
+    verdict = _validate_tree(code)
+    with _verdicts_lock:
+        _verdicts[key] = verdict
+        while len(_verdicts) > VERDICT_CACHE_SIZE:
+            _verdicts.popitem(last=False)
+    return verdict
+
+
+def _validate_tree(code: str) -> Tuple[bool, str]:
+    """Parse, check and compile code (uncached)."""
+    try:
+        tree = ast.parse(code, '<string>')
+    except SyntaxError as e:
+        return False, f'Syntax error: {str(e)}'
+    except Exception as e:
+        return False, f'Code validation error: {str(e)}'
+    
+    for node in ast.walk(tree):
+        problem = _check_node(node)
+        if problem:
+            return False, problem
+    
+    # Compile the parsed tree for the errors only the compiler reports
+    # (e.g. 'return' outside a function)
     try:
-        compile(code, '<string>', 'exec')
+        compile(tree, '<string>', 'exec')
     except SyntaxError as e:
         return False, f'Syntax error: {str(e)}'
     except Exception as e:
@@ -88,6 +129,154 @@ def validate_python_code(code: str) -> Tuple[bool, str]:
     return True, 'Code is valid'
 
 
+def _check_node(node: ast.AST) -> Optional[str]:
+    """Get the error message for a node, or None if it is allowed."""
+    if isinstance(node, ast.Import):
+        for alias in node.names:
+            module = alias.name.split('.')[0]
+            if module in BANNED_IMPORTS:
+                return f'Banned import detected: {module}'
+    
+    elif isinstance(node, ast.ImportFrom):
+        module = (node.module or '').split('.')[0]
+        if node.level == 0 and module in BANNED_IMPORTS:
+            return f'Banned import detected: {module}'
+    
+    elif isinstance(node, ast.Name):
+        if node.id in BANNED_DUNDERS:
+            return f'Banned keyword detected: {node.id}'
+        if node.id in BANNED_FUNCTIONS and isinstance(node.ctx, ast.Load):
+            return f'Banned import detected: {node.id}'
+        if node.id in ('globals', 'locals', 'vars') and isinstance(node.ctx, ast.Load):
+            return f'Banned keyword detected: {node.id}()'
+    
+    elif isinstance(node, ast.Attribute):
+        if node.attr in BANNED_DUNDERS:
+            return f'Banned keyword detected: {node.attr}'
+    
+    elif isinstance(node, ast.Constant):
+        if isinstance(node.value, str) and node.value in BANNED_DUNDERS:
+            return f'Banned keyword detected: {node.value}'
+    
+    elif isinstance(node, ast.Call):
+        return _check_call(node)
+    
+    elif isinstance(node, ast.While):
+        if _is_constant_true(node.test) and not _loop_can_exit(node):
+            return 'Infinite loops are not allowed'
+    
+    elif isinstance(node, (ast.For, ast.comprehension)):
+        if _is_large_range(node.iter):
+            return 'Loop range too large'
+    
+    elif isinstance(node, (ast.BinOp, ast.AugAssign)):
+        return _check_operation(node)
+    
+    return None
+
+
+def _check_call(node: ast.Call) -> Optional[str]:
+    """Check introspection calls and computed attribute names."""
+    if not isinstance(node.func, ast.Name):
+        return None
+    name = node.func.id
+    
+    if name in BANNED_CALLS:
+        return f'Banned keyword detected: {name}()'
+    
+    if name in DYNAMIC_ATTRIBUTE_FUNCTIONS and len(node.args) >= 2:
+        attribute = node.args[1]
+        if not (isinstance(attribute, ast.Constant) and isinstance(attribute.value, str)):
+            return 'Dynamic attribute access is not allowed'
+    
+    if name == 'pow' and len(node.args) == 2 and _constant_int(node.args[1]) >= MAX_EXPONENT:
+        return 'Exponentiation too large'
+    return None
+
+
+def _check_operation(node) -> Optional[str]:
+    """Check exponentiation and sequence repetition sizes."""
+    left = node.left if isinstance(node, ast.BinOp) else node.target
+    right = node.right if isinstance(node, ast.BinOp) else node.value
+    
+    if isinstance(node.op, ast.Pow) and _constant_int(right) >= MAX_EXPONENT:
+        return 'Exponentiation too large'
+    
+    if isinstance(node.op, ast.Mult):
+        for sequence, count in ((left, right), (right, left)):
+            if _is_sequence(sequence) and _constant_int(count) >= MAX_REPEAT:
+                return 'Data structure too large'
+    return None
+
+
+def _is_sequence(node: ast.AST) -> bool:
+    """Check if a node builds a list, tuple, set, dict or string."""
+    if isinstance(node, ast.Constant):
+        return isinstance(node.value, (str, bytes))
+    return isinstance(node, (ast.List, ast.Tuple, ast.Set, ast.Dict, ast.ListComp, ast.JoinedStr))
+
+
+def _constant_int(node: ast.AST) -> int:
+    """
+    Fold a constant integer expression such as `10 ** 9`.
+    
+    Returns:
+        Its value (capped to avoid computing huge numbers), or 0 if the node
+        is not a constant integer expression
+    """
+    if isinstance(node, ast.Constant):
+        value = node.value
+        return abs(value) if isinstance(value, int) and not isinstance(value, bool) else 0
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        return _constant_int(node.operand)
+    if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Add, ast.Mult, ast.Pow, ast.LShift)):
+        left, right = _constant_int(node.left), _constant_int(node.right)
+        if isinstance(node.op, ast.Add):
+            return left + right
+        if isinstance(node.op, ast.Mult):
+            return min(left * right, 10 ** 18)
+        if isinstance(node.op, ast.LShift):
+            return left << min(right, 64)
+        if left <= 1 or right == 0:
+            return left
+        if right * left.bit_length() > 64:
+            return 10 ** 18
+        return left ** right
+    return 0
+
+
+def _is_constant_true(node: ast.AST) -> bool:
+    """Check if a loop condition is a truthy constant (`while True`, `while 1`)."""
+    return isinstance(node, ast.Constant) and bool(node.value)
+
+
+def _loop_can_exit(loop: ast.While) -> bool:
+    """Check for a break, return or raise that leaves this loop."""
+    pending = list(loop.body)
+    while pending:
+        node = pending.pop()
+        if isinstance(node, (ast.Break, ast.Return, ast.Raise)):
+            return True
+        # A break in a nested loop or function does not leave this loop
+        if isinstance(node, (ast.For, ast.AsyncFor, ast.While)):
+            pending.extend(node.orelse)
+            continue
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)):
+            continue
+        pending.extend(ast.iter_child_nodes(node))
+    return False
+
+
+def _is_large_range(node: ast.AST) -> bool:
+    """Check for range() with a constant bound of MAX_RANGE or more."""
+    return (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id == 'range'
+        and any(_constant_int(arg) >= MAX_RANGE for arg in node.args)
+    )
+
+
 def check_rate_limit(user_id: int, max_submissions: int = 10, time_window_minutes: int = 1) -> Tuple[bool, str]:
     """
     Check if user has exceeded rate limit for code submissions.
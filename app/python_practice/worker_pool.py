@@ -0,0 +1,313 @@
+"""
+Warm interpreter pool for Python code execution.
+
+Each worker is a long-lived fork server (see fork_server.py) that has already
+paid interpreter startup and the harness imports. A submission is handed to an
+idle worker, which forks a fresh child to run it, so the child is isolated from
+the web/Celery process and from every other submission while skipping the
+cold start of a new `python` process.
+
+Submissions that import a heavy allowed library (PYTHON_PRELOAD_MODULES,
+numpy and pandas by default) go to a second, smaller pool whose servers
+imported those libraries before forking, so the child finds them already
+in sys.modules instead of spending hundreds of milliseconds importing them.
+"""
+
+import atexit
+import os
+import queue
+import re
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from app.python_practice.channel import encode_frame, read_frame
+
+FORK_SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fork_server.py')
+
+# Extra time the parent waits for a response beyond the program timeout
+# (the fork server enforces the timeout itself and then reports back).
+RESPONSE_GRACE_SECONDS = 5
+
+# How long a run waits for a worker when every server of the pool is busy
+ACQUIRE_TIMEOUT_SECONDS = float(os.environ.get('PYTHON_WORKER_ACQUIRE_TIMEOUT', 30))
+
+PRELOAD_MODULES = tuple(
+    name.strip() for name in os.environ.get('PYTHON_PRELOAD_MODULES', 'numpy,pandas').split(',') if name.strip()
+)
+
+# Native thread pools (OpenBLAS, OpenMP, MKL) do not survive fork(); keep
+# them single-threaded in preloading servers
+PRELOAD_ENV = {'OPENBLAS_NUM_THREADS': '1', 'OMP_NUM_THREADS': '1', 'MKL_NUM_THREADS': '1'}
+
+
+class WorkerError(Exception):
+    """
+    Raised when a fork server dies or stops responding.
+
+    `started` is False only when the server failed before it received the
+    plan, so the user code cannot have run.
+    """
+
+    def __init__(self, message: str, started: bool = False):
+        super().__init__(message)
+        self.started = started
+
+
+class PoolBusy(WorkerError):
+    """
+    Raised when no worker becomes idle in time.
+
+    The pool is saturated, so the caller must not fall back to starting a
+    fresh interpreter either.
+    """
+
+
+class ForkServer:
+    """A single pre-initialised interpreter that forks one child per program."""
+
+    def __init__(self, preload: Tuple[str, ...] = ()):
+        """
+        Initialize fork server handle (the process starts on first use).
+
+        Args:
+            preload: Modules the server imports before forking children
+        """
+        self.preload = preload
+        self.process = None
+        self.runs = 0
+
+    def start(self):
+        """Start the fork server process."""
+        env = dict(os.environ)
+        env['PYTHONIOENCODING'] = 'utf-8'
+        env['PYTHONDONTWRITEBYTECODE'] = '1'
+        command = [sys.executable, FORK_SERVER_SCRIPT]
+        if self.preload:
+            env.update(PRELOAD_ENV)
+            command += ['--preload', ','.join(self.preload)]
+        self.process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            env=env,
+            close_fds=True
+        )
+
+    def is_alive(self) -> bool:
+        """Check whether the server process is running."""
+        return self.process is not None and self.process.poll() is None
+
+    def run(self, plan: Dict[str, Any], timeout: int,
+            on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+            checks: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        Run a test plan in a freshly forked child of this server.
+
+        Args:
+            plan: Test plan with `code` and test probes (see runner.py)
+            timeout: Maximum execution time in seconds
+            on_event: Optional callback for each result frame or output chunk
+                as the child produces it (see fork_server.py)
+            checks: Full test cases the server grades the child's
+                observations with (see grading.py)
+
+        Returns:
+            Dictionary with stdout, stderr, stdout_truncated, frames,
+            returncode and timed_out
+        """
+        if not self.is_alive():
+            try:
+                self.start()
+            except OSError as e:
+                raise WorkerError(f'Fork server could not start: {e}')
+
+        try:
+            request = {'plan': plan, 'timeout': timeout, 'stream': on_event is not None}
+            self.process.stdin.write(encode_frame(request))
+            self.process.stdin.write(encode_frame({'checks': checks or []}))
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise WorkerError(f'Fork server is not accepting work: {e}')
+
+        deadline = time.monotonic() + timeout + RESPONSE_GRACE_SECONDS
+        try:
+            response = read_frame(self.process.stdout.fileno(), deadline)
+            while 'event' in response:
+                on_event(response)
+                response = read_frame(self.process.stdout.fileno(), deadline)
+        except TimeoutError:
+            raise WorkerError('Fork server did not respond in time', started=True)
+        except EOFError:
+            raise WorkerError('Fork server exited unexpectedly', started=True)
+        self.runs += 1
+        return response
+
+    def stop(self):
+        """Stop the fork server process."""
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+        except Exception:
+            pass
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+
+class WorkerPool:
+    """Bounded pool of warm fork servers shared by the threads of a process."""
+
+    def __init__(self, size: Optional[int] = None, preload: Tuple[str, ...] = ()):
+        """
+        Initialize worker pool.
+
+        Args:
+            size: Maximum number of fork servers (default: CPU count)
+            preload: Modules every server imports before forking
+        """
+        self.size = size or int(os.environ.get('PYTHON_EXECUTOR_POOL_SIZE', 0)) or os.cpu_count() or 2
+        self.preload = tuple(preload)
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+
+    def warm(self, count: Optional[int] = None):
+        """Start fork servers ahead of the first submission."""
+        count = min(count or self.size, self.size)
+        while True:
+            with self._lock:
+                if self._created >= count:
+                    return
+                self._created += 1
+            server = ForkServer(self.preload)
+            try:
+                server.start()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+            self._idle.put(server)
+
+    def run(self, plan: Dict[str, Any], timeout: int,
+            on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+            checks: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        Execute a test plan on an idle worker.
+
+        Args:
+            plan: Test plan with `code` and test probes (see runner.py)
+            timeout: Maximum execution time in seconds
+            on_event: Optional callback for streamed events (see ForkServer.run)
+            checks: Full test cases to grade with (see ForkServer.run)
+
+        Returns:
+            Dictionary with stdout, stderr, stdout_truncated, frames,
+            returncode and timed_out
+        """
+        server = self._acquire()
+        try:
+            return server.run(plan, timeout, on_event, checks)
+        except Exception:
+            # A wedged or dead server, or one left mid-response by a failing
+            # event callback, is restarted before its next run
+            server.stop()
+            raise
+        finally:
+            self._idle.put(server)
+
+    def _acquire(self) -> ForkServer:
+        """Take an idle worker, creating one if the pool is not full, or raise PoolBusy."""
+        if self._closed:
+            raise WorkerError('Worker pool is shut down')
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return ForkServer(self.preload)
+        try:
+            return self._idle.get(timeout=ACQUIRE_TIMEOUT_SECONDS)
+        except queue.Empty:
+            raise PoolBusy(f'No worker became idle within {ACQUIRE_TIMEOUT_SECONDS:g} seconds')
+
+    def shutdown(self):
+        """Stop every idle fork server."""
+        self._closed = True
+        while True:
+            try:
+                server = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            server.stop()
+
+    def stats(self) -> Dict[str, int]:
+        """Get pool statistics."""
+        return {
+            'size': self.size,
+            'created': self._created,
+            'idle': self._idle.qsize(),
+            'preload': list(self.preload)
+        }
+
+
+_pools = {}
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def pool_enabled() -> bool:
+    """Check whether warm execution is supported and enabled."""
+    return hasattr(os, 'fork') and os.environ.get('PYTHON_EXECUTOR_POOL', '1') != '0'
+
+
+def needs_preload(code: str) -> bool:
+    """Check if code imports one of PRELOAD_MODULES."""
+    if not PRELOAD_MODULES:
+        return False
+    names = '|'.join(re.escape(name) for name in PRELOAD_MODULES)
+    return re.search(rf'^\s*(?:import|from)\s+(?:{names})\b', code or '', re.MULTILINE) is not None
+
+
+def get_worker_pool(preloaded: bool = False) -> WorkerPool:
+    """
+    Get a worker pool of the current process.
+
+    Args:
+        preloaded: Get the pool whose servers imported PRELOAD_MODULES
+            (sized by PYTHON_PRELOAD_POOL_SIZE, default 2)
+    """
+    global _pool_pid
+
+    # Pools are never shared across fork(): gunicorn and Celery workers each
+    # get their own fork servers.
+    with _pool_lock:
+        if _pool_pid != os.getpid():
+            _pools.clear()
+            _pool_pid = os.getpid()
+        pool = _pools.get(preloaded)
+        if pool is None:
+            if preloaded:
+                pool = WorkerPool(int(os.environ.get('PYTHON_PRELOAD_POOL_SIZE', 2)), PRELOAD_MODULES)
+            else:
+                pool = WorkerPool()
+            _pools[preloaded] = pool
+        return pool
+
+
+@atexit.register
+def _shutdown_pool():
+    """Stop fork servers when the process exits."""
+    if _pool_pid == os.getpid():
+        for pool in _pools.values():
+            pool.shutdown()
@@ -0,0 +1,239 @@
+"""
+MySQL Connection Pool
+Reuses authenticated connections to SQL sandboxes across requests
+
+Opening a connection costs a TCP handshake plus MySQL authentication, which
+is most of the round trip of a small practice query. Each sandbox (keyed by
+host, port, user and database) gets a bounded pool of connections shared by
+every request of the process. A borrowed connection is health-checked if it
+sat idle for a while, its session is reset (COM_RESET_CONNECTION: open
+transactions, user variables, temporary tables) before the next borrower
+gets it, and connections idle for too long are closed.
+"""
+import os
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+import mysql.connector
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SIZE = int(os.environ.get('SQL_POOL_MAX_SIZE', 4))
+DEFAULT_IDLE_TIMEOUT = float(os.environ.get('SQL_POOL_IDLE_TIMEOUT', 300))
+DEFAULT_ACQUIRE_TIMEOUT = float(os.environ.get('SQL_POOL_ACQUIRE_TIMEOUT', 10))
+
+# Idle connections used more recently than this are handed out unchecked
+HEALTH_CHECK_INTERVAL = 30
+
+
+class ConnectionPoolError(Exception):
+    """Raised when no connection becomes available in time"""
+
+
+class ConnectionPool:
+    """Bounded pool of connections to one sandbox database"""
+    
+    def __init__(self, db_config: Dict, max_size: Optional[int] = None,
+                 idle_timeout: Optional[float] = None, acquire_timeout: Optional[float] = None,
+                 connect: Optional[Callable] = None, max_idle: Optional[int] = None):
+        """
+        Initialize connection pool
+        
+        Args:
+            db_config: mysql.connector.connect() arguments
+            max_size: Maximum open connections (default: SQL_POOL_MAX_SIZE or 4)
+            idle_timeout: Seconds before an idle connection is closed (default: SQL_POOL_IDLE_TIMEOUT or 300)
+            acquire_timeout: Seconds to wait for a free connection (default: SQL_POOL_ACQUIRE_TIMEOUT or 10)
+            connect: Connection factory (default: mysql.connector.connect)
+            max_idle: Idle connections kept for reuse, the rest are closed on
+                return (default: max_size; 0 keeps none)
+        """
+        self.db_config = dict(db_config)
+        self.max_size = max_size or DEFAULT_MAX_SIZE
+        self.idle_timeout = idle_timeout if idle_timeout is not None else DEFAULT_IDLE_TIMEOUT
+        self.acquire_timeout = acquire_timeout if acquire_timeout is not None else DEFAULT_ACQUIRE_TIMEOUT
+        self._connect = connect or mysql.connector.connect
+        self.max_idle = self.max_size if max_idle is None else max_idle
+        
+        # (connection, last used) pairs, most recently used last
+        self._idle = []
+        self._open = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self.metrics = {
+            'borrowed': 0,
+            'created': 0,
+            'reused': 0,
+            'discarded': 0,
+            'evicted_idle': 0,
+            'wait_ms': 0
+        }
+    
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection for the duration of a with block
+        
+        A connection that raised an error is only returned to the pool if it
+        is still connected.
+        """
+        conn = self._acquire()
+        healthy = True
+        try:
+            yield conn
+        except Exception:
+            healthy = self._is_connected(conn)
+            raise
+        finally:
+            self._release(conn, healthy)
+    
+    def _acquire(self):
+        """Take a healthy idle connection or open a new one"""
+        started = time.monotonic()
+        deadline = started + self.acquire_timeout
+        
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise ConnectionPoolError('Connection pool is closed')
+                self._evict_idle()
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._open < self.max_size:
+                    self._open += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise ConnectionPoolError(
+                        f'No database connection became available within {self.acquire_timeout:g} seconds'
+                    )
+                self._condition.wait(remaining)
+            self.metrics['borrowed'] += 1
+            self.metrics['wait_ms'] += int((time.monotonic() - started) * 1000)
+        
+        if conn is not None:
+            if time.monotonic() - last_used < HEALTH_CHECK_INTERVAL or self._is_connected(conn):
+                self.metrics['reused'] += 1
+                return conn
+            self._discard(conn, release_slot=False)
+        
+        try:
+            conn = self._connect(**self.db_config)
+        except Exception:
+            with self._condition:
+                self._open -= 1
+                self._condition.notify()
+            raise
+        self.metrics['created'] += 1
+        return conn
+    
+    def _release(self, conn, healthy: bool = True):
+        """Reset a connection's session and return it to the pool"""
+        keep = healthy and not self._closed and len(self._idle) < self.max_idle
+        if keep:
+            try:
+                conn.reset_session()
+            except Exception as e:
+                logger.info(f"Discarding connection that failed to reset: {str(e)}")
+                keep = False
+        
+        if not keep:
+            self._discard(conn)
+            return
+        
+        with self._condition:
+            self._idle.append((conn, time.monotonic()))
+            self._condition.notify()
+    
+    def _discard(self, conn, release_slot: bool = True):
+        """Close a connection; its slot is freed unless a replacement takes it"""
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._condition:
+            self.metrics['discarded'] += 1
+            if release_slot:
+                self._open -= 1
+                self._condition.notify()
+    
+    def _evict_idle(self):
+        """Close connections idle longer than idle_timeout (lock held)"""
+        cutoff = time.monotonic() - self.idle_timeout
+        while self._idle and self._idle[0][1] < cutoff:
+            conn, _ = self._idle.pop(0)
+            self._open -= 1
+            self.metrics['evicted_idle'] += 1
+            try:
+                conn.close()
+            except Exception:
+                pass
+    
+    @staticmethod
+    def _is_connected(conn) -> bool:
+        """Ping the server"""
+        try:
+            return bool(conn.is_connected())
+        except Exception:
+            return False
+    
+    def close(self):
+        """Close every idle connection; borrowed ones are closed on return"""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._condition.notify_all()
+        for conn, _ in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+    
+    def stats(self) -> Dict:
+        """Get pool statistics"""
+        with self._condition:
+            return dict(
+                self.metrics,
+                open=self._open,
+                idle=len(self._idle),
+                max_size=self.max_size
+            )
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _pool_key(db_config: Dict) -> tuple:
+    return (db_config.get('host'), db_config.get('port'), db_config.get('user'), db_config.get('database'))
+
+
+def get_pool(db_config: Dict, **options) -> ConnectionPool:
+    """Get the process-wide pool of a sandbox database; options apply when it is created"""
+    key = _pool_key(db_config)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(db_config, **options)
+        return pool
+
+
+def close_pool(db_config: Dict):
+    """Close a sandbox's pool (its server restarted or went away)"""
+    with _pools_lock:
+        pool = _pools.pop(_pool_key(db_config), None)
+    if pool:
+        pool.close()
+
+
+def pool_stats() -> Dict[str, Dict]:
+    """Get statistics of every pool, keyed by host:port/database"""
+    with _pools_lock:
+        pools = list(_pools.items())
+    return {f'{host}:{port}/{database}': pool.stats() for (host, port, _, database), pool in pools}
@@ -0,0 +1,410 @@
+"""
+SQL Sandbox Container Pool
+Keeps initialized MySQL sandbox containers ready for new sessions
+
+A cold sandbox needs a MySQL container to start and initialize its data
+directory, which takes 10-40 seconds. The pool starts containers ahead of
+time and hands a ready one to a session in a single Docker call.
+
+The pool is opt-in (SQL_SANDBOX_POOL_SIZE, default 0) and only used by the
+docker sandbox backend.
+
+A container's state is its name, and Docker names are unique and renames
+atomic, so several web and Celery processes can share one pool without a
+coordinator:
+    
+    sql_sandbox_pool_starting_<slot>  ->  started, MySQL initializing
+    sql_sandbox_pool_ready_<slot>     ->  accepting connections, claimable
+    sql_sandbox_<user>_<session>      ->  claimed by a session
+
+Slots run from 0 to the pool size - 1. Refilling starts a container under a
+free slot's name, so when several processes refill at once only one of
+them gets each slot and the pool never grows past its size.
+
+Claiming renames a ready container, addressed by its ready name, to the
+session's name; if another process got there first the old name no longer
+resolves, the rename fails and the next one is tried. Docker labels cannot
+be changed, so the claim time and the session's labels are written to
+CLAIM_FILE in the container (see claim_info). A background thread per
+process refills the pool to its size and retires ready containers that sat
+idle too long. Used containers are never returned: sessions remove theirs
+on cleanup.
+"""
+import io
+import json
+import os
+import random
+import tarfile
+import threading
+import time
+import uuid
+import logging
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import mysql.connector
+
+logger = logging.getLogger(__name__)
+
+SANDBOX_IMAGE = 'sql_sandbox:latest'
+POOL_PREFIX = 'sql_sandbox_pool_'
+STARTING_PREFIX = POOL_PREFIX + 'starting_'
+READY_PREFIX = POOL_PREFIX + 'ready_'
+
+DEFAULT_POOL_SIZE = int(os.environ.get('SQL_SANDBOX_POOL_SIZE', 0))
+DEFAULT_MAX_IDLE = float(os.environ.get('SQL_SANDBOX_POOL_MAX_IDLE', 600))
+REFILL_INTERVAL = float(os.environ.get('SQL_SANDBOX_POOL_REFILL_INTERVAL', 5))
+
+# Written into a container when a session claims it
+CLAIM_FILE = '/sql_sandbox_claim.json'
+
+# Credentials baked into every sandbox container
+SANDBOX_DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'sandbox_user',
+    'password': 'sandbox_pass',
+    'database': 'sandbox_db'
+}
+
+
+def container_options() -> Dict:
+    """Get the containers.run() arguments shared by pooled and per-session sandboxes"""
+    return {
+        'image': SANDBOX_IMAGE,
+        'detach': True,
+        'remove': False,  # Don't auto-remove so we can reuse containers
+        'mem_limit': '512m',
+        'cpu_quota': 50000,  # 50% of one CPU
+        'publish_all_ports': True,  # Auto-publish all exposed ports
+        'environment': {
+            'MYSQL_ROOT_PASSWORD': 'sandbox_root_pass',
+            'MYSQL_DATABASE': 'sandbox_db',
+            'MYSQL_USER': 'sandbox_user',
+            'MYSQL_PASSWORD': 'sandbox_pass'
+        }
+    }
+
+
+def host_port(container) -> Optional[int]:
+    """Get the host port mapped to MySQL port 3306, if bound"""
+    bindings = (container.attrs.get('NetworkSettings') or {}).get('Ports') or {}
+    if not bindings.get('3306/tcp'):
+        return None
+    return int(bindings['3306/tcp'][0]['HostPort'])
+
+
+def claim_info(container) -> Optional[Dict]:
+    """Get the labels and claimed_at time recorded when a pooled container was claimed"""
+    try:
+        stream, _ = container.get_archive(CLAIM_FILE)
+        with tarfile.open(fileobj=io.BytesIO(b''.join(stream))) as archive:
+            member = archive.getmembers()[0]
+            return json.loads(archive.extractfile(member).read())
+    except Exception:
+        return None
+
+
+def mysql_accepts_connections(container) -> bool:
+    """Check whether a sandbox container's MySQL server accepts logins"""
+    port = host_port(container)
+    if port is None:
+        return False
+    try:
+        conn = mysql.connector.connect(**SANDBOX_DB_CONFIG, port=port, connection_timeout=2)
+        conn.close()
+        return True
+    except mysql.connector.Error:
+        return False
+
+
+class SQLContainerPool:
+    """Pool of pre-started, initialized MySQL sandbox containers"""
+    
+    def __init__(self, client, size: Optional[int] = None, max_idle: Optional[float] = None,
+                 ready_timeout: float = 90, probe: Optional[Callable] = None):
+        """
+        Initialize container pool
+        
+        Args:
+            client: Docker client (docker.from_env() or a compatible fake)
+            size: Ready plus starting containers to keep (default: SQL_SANDBOX_POOL_SIZE or 0)
+            max_idle: Seconds a ready container may wait for a session (default: SQL_SANDBOX_POOL_MAX_IDLE or 600)
+            ready_timeout: Seconds MySQL may take to initialize
+            probe: Readiness check for a container (default: mysql_accepts_connections)
+        """
+        self.client = client
+        self.size = size if size is not None else DEFAULT_POOL_SIZE
+        self.max_idle = max_idle if max_idle is not None else DEFAULT_MAX_IDLE
+        self.ready_timeout = ready_timeout
+        self.probe = probe or mysql_accepts_connections
+        
+        self._refill_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._stopped = False
+        self.metrics = {
+            'claims': 0,
+            'misses': 0,
+            'claim_conflicts': 0,
+            'started': 0,
+            'start_failures': 0,
+            'ready': 0,
+            'retired_idle': 0,
+            'init_ms_total': 0,
+            'claim_ms_total': 0
+        }
+    
+    def _list(self, prefix: str) -> List:
+        """List pool containers whose name starts with a prefix"""
+        containers = self.client.containers.list(all=True, filters={'name': prefix})
+        # The name filter matches substrings
+        return [c for c in containers if c.name.startswith(prefix)]
+    
+    def _count(self, metric: str, amount: int = 1):
+        """Add to a metric (claims and refills happen on different threads)"""
+        with self._metrics_lock:
+            self.metrics[metric] += amount
+    
+    def claim(self, name: str, labels: Optional[Dict[str, str]] = None):
+        """
+        Atomically take a ready container and rename it for a session
+        
+        Args:
+            name: Container name of the session
+            labels: The session's container labels (user_id, session_id),
+                recorded in CLAIM_FILE with the claim time
+        
+        Returns:
+            The claimed container, or None if no container is ready
+        """
+        started = time.monotonic()
+        candidates = self._list(READY_PREFIX)
+        # Spread concurrent claimers over the candidates
+        random.shuffle(candidates)
+        
+        for container in candidates:
+            try:
+                self._rename(container, name)
+            except Exception:
+                # Claimed by another process (or retired) in the meantime
+                self._count('claim_conflicts')
+                continue
+            if container.status != 'running':
+                self._remove(container)
+                continue
+            self._record_claim(container, labels or {})
+            self._count('claims')
+            self._count('claim_ms_total', int((time.monotonic() - started) * 1000))
+            logger.info(f"Claimed pooled SQL sandbox for {name}")
+            self._wakeup.set()
+            return container
+        
+        self._count('misses')
+        self._wakeup.set()
+        return None
+    
+    def _record_claim(self, container, labels: Dict[str, str]):
+        """Write the claim time and the session's labels to CLAIM_FILE"""
+        data = json.dumps(dict(labels, claimed_at=datetime.utcnow().isoformat())).encode('utf-8')
+        archive = io.BytesIO()
+        with tarfile.open(fileobj=archive, mode='w') as tar:
+            member = tarfile.TarInfo(os.path.basename(CLAIM_FILE))
+            member.size = len(data)
+            member.mtime = int(time.time())
+            tar.addfile(member, io.BytesIO(data))
+        try:
+            container.put_archive(os.path.dirname(CLAIM_FILE), archive.getvalue())
+        except Exception as e:
+            # Cleanup then measures the container's age from its start
+            logger.error(f"Failed to record claim of {container.name}: {str(e)}")
+    
+    def _free_slots(self) -> List[int]:
+        """Get the slots with neither a starting nor a ready container"""
+        taken = set()
+        for prefix in (STARTING_PREFIX, READY_PREFIX):
+            for container in self._list(prefix):
+                slot = container.name[len(prefix):]
+                if slot.isdigit():
+                    taken.add(int(slot))
+        return [slot for slot in range(self.size) if slot not in taken]
+    
+    def refill(self):
+        """Start containers in the free slots and wait for them to initialize"""
+        with self._refill_lock:
+            starting = []
+            for slot in self._free_slots():
+                try:
+                    starting.append(self._start_container(slot))
+                except Exception as e:
+                    if getattr(e, 'status_code', None) == 409:
+                        # Another process is filling this slot
+                        continue
+                    self._count('start_failures')
+                    logger.error(f"Failed to start pooled SQL sandbox: {str(e)}")
+                    break
+            
+            for container, started in self._wait_ready(starting):
+                try:
+                    # Fails if the slot's previous container is still unclaimed
+                    self._rename(container, READY_PREFIX + container.name[len(STARTING_PREFIX):])
+                except Exception as e:
+                    logger.error(f"Failed to mark SQL sandbox ready: {str(e)}")
+                    self._remove(container)
+                    continue
+                self._count('ready')
+                self._count('init_ms_total', int((time.monotonic() - started) * 1000))
+    
+    def _start_container(self, slot: int) -> tuple:
+        """Start the container of a pool slot (fails if the name is taken)"""
+        container = self.client.containers.run(
+            name=f'{STARTING_PREFIX}{slot}',
+            labels={
+                'created_at': datetime.utcnow().isoformat(),
+                'type': 'sql_sandbox',
+                'pool': '1'
+            },
+            **container_options()
+        )
+        self._count('started')
+        return container, time.monotonic()
+    
+    def _wait_ready(self, starting: List[tuple]):
+        """Yield (container, start time) as each container's MySQL comes up"""
+        pending = list(starting)
+        deadline = time.monotonic() + self.ready_timeout
+        while pending and not self._stopped:
+            for item in list(pending):
+                container = item[0]
+                try:
+                    container.reload()
+                    if container.status not in ('created', 'running'):
+                        raise RuntimeError(f"container {container.status}")
+                    ready = self.probe(container)
+                except Exception as e:
+                    logger.error(f"Pooled SQL sandbox failed to start: {str(e)}")
+                    self._count('start_failures')
+                    pending.remove(item)
+                    self._remove(container)
+                    continue
+                if ready:
+                    pending.remove(item)
+                    yield item
+            if time.monotonic() > deadline:
+                break
+            if pending:
+                time.sleep(0.5)
+        
+        for container, _ in pending:
+            self._count('start_failures')
+            self._remove(container)
+    
+    def retire_idle(self):
+        """Remove ready containers that waited longer than max_idle"""
+        now = datetime.utcnow()
+        for container in self._list(READY_PREFIX):
+            created_at = container.labels.get('created_at')
+            if created_at and (now - datetime.fromisoformat(created_at)).total_seconds() > self.max_idle:
+                # Renaming first makes sure no session claims it meanwhile
+                try:
+                    self._rename(container, POOL_PREFIX + 'retired_' + uuid.uuid4().hex[:12])
+                except Exception:
+                    continue
+                self._count('retired_idle')
+                self._remove(container)
+    
+    def _rename(self, container, new_name: str):
+        """
+        Rename a container addressed by its current name
+        
+        Addressing by name rather than id makes the rename a compare-and-swap:
+        it fails if another process renamed the container first.
+        """
+        self.client.api.rename(container.name, new_name)
+        container.reload()
+    
+    def _remove(self, container):
+        """Force-remove a container"""
+        try:
+            container.remove(force=True)
+        except Exception as e:
+            logger.error(f"Failed to remove SQL sandbox {container.name}: {str(e)}")
+    
+    def start(self):
+        """Start the background refill thread of this process"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name='sql-sandbox-pool', daemon=True)
+        self._thread.start()
+    
+    def _run(self):
+        while not self._stopped:
+            try:
+                self.retire_idle()
+                self.refill()
+            except Exception as e:
+                logger.error(f"SQL sandbox pool maintenance failed: {str(e)}")
+            self._wakeup.wait(REFILL_INTERVAL)
+            self._wakeup.clear()
+    
+    def stop(self):
+        """Stop the refill thread"""
+        self._stopped = True
+        self._wakeup.set()
+    
+    def shutdown(self):
+        """Stop refilling and remove every unclaimed pool container"""
+        self.stop()
+        for container in self._list(POOL_PREFIX):
+            self._remove(container)
+    
+    def stats(self) -> Dict:
+        """Get pool metrics and current ready/starting counts"""
+        try:
+            ready = len(self._list(READY_PREFIX))
+            starting = len(self._list(STARTING_PREFIX))
+        except Exception:
+            ready = starting = None
+        with self._metrics_lock:
+            metrics = dict(self.metrics)
+        claims = metrics['claims']
+        return dict(
+            metrics,
+            size=self.size,
+            ready_now=ready,
+            starting_now=starting,
+            hit_rate=round(claims / (claims + metrics['misses']) * 100, 2) if claims else 0.0,
+            avg_init_ms=metrics['init_ms_total'] // metrics['ready'] if metrics['ready'] else None
+        )
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def pool_enabled() -> bool:
+    """Check whether the container pool is enabled (SQL_SANDBOX_POOL_SIZE > 0, docker backend)"""
+    return DEFAULT_POOL_SIZE > 0 and os.environ.get('SQL_SANDBOX_BACKEND', 'docker') == 'docker'
+
+
+def current_pool_stats() -> Optional[Dict]:
+    """Get the stats of this process' pool, without creating one"""
+    pool = _pool if _pool_pid == os.getpid() else None
+    return pool.stats() if pool else None
+
+
+def get_container_pool(client=None) -> SQLContainerPool:
+    """Get this process' pool, starting its refill thread on first use"""
+    global _pool, _pool_pid
+    
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            if client is None:
+                import docker
+                client = docker.from_env()
+            _pool = SQLContainerPool(client)
+            _pool_pid = os.getpid()
+            _pool.start()
+        return _pool
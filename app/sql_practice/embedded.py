@@ -0,0 +1,259 @@
+"""
+Embedded SQL Execution
+Runs read-only exercise queries on an in-memory SQLite copy of the dataset
+
+Most graded SQL exercises are plain SELECTs over a small dataset, and they
+do not need a MySQL server. The sandbox sample database (init_db.sql) is
+loaded into SQLite once per process and cached. Every query runs on a private
+copy made with the SQLite backup API.
+
+The MySQL sandboxes only hold the sample database (they do not load an
+exercise's own database_schema/sample_data yet), so exercises that bring
+their own dataset are graded on MySQL too: both paths see the same data.
+
+The dataset DDL is translated so results match MySQL:
+    - AUTO_INCREMENT keys become INTEGER PRIMARY KEY
+    - text columns compare case-insensitively, like utf8mb4_unicode_ci
+    - ENUM columns sort in declaration order, through a collation per ENUM
+    - DECIMAL(p, s) columns come back as Decimal with s places
+
+Anything else that could behave differently sends the query to MySQL:
+    - MySQL-only syntax
+    - function calls beyond COUNT, UPPER and LOWER
+    - arithmetic, whose result types differ
+    - datasets that fail to load
+    - queries that fail on SQLite, so the error text stays MySQL's
+"""
+import os
+import re
+import time
+import hashlib
+import sqlite3
+import threading
+import logging
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from app.sql_practice.sandbox import init_script_statements
+from app.sql_practice.validators import SQLValidator
+
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = int(os.environ.get('SQL_EMBEDDED_CACHE_SIZE', 64))
+
+# Functions whose SQLite results match MySQL's
+ALLOWED_FUNCTIONS = {'COUNT', 'UPPER', 'LOWER'}
+
+# Keywords that may be followed by a parenthesis without being a function call
+PAREN_KEYWORDS = {'IN', 'EXISTS', 'FROM', 'JOIN', 'ON', 'AND', 'OR', 'NOT', 'WHERE', 'USING', 'SELECT', 'AS'}
+
+MYSQL_ONLY = re.compile(
+    r'\b(REGEXP|RLIKE|DIV|MOD|XOR|BINARY|COLLATE|INTERVAL|ROLLUP|DUAL|INTO|STRAIGHT_JOIN|'
+    r'SQL_CALC_FOUND_ROWS|FORCE|IGNORE|USE|LOCK|SHARE|UPDATE|INFORMATION_SCHEMA|RIGHT)\b'
+    r'|<=>|@'
+)
+
+# Star uses that are not multiplication
+STAR_USES = re.compile(r'COUNT\s*\(\s*\*\s*\)|(SELECT|DISTINCT|,)\s*\*|\.\s*\*')
+
+TEXT_TYPE = re.compile(r'\b(VARCHAR|CHAR|TINYTEXT|MEDIUMTEXT|LONGTEXT|TEXT)\b(\s*\(\s*\d+\s*\))?', re.IGNORECASE)
+DECIMAL_TYPE = re.compile(r'\b(DECIMAL|NUMERIC)\b(?:\s*\(\s*\d+\s*(?:,\s*(\d+)\s*)?\))?', re.IGNORECASE)
+AUTO_INCREMENT_KEY = re.compile(
+    r'\b\w*INT\b(\s*\(\d+\))?(\s+UNSIGNED)?(\s+NOT\s+NULL)?\s+AUTO_INCREMENT', re.IGNORECASE
+)
+ENUM_TYPE = re.compile(r'\bENUM\s*\([^)]*\)', re.IGNORECASE)
+SET_TYPE = re.compile(r'\bSET\s*\([^)]*\)', re.IGNORECASE)
+INLINE_UNIQUE_KEY = re.compile(r',\s*UNIQUE\s+(?:KEY|INDEX)\s+`?\w+`?\s*(\([^)]*\))', re.IGNORECASE)
+INLINE_KEY = re.compile(r',\s*(?:KEY|INDEX)\s+`?\w+`?\s*\([^)]*\)', re.IGNORECASE)
+TABLE_OPTIONS = re.compile(r'\)\s*(ENGINE|DEFAULT\s+CHARSET|CHARSET|COLLATE|AUTO_INCREMENT)\b[^)]*$', re.IGNORECASE)
+COLUMN_NOISE = re.compile(
+    r"\bUNSIGNED\b|\bAUTO_INCREMENT\b|\bON\s+UPDATE\s+CURRENT_TIMESTAMP\b|\bCOMMENT\s+'[^']*'", re.IGNORECASE
+)
+
+_registered_scales = set()
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+class EmbeddedDatabase:
+    """A loaded dataset; copies are made under a lock"""
+    
+    def __init__(self, master: sqlite3.Connection, collations: Dict[str, List[str]]):
+        self.master = master
+        self.collations = collations
+        self.lock = threading.Lock()
+    
+    def copy(self) -> sqlite3.Connection:
+        """Get a private copy of the dataset"""
+        conn = sqlite3.connect(':memory:', detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        register_collations(conn, self.collations)
+        with self.lock:
+            self.master.backup(conn)
+        conn.execute('PRAGMA query_only = ON')
+        return conn
+
+
+def register_collations(conn: sqlite3.Connection, collations: Dict[str, List[str]]):
+    """Register the ENUM collations a dataset's tables are declared with"""
+    for name, values in collations.items():
+        order = {value.lower(): index for index, value in enumerate(values)}
+        
+        def compare(a, b, order=order):
+            a, b = order.get(a.lower(), -1), order.get(b.lower(), -1)
+            return (a > b) - (a < b)
+        
+        conn.create_collation(name, compare)
+
+
+def _decimal_type(match) -> str:
+    """Map DECIMAL(p, s) to a declared type that converts back to Decimal"""
+    scale = int(match.group(2) or 0)
+    if scale not in _registered_scales:
+        quantum = Decimal(1).scaleb(-scale)
+        sqlite3.register_converter(f'DECIMAL_{scale}', lambda v, q=quantum: Decimal(v.decode()).quantize(q))
+        _registered_scales.add(scale)
+    return f'DECIMAL_{scale}'
+
+
+def _enum_type(match, collations: Dict[str, List[str]]) -> str:
+    """Map ENUM(...) to text sorted like MySQL sorts the ENUM"""
+    values = [v.replace("''", "'") for v in re.findall(r"'((?:[^']|'')*)'", match.group(0))]
+    name = 'ENUM_' + hashlib.sha1('\0'.join(values).encode('utf-8')).hexdigest()[:12]
+    collations[name] = values
+    return f'TEXT COLLATE {name}'
+
+
+def translate_statement(statement: str, collations: Optional[Dict[str, List[str]]] = None) -> str:
+    """Translate one MySQL dataset statement to SQLite, collecting ENUM collations"""
+    upper = statement.lstrip().upper()
+    if upper.startswith('INSERT IGNORE'):
+        return re.sub(r'^\s*INSERT\s+IGNORE', 'INSERT OR IGNORE', statement, flags=re.IGNORECASE)
+    if not upper.startswith('CREATE TABLE'):
+        return statement
+    
+    statement = AUTO_INCREMENT_KEY.sub('INTEGER', statement)
+    statement = TEXT_TYPE.sub(lambda m: f'{m.group(0)} COLLATE NOCASE', statement)
+    statement = ENUM_TYPE.sub(lambda m: _enum_type(m, collations if collations is not None else {}), statement)
+    statement = DECIMAL_TYPE.sub(_decimal_type, statement)
+    statement = SET_TYPE.sub('TEXT', statement)
+    statement = INLINE_UNIQUE_KEY.sub(r', UNIQUE \1', statement)
+    statement = INLINE_KEY.sub('', statement)
+    statement = TABLE_OPTIONS.sub(')', statement)
+    statement = COLUMN_NOISE.sub('', statement)
+    return statement
+
+
+def dataset_statements(exercise=None) -> Optional[tuple]:
+    """Get the statements that build an exercise's dataset, or None if MySQL must grade it"""
+    if exercise is not None and (getattr(exercise, 'database_schema', None) or getattr(exercise, 'sample_data', None)):
+        # Not what the sandbox grading it on MySQL holds
+        return None
+    return init_script_statements()
+
+
+def load_dataset(statements) -> Optional[EmbeddedDatabase]:
+    """Load a dataset into SQLite, or None if it does not translate"""
+    master = sqlite3.connect(':memory:', check_same_thread=False)
+    collations = {}
+    try:
+        for statement in statements:
+            translated = translate_statement(statement, collations)
+            register_collations(master, collations)
+            master.execute(translated)
+        master.commit()
+    except sqlite3.Error as e:
+        logger.info(f"Dataset does not load into SQLite, using MySQL: {str(e)}")
+        master.close()
+        return None
+    return EmbeddedDatabase(master, collations)
+
+
+def get_dataset(exercise=None) -> Optional[EmbeddedDatabase]:
+    """Get the cached SQLite dataset of an exercise (keyed by its content)"""
+    statements = dataset_statements(exercise)
+    if statements is None:
+        return None
+    key = hashlib.sha256('\0'.join(statements).encode('utf-8')).hexdigest()
+    
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    
+    database = load_dataset(statements)
+    with _cache_lock:
+        _cache[key] = database
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return database
+
+
+def needs_mysql(query: str) -> bool:
+    """Check whether a query may behave differently on SQLite than on MySQL"""
+    normalized = SQLValidator.normalize_query(query).rstrip(';').strip()
+    if ';' in normalized or '"' in normalized:
+        return True
+    # String literals are compared as-is; MySQL backslash escapes are not
+    if re.search(r"'(?:[^']|'')*\\", normalized):
+        return True
+    sql = re.sub(r"'(?:[^']|'')*'", "''", normalized).upper()
+    
+    if not sql.startswith('SELECT') or MYSQL_ONLY.search(sql):
+        return True
+    
+    for name in re.findall(r'\b([A-Z_]\w*)\s*\(', sql):
+        if name not in ALLOWED_FUNCTIONS and name not in PAREN_KEYWORDS:
+            return True
+    
+    return bool(re.search(r'[-+*/%|&^~]', STAR_USES.sub('', sql)))
+
+
+def execute_embedded(query: str, exercise=None, timeout: float = 30) -> Optional[Dict]:
+    """
+    Run a read-only query on the exercise dataset in SQLite
+    
+    Returns:
+        The same dict as SQLSandbox.execute_query(), or None when the query
+        has to run on MySQL
+    """
+    if os.environ.get('SQL_EMBEDDED', '1') == '0' or needs_mysql(query):
+        return None
+    database = get_dataset(exercise)
+    if database is None:
+        return None
+    
+    start_time = time.time()
+    deadline = time.monotonic() + timeout
+    conn = database.copy()
+    try:
+        # Returning non-zero interrupts the query
+        conn.set_progress_handler(lambda: time.monotonic() > deadline, 10000)
+        cursor = conn.execute(SQLValidator.normalize_query(query).rstrip(';'))
+        columns = [desc[0] for desc in cursor.description or []]
+        results = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    except sqlite3.OperationalError as e:
+        if str(e) == 'interrupted':
+            return {
+                'success': False,
+                'error': f'Query exceeded the time limit of {timeout:g} seconds',
+                'execution_time': round(time.time() - start_time, 3),
+                'backend': 'sqlite'
+            }
+        logger.info(f"Embedded query failed, using MySQL: {str(e)}")
+        return None
+    except (sqlite3.Error, ValueError) as e:
+        # MySQL gives the error (or the result) the user expects
+        logger.info(f"Embedded query failed, using MySQL: {str(e)}")
+        return None
+    finally:
+        conn.close()
+    
+    return {
+        'success': True,
+        'results': results,
+        'columns': columns,
+        'row_count': len(results),
+        'execution_time': round(time.time() - start_time, 3),
+        'backend': 'sqlite'
+    }
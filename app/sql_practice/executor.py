@@ -8,7 +8,8 @@ from datetime import datetime
 import hashlib
 import json
 
-from app.sql_practice.sandbox import SQLSandbox
+from app.sql_practice.embedded import execute_embedded
+from app.sql_practice.sandbox import get_sandbox
 from app.sql_practice.validators import SQLValidator
 
 logger = logging.getLogger(__name__)
@@ -27,11 +28,18 @@ class SQLExecutor:
         """
         self.user_id = user_id
         self.session_id = session_id
-        self.sandbox = SQLSandbox(user_id, session_id)
+        self._sandbox = None
         self.validator = SQLValidator()
     
+    @property
+    def sandbox(self):
+        """Docker container or shared-server schema, per SQL_SANDBOX_BACKEND (created on first use)"""
+        if self._sandbox is None:
+            self._sandbox = get_sandbox(self.user_id, self.session_id)
+        return self._sandbox
+    
     def execute(self, query: str, read_only: bool = False, 
-                allow_delete: bool = False, timeout: int = 30) -> Dict:
+                allow_delete: bool = False, timeout: int = 30, exercise=None) -> Dict:
         """
         Execute SQL query with validation
         
@@ -40,6 +48,8 @@ class SQLExecutor:
             read_only: If True, only SELECT queries allowed
             allow_delete: If True, DELETE queries allowed
             timeout: Execution timeout in seconds
+            exercise: Exercise whose pristine dataset a read-only query may
+                      run on in embedded SQLite instead of the session's sandbox
         
         Returns:
             dict with execution results and metadata
@@ -63,18 +73,24 @@ class SQLExecutor:
                 'timestamp': start_time.isoformat()
             }
         
-        # Ensure sandbox is created
-        sandbox_result = self.sandbox.create_sandbox()
-        if not sandbox_result['success']:
-            return {
-                'success': False,
-                'execution_id': execution_id,
-                'errors': ['Failed to create sandbox: ' + sandbox_result.get('error', 'Unknown error')],
-                'timestamp': start_time.isoformat()
-            }
-        
-        # Execute query in sandbox
-        result = self.sandbox.execute_query(query)
+        # Plain SELECTs over an exercise dataset need no MySQL server
+        result = None
+        if read_only and exercise is not None:
+            result = execute_embedded(query, exercise, timeout=timeout)
+        
+        if result is None:
+            # Ensure sandbox is created
+            sandbox_result = self.sandbox.create_sandbox()
+            if not sandbox_result['success']:
+                return {
+                    'success': False,
+                    'execution_id': execution_id,
+                    'errors': ['Failed to create sandbox: ' + sandbox_result.get('error', 'Unknown error')],
+                    'timestamp': start_time.isoformat()
+                }
+            
+            # Execute query in sandbox
+            result = self.sandbox.execute_query(query)
         
         # Add metadata
         result['execution_id'] = execution_id
@@ -85,24 +101,26 @@ class SQLExecutor:
         # Log execution
         logger.info(
             f"SQL execution {execution_id} - User: {self.user_id}, "
-            f"Success: {result['success']}, Time: {result.get('execution_time', 0)}s"
+            f"Success: {result['success']}, Time: {result.get('execution_time', 0)}s, "
+            f"Backend: {result.get('backend', 'mysql')}"
         )
         
         return result
     
-    def validate_exercise_solution(self, query: str, expected_result: Dict) -> Dict:
+    def validate_exercise_solution(self, query: str, expected_result: Dict, exercise=None) -> Dict:
         """
         Validate exercise solution against expected result
         
         Args:
             query: User's SQL query
             expected_result: Expected query result
+            exercise: Exercise being graded (enables the embedded SQLite path)
         
         Returns:
             dict with validation result and feedback
         """
         # Execute user's query
-        execution_result = self.execute(query, read_only=True)
+        execution_result = self.execute(query, read_only=True, exercise=exercise)
         
         if not execution_result['success']:
             return {
@@ -277,7 +277,7 @@ def submit_exercise():
     
     # Validate solution
     expected_result = exercise.expected_output or {}
-    validation_result = executor.validate_exercise_solution(query, expected_result)
+    validation_result = executor.validate_exercise_solution(query, expected_result, exercise=exercise)
     
     # Create submission record
     submission = ExerciseSubmission(
@@ -10,15 +10,209 @@ except ImportError:
     docker = None
 
 import mysql.connector
+import os
 import time
 import logging
-from typing import Dict, Optional, List
+from functools import lru_cache
+from typing import Dict, Optional, List, Tuple
 from datetime import datetime, timedelta
 
+from app.sql_practice.connection_pool import close_pool, get_pool
+from app.sql_practice.container_pool import (
+    POOL_PREFIX, claim_info, container_options, get_container_pool, pool_enabled
+)
+
 logger = logging.getLogger(__name__)
 
+# Sample database every sandbox starts from (also baked into the image)
+INIT_SCRIPT = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', 'sandbox', 'sql', 'init_db.sql'
+)
+
+
+def split_statements(script: str) -> List[str]:
+    """Split a simple SQL script (no semicolons inside literals) into statements"""
+    lines = [line for line in script.splitlines() if not line.lstrip().startswith('--')]
+    return [s.strip() for s in '\n'.join(lines).split(';') if s.strip()]
+
+
+@lru_cache(maxsize=None)
+def init_script_statements(script: str = INIT_SCRIPT) -> Tuple[str, ...]:
+    """
+    Parse the sample database script once per process
+    
+    Its CREATE DATABASE / USE / FLUSH statements are skipped so the tables
+    land in the connection's current database.
+    """
+    with open(script, encoding='utf-8') as f:
+        statements = split_statements(f.read())
+    return tuple(s for s in statements if not s.upper().startswith(('CREATE DATABASE', 'USE ', 'FLUSH ')))
+
+
+def restore_initial_data(conn):
+    """Drop every table and view of the current database and replay the sample script"""
+    cursor = conn.cursor()
+    cursor.execute("SHOW FULL TABLES")
+    objects = cursor.fetchall()
+    cursor.execute("SET SESSION foreign_key_checks = 0")
+    for name, kind in objects:
+        cursor.execute(f"DROP {'VIEW' if kind == 'VIEW' else 'TABLE'} IF EXISTS `{name}`")
+    cursor.execute("SET SESSION foreign_key_checks = 1")
+    for statement in init_script_statements():
+        cursor.execute(statement)
+    conn.commit()
+    cursor.close()
+
+
+def sandbox_class():
+    """Get the sandbox backend selected with SQL_SANDBOX_BACKEND (docker or shared)"""
+    if os.environ.get('SQL_SANDBOX_BACKEND', 'docker') == 'shared':
+        from app.sql_practice.shared_sandbox import SharedSQLSandbox
+        return SharedSQLSandbox
+    return SQLSandbox
+
+
+def get_sandbox(user_id: int, session_id: str):
+    """Create the configured sandbox backend for a user session"""
+    return sandbox_class()(user_id, session_id)
+
+
+class BaseSQLSandbox:
+    """Query methods shared by the sandbox backends, which set db_config"""
+    
+    # ConnectionPool arguments for the session's pool
+    pool_options: Dict = {}
+    
+    def _prepare_connection(self, conn):
+        """Hook run on a pooled connection before each user query"""
+        pass
+    
+    def execute_query(self, query: str, fetch_results: bool = True) -> Dict:
+        """
+        Execute SQL query in the sandbox
+        
+        Args:
+            query: SQL query to execute
+            fetch_results: Whether to fetch and return results
+        
+        Returns:
+            dict with results, columns, row_count, execution_time
+        """
+        start_time = time.time()
+        
+        try:
+            # Pooled connection: no handshake per query
+            with get_pool(self.db_config, **self.pool_options).connection() as conn:
+                self._prepare_connection(conn)
+                cursor = conn.cursor()
+                
+                # Execute query
+                cursor.execute(query)
+                
+                # Fetch results if SELECT query
+                results = []
+                columns = []
+                
+                if fetch_results and cursor.description:
+                    columns = [desc[0] for desc in cursor.description]
+                    results = cursor.fetchall()
+                    # Convert to list of dicts
+                    results = [dict(zip(columns, row)) for row in results]
+                
+                # Commit if DML query
+                if query.strip().upper().startswith(('INSERT', 'UPDATE', 'DELETE')):
+                    conn.commit()
+                
+                row_count = cursor.rowcount
+                execution_time = time.time() - start_time
+                
+                cursor.close()
+            
+            return {
+                'success': True,
+                'results': results,
+                'columns': columns,
+                'row_count': row_count,
+                'execution_time': round(execution_time, 3)
+            }
+            
+        except mysql.connector.Error as e:
+            execution_time = time.time() - start_time
+            logger.error(f"Query execution error: {str(e)}")
+            
+            return {
+                'success': False,
+                'error': str(e),
+                'error_code': e.errno if hasattr(e, 'errno') else None,
+                'execution_time': round(execution_time, 3)
+            }
+        except Exception as e:
+            execution_time = time.time() - start_time
+            logger.error(f"Unexpected error: {str(e)}")
+            
+            return {
+                'success': False,
+                'error': str(e),
+                'execution_time': round(execution_time, 3)
+            }
+    
+    def get_schema_info(self) -> Dict:
+        """Get information about database schema (tables, columns)"""
+        try:
+            with get_pool(self.db_config, **self.pool_options).connection() as conn:
+                cursor = conn.cursor()
+                
+                # Get all tables
+                cursor.execute("SHOW TABLES")
+                tables = [row[0] for row in cursor.fetchall()]
+                
+                schema_info = {}
+                
+                for table in tables:
+                    # Get columns for each table
+                    cursor.execute(f"DESCRIBE {table}")
+                    columns = []
+                    
+                    for col in cursor.fetchall():
+                        columns.append({
+                            'name': col[0],
+                            'type': col[1],
+                            'null': col[2],
+                            'key': col[3],
+                            'default': col[4],
+                            'extra': col[5]
+                        })
+                    
+                    # Get row count
+                    cursor.execute(f"SELECT COUNT(*) FROM {table}")
+                    row_count = cursor.fetchone()[0]
+                    
+                    schema_info[table] = {
+                        'columns': columns,
+                        'row_count': row_count
+                    }
+                
+                cursor.close()
+            
+            return {
+                'success': True,
+                'tables': schema_info
+            }
+            
+        except Exception as e:
+            logger.error(f"Failed to get schema info: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def preview_table(self, table_name: str, limit: int = 10) -> Dict:
+        """Preview data from a table"""
+        query = f"SELECT * FROM {table_name} LIMIT {limit}"
+        return self.execute_query(query)
 
-class SQLSandbox:
+
+class SQLSandbox(BaseSQLSandbox):
     """Manages Docker-based MySQL sandbox for SQL execution"""
     
     def __init__(self, user_id: int, session_id: str):
@@ -65,31 +259,36 @@ class SQLSandbox:
                     'port': self.db_config['port']
                 }
             
-            # Create new container
-            logger.info(f"Creating new SQL sandbox: {self.container_name}")
+            # Take an initialized container from the warm pool
+            if pool_enabled():
+                pooled = get_container_pool().claim(self.container_name, labels={
+                    'user_id': str(self.user_id),
+                    'session_id': self.session_id
+                })
+                if pooled:
+                    self.container = pooled
+                    self.db_config['port'] = self._get_container_port()
+                    if schema_id:
+                        self._load_schema(schema_id)
+                    return {
+                        'success': True,
+                        'container_id': self.container.id,
+                        'port': self.db_config['port'],
+                        'pooled': True
+                    }
             
+            # Create new container
             logger.info(f"Creating new SQL sandbox container: {self.container_name}")
             
             self.container = self.docker_client.containers.run(
-                image='sql_sandbox:latest',
                 name=self.container_name,
-                detach=True,
-                remove=False,  # Don't auto-remove so we can reuse containers
-                mem_limit='512m',
-                cpu_quota=50000,  # 50% of one CPU
-                publish_all_ports=True,  # Auto-publish all exposed ports
-                environment={
-                    'MYSQL_ROOT_PASSWORD': 'sandbox_root_pass',
-                    'MYSQL_DATABASE': 'sandbox_db',
-                    'MYSQL_USER': 'sandbox_user',
-                    'MYSQL_PASSWORD': 'sandbox_pass'
-                },
                 labels={
                     'user_id': str(self.user_id),
                     'session_id': self.session_id,
                     'created_at': datetime.utcnow().isoformat(),
                     'type': 'sql_sandbox'
-                }
+                },
+                **container_options()
             )
             
             logger.info(f"Container created with ID: {self.container.id[:12]}")
@@ -137,16 +336,13 @@ class SQLSandbox:
         logger.info(f"Container {self.container_name} port 3306 mapped to host port {host_port}")
         return int(host_port)
     
-    def _wait_for_mysql(self, timeout: int = 60):
+    def _wait_for_mysql(self, timeout: int = 60, interval: float = 0.5):
         """Wait for MySQL to be ready to accept connections"""
         start_time = time.time()
         attempt = 0
         
         logger.info(f"Waiting for MySQL to start in {self.container_name}...")
         
-        # First, wait a few seconds for MySQL to begin initialization
-        time.sleep(3)
-        
         while time.time() - start_time < timeout:
             attempt += 1
             try:
@@ -163,10 +359,11 @@ class SQLSandbox:
                 logger.info(f"✅ MySQL ready in container {self.container_name} after {elapsed:.1f}s ({attempt} attempts)")
                 return True
             except mysql.connector.Error as e:
-                if attempt % 3 == 0:  # Log every 3 attempts
+                if attempt % 10 == 0:  # Log every 10 attempts
                     elapsed = time.time() - start_time
                     logger.info(f"⏳ Waiting for MySQL... attempt {attempt}, elapsed: {elapsed:.1f}s")
-                time.sleep(3)
+                # Poll often: the first successful login ends the wait
+                time.sleep(interval)
             except Exception as e:
                 logger.error(f"Error waiting for MySQL: {str(e)}")
                 raise
@@ -178,138 +375,35 @@ class SQLSandbox:
         # TODO: Implement schema loading from predefined schemas
         pass
     
-    def execute_query(self, query: str, fetch_results: bool = True) -> Dict:
+    def reset_database(self):
         """
-        Execute SQL query in the sandbox
+        Reset database to initial state
         
-        Args:
-            query: SQL query to execute
-            fetch_results: Whether to fetch and return results
-        
-        Returns:
-            dict with results, columns, row_count, execution_time
+        Replaying the cached sample script over the cleared database takes
+        milliseconds; restarting the container is the last resort.
         """
-        start_time = time.time()
-        
         try:
-            conn = mysql.connector.connect(**self.db_config)
-            cursor = conn.cursor()
-            
-            # Execute query
-            cursor.execute(query)
-            
-            # Fetch results if SELECT query
-            results = []
-            columns = []
-            
-            if fetch_results and cursor.description:
-                columns = [desc[0] for desc in cursor.description]
-                results = cursor.fetchall()
-                # Convert to list of dicts
-                results = [dict(zip(columns, row)) for row in results]
-            
-            # Commit if DML query
-            if query.strip().upper().startswith(('INSERT', 'UPDATE', 'DELETE')):
-                conn.commit()
+            # Executors are created per request, so look the container up
+            if not self.container:
+                self.container = self._get_existing_container()
+            if not self.container:
+                # The next sandbox starts from the initial data anyway
+                return {'success': True, 'method': 'none'}
             
-            row_count = cursor.rowcount
-            execution_time = time.time() - start_time
-            
-            cursor.close()
-            conn.close()
-            
-            return {
-                'success': True,
-                'results': results,
-                'columns': columns,
-                'row_count': row_count,
-                'execution_time': round(execution_time, 3)
-            }
-            
-        except mysql.connector.Error as e:
-            execution_time = time.time() - start_time
-            logger.error(f"Query execution error: {str(e)}")
-            
-            return {
-                'success': False,
-                'error': str(e),
-                'error_code': e.errno if hasattr(e, 'errno') else None,
-                'execution_time': round(execution_time, 3)
-            }
-        except Exception as e:
-            execution_time = time.time() - start_time
-            logger.error(f"Unexpected error: {str(e)}")
-            
-            return {
-                'success': False,
-                'error': str(e),
-                'execution_time': round(execution_time, 3)
-            }
-    
-    def get_schema_info(self) -> Dict:
-        """Get information about database schema (tables, columns)"""
-        try:
-            conn = mysql.connector.connect(**self.db_config)
-            cursor = conn.cursor()
-            
-            # Get all tables
-            cursor.execute("SHOW TABLES")
-            tables = [row[0] for row in cursor.fetchall()]
-            
-            schema_info = {}
-            
-            for table in tables:
-                # Get columns for each table
-                cursor.execute(f"DESCRIBE {table}")
-                columns = []
-                
-                for col in cursor.fetchall():
-                    columns.append({
-                        'name': col[0],
-                        'type': col[1],
-                        'null': col[2],
-                        'key': col[3],
-                        'default': col[4],
-                        'extra': col[5]
-                    })
-                
-                # Get row count
-                cursor.execute(f"SELECT COUNT(*) FROM {table}")
-                row_count = cursor.fetchone()[0]
-                
-                schema_info[table] = {
-                    'columns': columns,
-                    'row_count': row_count
-                }
-            
-            cursor.close()
-            conn.close()
-            
-            return {
-                'success': True,
-                'tables': schema_info
-            }
+            try:
+                self.db_config['port'] = self._get_container_port()
+                with get_pool(self.db_config, **self.pool_options).connection() as conn:
+                    restore_initial_data(conn)
+                return {'success': True, 'method': 'replay'}
+            except Exception as e:
+                logger.warning(f"Fast reset of {self.container_name} failed, restarting: {str(e)}")
             
-        except Exception as e:
-            logger.error(f"Failed to get schema info: {str(e)}")
-            return {
-                'success': False,
-                'error': str(e)
-            }
-    
-    def preview_table(self, table_name: str, limit: int = 10) -> Dict:
-        """Preview data from a table"""
-        query = f"SELECT * FROM {table_name} LIMIT {limit}"
-        return self.execute_query(query)
-    
-    def reset_database(self):
-        """Reset database to initial state"""
-        try:
-            if self.container:
-                # Restart container to reset database
-                self.container.restart()
-                self._wait_for_mysql()
-                return {'success': True}
+            # Pooled connections die with the server
+            close_pool(self.db_config)
+            # Restart container to reset database
+            self.container.restart()
+            self._wait_for_mysql()
+            return {'success': True, 'method': 'restart'}
         except Exception as e:
             logger.error(f"Failed to reset database: {str(e)}")
             return {'success': False, 'error': str(e)}
@@ -319,6 +413,7 @@ class SQLSandbox:
         try:
             if self.container:
                 logger.info(f"Cleaning up sandbox: {self.container_name}")
+                close_pool(self.db_config)
                 self.container.stop()
                 self.container.remove()
                 return {'success': True}
@@ -339,7 +434,14 @@ class SQLSandbox:
             cutoff_time = datetime.utcnow() - timedelta(hours=hours)
             
             for container in containers:
+                if container.name.startswith(POOL_PREFIX):
+                    # Unclaimed pool containers are retired by the pool
+                    continue
                 created_at_str = container.labels.get('created_at')
+                if container.labels.get('pool') == '1':
+                    # A claimed pool container: its age counts from the claim
+                    claim = claim_info(container) or {}
+                    created_at_str = claim.get('claimed_at', created_at_str)
                 if created_at_str:
                     created_at = datetime.fromisoformat(created_at_str)
                     if created_at < cutoff_time:
@@ -0,0 +1,325 @@
+"""
+Shared MySQL Sandbox
+Serves many SQL sessions from one or a few shared MySQL servers
+
+A container per session costs hundreds of MB and caps a host at a few
+dozen learners. With SQL_SANDBOX_BACKEND=shared each session instead gets:
+    
+    - a private schema, cloned table by table from a template schema
+      (SQL_SHARED_TEMPLATE, loaded once per server with install_template())
+    - an account that can only reach that schema, created with
+      MAX_QUERIES_PER_HOUR, MAX_UPDATES_PER_HOUR and MAX_USER_CONNECTIONS
+
+and every user query runs with max_execution_time set for its session, so
+a learner costs a few MB on the server and a connection only while one of
+their queries runs.
+
+Sessions are spread over SQL_SHARED_HOSTS by a stable hash of the session,
+so every web and Celery process finds a session on the same server.
+Account passwords are derived from SQL_SHARED_ACCOUNT_SECRET (or the app's
+SECRET_KEY) and never stored. The servers should be hardened like
+sandbox/sql/security_config.cnf (local_infile off, secure_file_priv NULL).
+"""
+import os
+import hmac
+import hashlib
+import threading
+import time
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from flask import current_app, has_app_context
+
+from app.sql_practice.connection_pool import close_pool, get_pool
+from app.sql_practice.sandbox import BaseSQLSandbox, INIT_SCRIPT, init_script_statements
+
+logger = logging.getLogger(__name__)
+
+SHARED_HOSTS = os.environ.get('SQL_SHARED_HOSTS', 'localhost:3306')
+ADMIN_USER = os.environ.get('SQL_SHARED_ADMIN_USER', 'root')
+ADMIN_PASSWORD = os.environ.get('SQL_SHARED_ADMIN_PASSWORD', '')
+TEMPLATE_SCHEMA = os.environ.get('SQL_SHARED_TEMPLATE', 'sandbox_template')
+ACCOUNT_HOST = os.environ.get('SQL_SHARED_ACCOUNT_HOST', '%')
+
+MAX_QUERIES_PER_HOUR = int(os.environ.get('SQL_SHARED_MAX_QUERIES_PER_HOUR', 2000))
+MAX_UPDATES_PER_HOUR = int(os.environ.get('SQL_SHARED_MAX_UPDATES_PER_HOUR', 500))
+MAX_USER_CONNECTIONS = int(os.environ.get('SQL_SHARED_MAX_USER_CONNECTIONS', 2))
+MAX_EXECUTION_MS = int(os.environ.get('SQL_SHARED_MAX_EXECUTION_MS', 5000))
+
+SCHEMA_PREFIX = 'sbx_'
+SESSION_PRIVILEGES = (
+    'SELECT, INSERT, UPDATE, DELETE, CREATE, DROP, ALTER, INDEX, REFERENCES, '
+    'CREATE VIEW, SHOW VIEW, CREATE TEMPORARY TABLES'
+)
+
+# Template table definitions are re-read after this many seconds
+TEMPLATE_CACHE_SECONDS = 300
+
+_template_cache = {}
+_template_lock = threading.Lock()
+
+
+def shared_servers() -> List[Tuple[str, int]]:
+    """Get the (host, port) pairs listed in SQL_SHARED_HOSTS"""
+    servers = []
+    for entry in SHARED_HOSTS.split(','):
+        if entry.strip():
+            host, _, port = entry.strip().partition(':')
+            servers.append((host, int(port or 3306)))
+    return servers
+
+
+def session_key(user_id: int, session_id: str) -> str:
+    """Get the short stable key naming a session's schema and account"""
+    return hashlib.sha256(f"{user_id}:{session_id}".encode('utf-8')).hexdigest()[:16]
+
+
+def server_for(key: str) -> Tuple[str, int]:
+    """Get the server that hosts a session"""
+    servers = shared_servers()
+    return servers[int(key, 16) % len(servers)]
+
+
+def admin_config(host: str, port: int) -> Dict:
+    """Get the connection arguments of a server's admin account"""
+    return {
+        'host': host,
+        'port': port,
+        'user': ADMIN_USER,
+        'password': ADMIN_PASSWORD
+    }
+
+
+def account_password(account: str) -> str:
+    """Derive a session account's password"""
+    secret = os.environ.get('SQL_SHARED_ACCOUNT_SECRET')
+    if not secret and has_app_context():
+        secret = current_app.config.get('SECRET_KEY')
+    if not secret:
+        raise RuntimeError('Set SQL_SHARED_ACCOUNT_SECRET to use the shared SQL sandbox')
+    return hmac.new(secret.encode('utf-8'), account.encode('utf-8'), hashlib.sha256).hexdigest()[:32]
+
+
+def template_tables(cursor, server: Tuple[str, int]) -> List[Tuple[str, str]]:
+    """Get (table, CREATE TABLE statement) for every base table of the template"""
+    now = time.monotonic()
+    with _template_lock:
+        cached = _template_cache.get(server)
+        if cached and now - cached[0] < TEMPLATE_CACHE_SECONDS:
+            return cached[1]
+    
+    cursor.execute(f"SHOW FULL TABLES FROM `{TEMPLATE_SCHEMA}` WHERE Table_type = 'BASE TABLE'")
+    names = [row[0] for row in cursor.fetchall()]
+    if not names:
+        raise RuntimeError(f"Template schema {TEMPLATE_SCHEMA} has no tables; run install_template()")
+    
+    tables = []
+    for name in names:
+        cursor.execute(f"SHOW CREATE TABLE `{TEMPLATE_SCHEMA}`.`{name}`")
+        tables.append((name, cursor.fetchone()[1]))
+    
+    with _template_lock:
+        _template_cache[server] = (now, tables)
+    return tables
+
+
+def clone_template(cursor, schema: str, server: Tuple[str, int]):
+    """Create a schema holding a copy of every template table"""
+    tables = template_tables(cursor, server)
+    cursor.execute(f"CREATE DATABASE `{schema}`")
+    try:
+        # Unqualified names in the template DDL (foreign keys too) now resolve to the copy
+        cursor.execute(f"USE `{schema}`")
+        cursor.execute("SET SESSION foreign_key_checks = 0")
+        for name, ddl in tables:
+            cursor.execute(ddl)
+            cursor.execute(f"INSERT INTO `{name}` SELECT * FROM `{TEMPLATE_SCHEMA}`.`{name}`")
+        cursor.execute("SET SESSION foreign_key_checks = 1")
+    except Exception:
+        cursor.execute(f"DROP DATABASE IF EXISTS `{schema}`")
+        raise
+
+
+def drop_session(cursor, schema: str):
+    """Drop a session's schema and account (they share a name)"""
+    cursor.execute(f"DROP DATABASE IF EXISTS `{schema}`")
+    cursor.execute("DROP USER IF EXISTS %s@%s", (schema, ACCOUNT_HOST))
+
+
+def install_template(script: str = INIT_SCRIPT, servers: Optional[List[Tuple[str, int]]] = None):
+    """Load the sample database script into the template schema of each server"""
+    statements = init_script_statements(script)
+    
+    for server in servers or shared_servers():
+        with get_pool(admin_config(*server)).connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"DROP DATABASE IF EXISTS `{TEMPLATE_SCHEMA}`")
+            cursor.execute(f"CREATE DATABASE `{TEMPLATE_SCHEMA}`")
+            cursor.execute(f"USE `{TEMPLATE_SCHEMA}`")
+            for statement in statements:
+                cursor.execute(statement)
+            conn.commit()
+            cursor.close()
+        with _template_lock:
+            _template_cache.pop(server, None)
+        logger.info(f"Installed SQL template {TEMPLATE_SCHEMA} on {server[0]}:{server[1]}")
+
+
+class SharedSQLSandbox(BaseSQLSandbox):
+    """Per-session schema and account on a shared MySQL server"""
+    
+    # The session's connection is closed after each request: every web and
+    # Celery process may serve the session, and idle connections kept by
+    # each of them would soon exceed MAX_USER_CONNECTIONS
+    pool_options = {'max_size': 1, 'max_idle': 0}
+    
+    def __init__(self, user_id: int, session_id: str):
+        """
+        Initialize shared sandbox for a user session
+        
+        Args:
+            user_id: User ID
+            session_id: Unique session identifier
+        """
+        self.user_id = user_id
+        self.session_id = session_id
+        self.schema = SCHEMA_PREFIX + session_key(user_id, session_id)
+        self.server = server_for(self.schema[len(SCHEMA_PREFIX):])
+        self.admin_config = admin_config(*self.server)
+        self.db_config = {
+            'host': self.server[0],
+            'port': self.server[1],
+            'user': self.schema,
+            'password': account_password(self.schema),
+            'database': self.schema
+        }
+    
+    def create_sandbox(self, schema_id: Optional[str] = None) -> Dict:
+        """
+        Create the session's schema and account unless they exist
+        
+        Args:
+            schema_id: Unused; every session starts from the template schema
+        
+        Returns:
+            dict with connection details
+        """
+        try:
+            with get_pool(self.admin_config).connection() as conn:
+                cursor = conn.cursor()
+                if not self._schema_exists(cursor):
+                    self._provision(cursor)
+                cursor.close()
+            
+            return {
+                'success': True,
+                'schema': self.schema,
+                'host': self.server[0],
+                'port': self.server[1]
+            }
+        
+        except Exception as e:
+            logger.error(f"Failed to create shared sandbox: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def _schema_exists(self, cursor) -> bool:
+        cursor.execute("SELECT 1 FROM information_schema.SCHEMATA WHERE SCHEMA_NAME = %s", (self.schema,))
+        return cursor.fetchone() is not None
+    
+    def _provision(self, cursor, replace: bool = False):
+        """Clone the template and create the account, one process at a time"""
+        cursor.execute("SELECT GET_LOCK(%s, 30)", (self.schema,))
+        if cursor.fetchone()[0] != 1:
+            raise TimeoutError(f"Timed out waiting to provision {self.schema}")
+        try:
+            if replace:
+                cursor.execute(f"DROP DATABASE IF EXISTS `{self.schema}`")
+            elif self._schema_exists(cursor):
+                # Another process provisioned it while we waited
+                return
+            
+            clone_template(cursor, self.schema, self.server)
+            
+            # Recreated so a changed secret or limit takes effect
+            cursor.execute("DROP USER IF EXISTS %s@%s", (self.schema, ACCOUNT_HOST))
+            cursor.execute(
+                "CREATE USER %s@%s IDENTIFIED BY %s WITH "
+                f"MAX_QUERIES_PER_HOUR {MAX_QUERIES_PER_HOUR} "
+                f"MAX_UPDATES_PER_HOUR {MAX_UPDATES_PER_HOUR} "
+                f"MAX_USER_CONNECTIONS {MAX_USER_CONNECTIONS}",
+                (self.schema, ACCOUNT_HOST, self.db_config['password'])
+            )
+            cursor.execute(
+                f"GRANT {SESSION_PRIVILEGES} ON `{self.schema}`.* TO %s@%s",
+                (self.schema, ACCOUNT_HOST)
+            )
+            logger.info(f"Provisioned shared SQL sandbox {self.schema} on {self.server[0]}")
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (self.schema,))
+            cursor.fetchone()
+    
+    def _prepare_connection(self, conn):
+        """Apply the per-statement time limit (reset with each pooled session)"""
+        cursor = conn.cursor()
+        cursor.execute(f"SET SESSION max_execution_time = {MAX_EXECUTION_MS}")
+        cursor.close()
+    
+    def reset_database(self):
+        """Reset database to initial state by re-cloning the template (no restart needed)"""
+        try:
+            close_pool(self.db_config)
+            with get_pool(self.admin_config).connection() as conn:
+                cursor = conn.cursor()
+                self._provision(cursor, replace=True)
+                cursor.close()
+            return {'success': True}
+        except Exception as e:
+            logger.error(f"Failed to reset database: {str(e)}")
+            return {'success': False, 'error': str(e)}
+    
+    def cleanup(self):
+        """Drop the session's schema and account"""
+        try:
+            logger.info(f"Cleaning up shared sandbox: {self.schema}")
+            close_pool(self.db_config)
+            with get_pool(self.admin_config).connection() as conn:
+                cursor = conn.cursor()
+                drop_session(cursor, self.schema)
+                cursor.close()
+            return {'success': True}
+        except Exception as e:
+            logger.error(f"Failed to cleanup sandbox: {str(e)}")
+            return {'success': False, 'error': str(e)}
+    
+    @staticmethod
+    def cleanup_old_containers(hours: int = 2):
+        """Drop session schemas older than specified hours (same API as SQLSandbox)"""
+        try:
+            cleaned = 0
+            
+            for server in shared_servers():
+                with get_pool(admin_config(*server)).connection() as conn:
+                    cursor = conn.cursor()
+                    # A schema is as old as the tables cloned into it; compared on
+                    # the server's clock. Schemas left without tables go too.
+                    cursor.execute(
+                        "SELECT s.SCHEMA_NAME FROM information_schema.SCHEMATA s "
+                        "LEFT JOIN information_schema.TABLES t ON t.TABLE_SCHEMA = s.SCHEMA_NAME "
+                        "WHERE s.SCHEMA_NAME LIKE %s GROUP BY s.SCHEMA_NAME "
+                        "HAVING MIN(t.CREATE_TIME) IS NULL OR MIN(t.CREATE_TIME) < NOW() - INTERVAL %s HOUR",
+                        (SCHEMA_PREFIX.replace('_', '\\_') + '%', hours)
+                    )
+                    for (schema,) in cursor.fetchall():
+                        logger.info(f"Cleaning up old shared sandbox: {schema}")
+                        drop_session(cursor, schema)
+                        cleaned += 1
+                    cursor.close()
+            
+            return {'success': True, 'cleaned': cleaned}
+        
+        except Exception as e:
+            logger.error(f"Failed to cleanup old schemas: {str(e)}")
+            return {'success': False, 'error': str(e)}
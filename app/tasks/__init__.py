@@ -1,12 +1,16 @@
 # app/tasks/__init__.py
 """Celery tasks package."""
 
-from app.tasks.execution_tasks import execute_python_code_async
+from app.tasks.execution_tasks import (
+    execute_python_code_async, regrade_exercise_submissions, calibrate_exercise_time_limit
+)
 from app.tasks.email_tasks import send_email_async
 from app.tasks.analytics_tasks import update_user_statistics, cleanup_old_submissions
 
 __all__ = [
     'execute_python_code_async',
+    'regrade_exercise_submissions',
+    'calibrate_exercise_time_limit',
     'send_email_async',
     'update_user_statistics',
     'cleanup_old_submissions'
@@ -1,10 +1,24 @@
 # app/tasks/execution_tasks.py
 """Celery tasks for code execution."""
 
-import json
+import time
 from datetime import datetime
+from celery.exceptions import Retry, SoftTimeLimitExceeded
+from celery.signals import worker_process_init
 from app.celery_app import celery
-from app.python_practice.executor import execute_python_code
+from app.python_practice.executor import execute_python_code, execute_python_batch
+from app.python_practice.admission import AdmissionRejected
+from app.python_practice.worker_pool import PRELOAD_MODULES, get_worker_pool, pool_enabled
+
+
+@worker_process_init.connect
+def warm_python_worker_pool(**kwargs):
+    """Start warm Python interpreters when a Celery worker process boots."""
+    if pool_enabled():
+        get_worker_pool().warm()
+        if PRELOAD_MODULES:
+            # One server with numpy/pandas imported for the first such submission
+            get_worker_pool(preloaded=True).warm(1)
 
 
 @celery.task(name='app.tasks.execution_tasks.execute_sql_query_async', bind=True)
@@ -48,12 +62,13 @@ def execute_sql_query_async(self, user_id, session_id, query, read_only=True):
 def cleanup_old_sql_sandboxes():
     """
     Cleanup old SQL sandbox containers (scheduled task).
-    Runs every 2 hours to remove containers older than 2 hours.
+    Runs every 2 hours to remove containers (or shared-server schemas)
+    older than 2 hours.
     """
-    from app.sql_practice.sandbox import SQLSandbox
+    from app.sql_practice.sandbox import sandbox_class
     
     try:
-        result = SQLSandbox.cleanup_old_containers(hours=2)
+        result = sandbox_class().cleanup_old_containers(hours=2)
         return result
     except Exception as e:
         return {
@@ -62,17 +77,28 @@ def cleanup_old_sql_sandboxes():
         }
 
 
-@celery.task(name='app.tasks.execution_tasks.execute_python_code_async', bind=True)
-def execute_python_code_async(self, submission_id, code, test_cases, timeout=30):
+def submission_job_id(submission_id):
+    """Get the Celery task id used to grade a submission."""
+    return f'python-submission-{submission_id}'
+
+
+@celery.task(name='app.tasks.execution_tasks.execute_python_code_async', bind=True, max_retries=10)
+def execute_python_code_async(self, submission_id, code, test_cases, timeout=30, mode='sequential',
+                              step_limit=None):
     """
     Execute Python code asynchronously.
     
+    When no execution slot is free the task is retried after the
+    governor's Retry-After estimate instead of holding the worker.
+    
     Args:
         self: Celery task instance
         submission_id: ExerciseSubmission ID
         code: Python code to execute
         test_cases: List of test case dictionaries
         timeout: Execution timeout in seconds
+        mode: Execution mode (see execute_python_code)
+        step_limit: Step budget (default: PYTHON_STEP_LIMIT)
         
     Returns:
         Execution result dictionary
@@ -91,23 +117,16 @@ def execute_python_code_async(self, submission_id, code, test_cases, timeout=30)
                 return {'error': 'Submission not found'}
             
             # Execute code
-            result = execute_python_code(code, test_cases, timeout)
+            try:
+                result = execute_python_code(code, test_cases, timeout, mode=mode, step_limit=step_limit,
+                                             admission_key=f'user:{submission.user_id}')
+            except AdmissionRejected as e:
+                if self.request.retries < self.max_retries:
+                    raise self.retry(countdown=e.retry_after)
+                result = {'status': 'error', 'error': str(e)}
             
             # Update submission
-            submission.status = result['status']
-            submission.output = result.get('output', '')
-            submission.error_message = result.get('error', '')
-            submission.test_results = json.dumps(result.get('test_results', []))
-            submission.tests_passed = result.get('tests_passed', 0)
-            submission.tests_failed = result.get('tests_failed', 0)
-            submission.execution_time_ms = result.get('execution_time_ms', 0)
-            submission.executed_at = datetime.utcnow()
-            
-            # Calculate score
-            total_tests = submission.tests_passed + submission.tests_failed
-            if total_tests > 0:
-                submission.score = (submission.tests_passed / total_tests) * 100
-            
+            submission.apply_execution_result(result)
             db.session.commit()
             
             # Update enrollment if passed
@@ -116,6 +135,9 @@ def execute_python_code_async(self, submission_id, code, test_cases, timeout=30)
             
             return result
             
+        except Retry:
+            raise
+        
         except Exception as e:
             # Log error
             print(f'Error in execute_python_code_async: {str(e)}')
@@ -130,6 +152,158 @@ def execute_python_code_async(self, submission_id, code, test_cases, timeout=30)
             return {'error': str(e)}
 
 
+# Regrading runs as a chain of tasks, one batch each, with its own limits
+# instead of the code_execution queue's 50/60 seconds
+REGRADE_BATCH_SIZE = 50
+REGRADE_SOFT_TIME_LIMIT = 600
+REGRADE_TIME_LIMIT = 660
+
+
+@celery.task(name='app.tasks.execution_tasks.regrade_exercise_submissions', bind=True,
+             soft_time_limit=REGRADE_SOFT_TIME_LIMIT, time_limit=REGRADE_TIME_LIMIT)
+def regrade_exercise_submissions(self, exercise_id, timeout=None, batch_size=REGRADE_BATCH_SIZE,
+                                 after_id=0, regraded=0, changed=0):
+    """
+    Re-grade every submission of an exercise (e.g. after a test-case fix).
+    
+    Each task grades one batch of submissions (in id order, after
+    `after_id`) and queues the task for the next batch, so the work is not
+    bounded by one task's time limit. A batch cut short by the soft time
+    limit, or by the admission governor's batch share being busy, keeps the
+    submissions graded in id order so far, and the next task resumes after
+    the last of them (after the governor's Retry-After).
+    
+    Args:
+        self: Celery task instance
+        exercise_id: Exercise ID
+        timeout: Execution timeout per submission in seconds (default: the
+                 exercise's calibrated limit)
+        batch_size: Submissions graded and committed per task
+        after_id: Last submission ID graded by the previous tasks
+        regraded: Submissions regraded by the previous tasks
+        changed: Submissions whose status changed in the previous tasks
+        
+    Returns:
+        Summary dictionary with counts of regraded and changed submissions,
+        and the ID of the task grading the next batch (if any)
+    """
+    from app import create_app
+    from app.extensions import db
+    from app.models import Exercise, ExerciseSubmission
+    
+    app = create_app()
+    
+    with app.app_context():
+        exercise = Exercise.query.get(exercise_id)
+        if not exercise or exercise.exercise_type != 'python':
+            return {'error': 'Python exercise not found'}
+        
+        while True:
+            submissions = ExerciseSubmission.query.filter(
+                ExerciseSubmission.exercise_id == exercise_id,
+                ExerciseSubmission.id > after_id
+            ).order_by(ExerciseSubmission.id).limit(batch_size).all()
+            
+            if not submissions:
+                return {'status': 'success', 'regraded': regraded, 'changed': changed}
+            
+            # Results arrive in completion order; apply them in id order so
+            # everything up to `after_id` is graded when the batch stops
+            results = {}
+            graded = 0
+            retry_after = 0
+            try:
+                codes = [submission.submitted_code for submission in submissions]
+                for index, result in execute_python_batch(exercise, codes, timeout):
+                    results[index] = result
+                    while graded in results:
+                        submission = submissions[graded]
+                        previous_status = submission.status
+                        submission.apply_execution_result(results.pop(graded))
+                        regraded += 1
+                        if submission.status != previous_status:
+                            changed += 1
+                            if submission.status == 'passed':
+                                submission.mark_as_passed()
+                        after_id = submission.id
+                        graded += 1
+            except SoftTimeLimitExceeded:
+                pass
+            except AdmissionRejected as e:
+                # Students hold the rest of the slots; resume once they are done
+                retry_after = e.retry_after
+            
+            db.session.commit()
+            if self.request.id:
+                self.update_state(state='PROGRESS', meta={'regraded': regraded, 'changed': changed})
+            
+            if graded == len(submissions) and len(submissions) < batch_size:
+                return {'status': 'success', 'regraded': regraded, 'changed': changed}
+            if not self.request.called_directly:
+                next_task = self.apply_async(args=(exercise_id,), kwargs={
+                    'timeout': timeout,
+                    'batch_size': batch_size,
+                    'after_id': after_id,
+                    'regraded': regraded,
+                    'changed': changed
+                }, countdown=retry_after)
+                return {'status': 'continued', 'regraded': regraded, 'changed': changed,
+                        'next_task_id': next_task.id}
+            if retry_after:
+                time.sleep(retry_after)
+
+
+# Calibration runs the reference solution CALIBRATION_RUNS times with up to
+# DEFAULT_TIMEOUT each, more than the code_execution queue's 50/60 seconds
+CALIBRATION_SOFT_TIME_LIMIT = 150
+CALIBRATION_TIME_LIMIT = 180
+
+
+@celery.task(name='app.tasks.execution_tasks.calibrate_exercise_time_limit',
+             soft_time_limit=CALIBRATION_SOFT_TIME_LIMIT, time_limit=CALIBRATION_TIME_LIMIT)
+def calibrate_exercise_time_limit(exercise_id, fingerprint):
+    """
+    Calibrate an exercise's time limit after it was saved.
+    
+    The exercise keeps its previous limit while this runs. A task queued for
+    an older version of the exercise (see calibration_fingerprint) does not
+    run, and its measurement is discarded if the exercise is saved again
+    meanwhile: the newer save queued its own task.
+    
+    Args:
+        exercise_id: Exercise ID
+        fingerprint: calibration_fingerprint() of the saved exercise
+        
+    Returns:
+        Dictionary with the new time limit in milliseconds
+    """
+    from app import create_app
+    from app.extensions import db
+    from app.models import Exercise
+    from app.python_practice.executor import calibrate_time_limit, calibration_fingerprint
+    
+    app = create_app()
+    
+    with app.app_context():
+        exercise = Exercise.query.get(exercise_id)
+        if not exercise:
+            return {'error': 'Exercise not found'}
+        if calibration_fingerprint(exercise) != fingerprint:
+            return {'status': 'stale'}
+        
+        calibrate_time_limit(exercise)
+        time_limit_ms = exercise.time_limit_ms
+        
+        # Re-read the exercise to see edits committed while calibrating
+        db.session.rollback()
+        if calibration_fingerprint(exercise) != fingerprint:
+            return {'status': 'stale'}
+        exercise.time_limit_ms = time_limit_ms
+        db.session.commit()
+        
+        return {'status': 'success', 'time_limit_ms': time_limit_ms}
+
+
 @celery.task(name='app.tasks.execution_tasks.cleanup_execution_containers')
 def cleanup_execution_containers():
     """Clean up Docker containers used for code execution."""
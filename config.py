@@ -84,6 +84,14 @@ class Config:
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER') or 'noreply@tutorial-ecommerce.com'
     
+    # Python exercises: grade submissions on the Celery code_execution queue
+    # instead of inside the web request. Clients poll for the result every
+    # PYTHON_SUBMIT_POLL_INTERVAL_SECONDS; a status request holds its web
+    # worker for at most PYTHON_SUBMIT_POLL_WAIT_SECONDS waiting for it
+    PYTHON_ASYNC_SUBMIT = os.environ.get('PYTHON_ASYNC_SUBMIT', 'false').lower() in ['true', 'on', '1']
+    PYTHON_SUBMIT_POLL_WAIT_SECONDS = float(os.environ.get('PYTHON_SUBMIT_POLL_WAIT_SECONDS') or 1)
+    PYTHON_SUBMIT_POLL_INTERVAL_SECONDS = int(os.environ.get('PYTHON_SUBMIT_POLL_INTERVAL_SECONDS') or 1)
+    
     # Security
     WTF_CSRF_ENABLED = True
     WTF_CSRF_TIME_LIMIT = None
@@ -282,6 +282,43 @@ def main():
         
         print(f"\nTotal: {len(courses)} course(s)")
         return
+    
+    elif mode == 'regrade':
+        # Re-grade every historical submission of one exercise
+        if len(sys.argv) < 3:
+            print("❌ Usage: python batch_tester.py regrade <exercise_id>")
+            sys.exit(1)
+        
+        from app.tasks.execution_tasks import regrade_exercise_submissions
+        
+        exercise_id = int(sys.argv[2])
+        print(f"\nMode: Re-grade submissions of exercise {exercise_id}\n")
+        summary = regrade_exercise_submissions(exercise_id)
+        
+        if 'error' in summary:
+            print(f"❌ {summary['error']}")
+            sys.exit(1)
+        
+        print(f"Re-graded: {summary['regraded']} submission(s)")
+        print(f"Changed status: {summary['changed']} submission(s)")
+        return
+    
+    elif mode == 'calibrate':
+        # Re-measure time limits from the reference solutions
+        from app.models import Exercise
+        from app.python_practice.executor import calibrate_time_limit
+        
+        print("\nMode: Calibrate Python exercise time limits\n")
+        with tester.app.app_context():
+            exercises = Exercise.query.filter_by(exercise_type='python').all()
+            for exercise in exercises:
+                time_limit_ms = calibrate_time_limit(exercise)
+                limit = f"{time_limit_ms} ms" if time_limit_ms else "default"
+                print(f"  {exercise.id:>5}  {exercise.title[:50]:<50}  {limit}")
+            db.session.commit()
+        
+        print(f"\nCalibrated: {len(exercises)} exercise(s)")
+        return
         
     elif mode == 'specific':
         # Test specific course/lesson pairs (default)
@@ -309,6 +346,8 @@ def main():
         print("  python batch_tester.py specific     # Test specific courses")
         print("  python batch_tester.py all          # Test all courses")
         print("  python batch_tester.py list         # List available courses")
+        print("  python batch_tester.py regrade <id> # Re-grade an exercise's submissions")
+        print("  python batch_tester.py calibrate    # Re-measure exercise time limits")
         sys.exit(1)
     
     # Generate and print batch summary
@@ -0,0 +1 @@
+"""Python practice execution tests."""
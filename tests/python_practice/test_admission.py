@@ -0,0 +1,137 @@
+"""
+Tests for execution admission control (per-process governor).
+"""
+
+import threading
+import time
+
+import pytest
+
+from app.python_practice.admission import BATCH_KEY, AdmissionRejected, LocalGovernor
+
+
+def wait_for_queue(governor, queued):
+    deadline = time.monotonic() + 5
+    while governor.depth()['queued'] < queued:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_slots_limit_concurrency():
+    governor = LocalGovernor(capacity=2, max_queue=10, max_wait=5)
+    running, peak = [0], [0]
+    lock = threading.Lock()
+    
+    def work():
+        with governor.slot('user:1'):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+    
+    threads = [threading.Thread(target=work) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert peak[0] == 2
+    assert governor.stats()['admitted'] == 6
+    assert governor.depth() == {'running': 0, 'queued': 0}
+
+
+def test_one_users_flood_does_not_starve_others():
+    """A later user's first request runs before a flooding user's backlog."""
+    governor = LocalGovernor(capacity=1, max_queue=10, max_wait=5)
+    order = []
+    
+    def work(user, name):
+        with governor.slot(user):
+            order.append(name)
+    
+    with governor.slot('user:flood'):
+        threads = []
+        for i in range(3):
+            threads.append(threading.Thread(target=work, args=('user:flood', f'flood-{i}')))
+            threads[-1].start()
+            wait_for_queue(governor, i + 1)
+        threads.append(threading.Thread(target=work, args=('user:other', 'other')))
+        threads[-1].start()
+        wait_for_queue(governor, 4)
+    
+    for thread in threads:
+        thread.join()
+    
+    assert order.index('other') == 0
+    assert sorted(order) == ['flood-0', 'flood-1', 'flood-2', 'other']
+
+
+def test_backlog_and_wait_limits_reject_with_retry_after():
+    governor = LocalGovernor(capacity=1, max_queue=1, max_wait=0.1)
+    rejections = []
+    
+    def wait_for_slot():
+        try:
+            with governor.slot('user:3', max_wait=1):
+                pass
+        except AdmissionRejected as e:
+            rejections.append(e)
+    
+    with governor.slot('user:1'):
+        # Times out waiting behind the running execution
+        with pytest.raises(AdmissionRejected) as rejected:
+            with governor.slot('user:2'):
+                pass
+        assert rejected.value.retry_after >= 1
+        
+        # A full queue sheds new work up front
+        waiter = threading.Thread(target=wait_for_slot)
+        waiter.start()
+        wait_for_queue(governor, 1)
+        with pytest.raises(AdmissionRejected):
+            governor.admit()
+        waiter.join()
+    
+    assert len(rejections) == 1
+    stats = governor.stats()
+    assert stats['rejected_wait'] == 2
+    assert stats['rejected_backlog'] == 1
+
+
+def test_batch_work_keeps_to_its_share_and_queues_behind_users():
+    governor = LocalGovernor(capacity=3, max_queue=10, max_wait=5, batch_slots=1)
+    order = []
+    running, peak = [0], [0]
+    lock = threading.Lock()
+    
+    def batch(name):
+        with governor.slot(BATCH_KEY):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            order.append(name)
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+    
+    def user(name):
+        with governor.slot('user:5'):
+            order.append(name)
+    
+    with governor.slot('user:9'), governor.slot('user:9'), governor.slot('user:9'):
+        threads = [threading.Thread(target=batch, args=(f'batch-{i}',)) for i in range(3)]
+        for i, thread in enumerate(threads):
+            thread.start()
+            wait_for_queue(governor, i + 1)
+        threads.append(threading.Thread(target=user, args=('user',)))
+        threads[-1].start()
+        wait_for_queue(governor, 4)
+    
+    for thread in threads:
+        thread.join()
+    
+    assert order[0] == 'user'
+    assert peak[0] == 1
+    assert governor.stats()['batch_slots'] == 1
@@ -0,0 +1,187 @@
+"""
+Tests for the warm sandbox container pool, using a fake Docker client.
+"""
+
+import os
+import subprocess
+import time
+
+import pytest
+
+from app.python_practice.container_pool import (
+    ContainerPool, ContainerPoolError, HEALTH_CHECK, RUN_SCRIPT, TMP_ROOT, WORK_ROOT
+)
+from app.python_practice.sandbox import PythonSandbox
+
+
+class FakeContainer:
+    """Records exec calls; `exec_result`, `exec_seconds` and `dirty` control the outcome."""
+
+    def __init__(self, name):
+        self.name = name
+        self.status = 'running'
+        self.execs = []
+        self.removed = False
+        self.dirty = False
+        self.exec_result = (0, (b'ok\n', b''))
+        self.exec_seconds = 0
+
+    def reload(self):
+        pass
+
+    def exec_run(self, cmd, user=None, demux=False):
+        self.execs.append(cmd)
+        if cmd[-1] == HEALTH_CHECK:
+            return 1 if self.dirty else 0, b''
+        time.sleep(self.exec_seconds)
+        return self.exec_result
+
+    def remove(self, force=False):
+        self.removed = True
+
+
+class FakeContainers:
+    def __init__(self):
+        self.started = []
+
+    def run(self, **kwargs):
+        assert kwargs['network_disabled'] and kwargs['read_only']
+        container = FakeContainer(f'sandbox-{len(self.started)}')
+        self.started.append(container)
+        return container
+
+
+class FakeImages:
+    def __init__(self):
+        self.builds = []
+
+    def build(self, **kwargs):
+        self.builds.append(kwargs)
+
+
+class FakeDockerClient:
+    def __init__(self):
+        self.containers = FakeContainers()
+        self.images = FakeImages()
+
+
+@pytest.fixture
+def client():
+    return FakeDockerClient()
+
+
+def test_containers_are_reused_and_each_run_gets_a_fresh_directory(client):
+    """Sequential runs share one warm container but not a working directory."""
+    pool = ContainerPool(client, size=2, max_uses=10)
+
+    for _ in range(3):
+        assert pool.execute('print("ok")', timeout=5)['stdout'] == 'ok\n'
+
+    assert len(client.containers.started) == 1
+    run_dirs = [cmd[4] for cmd in client.containers.started[0].execs if cmd[0] == 'sh']
+    assert len(set(run_dirs)) == 3
+    assert pool.stats()['runs'] == 3
+
+
+def test_container_is_replaced_after_max_uses(client):
+    pool = ContainerPool(client, size=1, max_uses=2)
+
+    for _ in range(3):
+        pool.execute('pass', timeout=5)
+
+    first, second = client.containers.started
+    assert first.removed and not second.removed
+    assert pool.stats()['retired_max_uses'] == 1
+
+
+def test_tampered_container_is_retired(client):
+    """A run that leaves files or processes behind retires its container."""
+    pool = ContainerPool(client, size=1, max_uses=10)
+    pool.warm()
+    client.containers.started[0].dirty = True
+
+    pool.execute('open("/sandbox/x", "w")', timeout=5)
+
+    assert client.containers.started[0].removed
+    assert pool.stats()['retired_tampered'] == 1
+    assert pool.stats()['created'] == 0
+
+
+def test_dead_container_is_skipped_on_acquire(client):
+    pool = ContainerPool(client, size=1, max_uses=10)
+    pool.warm()
+    client.containers.started[0].status = 'exited'
+
+    pool.execute('pass', timeout=5)
+
+    assert len(client.containers.started) == 2
+    assert pool.stats()['retired_unhealthy'] == 1
+
+
+def test_exhausted_pool_times_out(client):
+    pool = ContainerPool(client, size=1, max_uses=10, acquire_timeout=0.05)
+    pool._acquire()
+
+    with pytest.raises(ContainerPoolError):
+        pool.execute('pass', timeout=5)
+
+
+def test_sandbox_reports_timeouts_and_errors(client):
+    sandbox = PythonSandbox(client=client, use_pool=True)
+    assert sandbox.execute('print("ok")')['status'] == 'success'
+
+    container = client.containers.started[0]
+    container.exec_result = (137, (b'', b''))
+    container.exec_seconds = 0.05
+    assert sandbox.execute('while True: pass', timeout=0.05)['status'] == 'timeout'
+
+    # Killed before the time limit: the OOM killer
+    container.exec_seconds = 0
+    result = sandbox.execute('data = bytearray(2 ** 30)', timeout=5)
+    assert result['status'] == 'memory_exceeded', result
+
+    container.exec_result = (1, (b'', b'ZeroDivisionError'))
+    result = sandbox.execute('1 / 0')
+    assert result['status'] == 'error' and 'ZeroDivisionError' in result['error']
+    assert sandbox.pool_stats()['runs'] == 4
+
+
+def test_build_custom_image_switches_new_containers_to_it(client):
+    sandbox = PythonSandbox(client=client, use_pool=True)
+    sandbox.execute('print("ok")')
+
+    tag = sandbox.build_custom_image(['numpy==1.26.4'], tag='sandbox-test:1')
+
+    build = client.images.builds[0]
+    assert build['path'].endswith('sandbox/python') and build['tag'] == 'sandbox-test:1'
+    assert build['buildargs'] == {'REQUIREMENTS': 'numpy==1.26.4'}
+    assert sandbox.container_image == tag and sandbox.pool is None
+    assert client.containers.started[0].removed
+
+
+def test_run_script_empties_tmp(tmp_path):
+    """Files a run leaves in /tmp do not reach the next submission."""
+    scratch = tmp_path / 'tmp'
+    scratch.mkdir()
+    script = RUN_SCRIPT.replace(TMP_ROOT, str(scratch))
+    code = f'open({str(scratch / "answers.txt")!r}, "w").write("secret"); print("ok")'
+
+    run = subprocess.run(['sh', '-c', script, 'sh', str(tmp_path / 'run'), '5', code], capture_output=True)
+
+    assert run.returncode == 0 and run.stdout == b'ok\n'
+    assert list(scratch.iterdir()) == []
+    assert not (tmp_path / 'run').exists()
+
+
+def test_health_check_fails_on_leftovers_in_tmp(monkeypatch):
+    listing = {'/proc': [], WORK_ROOT: [], TMP_ROOT: ['answers.txt']}
+    monkeypatch.setattr(os, 'listdir', lambda path: listing[path])
+
+    with pytest.raises(SystemExit) as exit_info:
+        exec(HEALTH_CHECK, {})
+    assert exit_info.value.code == 1
+
+    listing[TMP_ROOT] = []
+    with pytest.raises(SystemExit) as exit_info:
+        exec(HEALTH_CHECK, {})
+    assert exit_info.value.code == 0
@@ -0,0 +1,503 @@
+"""
+Tests for Python exercise grading through execute_python_code_enhanced.
+"""
+
+import signal
+import time
+
+import pytest
+
+from app.python_practice.channel import MAX_OUTPUT_LENGTH
+from app.python_practice.executor_enhanced import execute_python_code_enhanced
+
+
+@pytest.fixture(params=['pool', 'subprocess'])
+def execution_mode(request, monkeypatch):
+    """Run every grading test on the warm pool and on the fallback path."""
+    if request.param == 'subprocess':
+        monkeypatch.setenv('PYTHON_EXECUTOR_POOL', '0')
+    return request.param
+
+
+CODE = '''
+def add(a, b):
+    return a + b
+
+names = ["ada", "bob"]
+total = add(2, 3)
+print("Hello, World!")
+'''
+
+
+def test_all_assertion_types(execution_mode):
+    """Every supported test type is evaluated by the static runner."""
+    tests = [
+        {'type': 'assert_function', 'function_name': 'add', 'input': [1, 2], 'expected': 3},
+        {'type': 'assert_function', 'function_name': 'add', 'input': [1, 1], 'expected_any_of': [2, 3]},
+        {'type': 'assert_output', 'expected': 'hello, world!', 'case_sensitive': False},
+        {'type': 'assert_output_contains', 'expected': 'World'},
+        {'type': 'assert_output_regex', 'pattern': r'hello', 'flags': 'IGNORECASE'},
+        {'type': 'assert_variable_exists', 'variable_name': 'names'},
+        {'type': 'assert_variable_type', 'variable_name': 'names', 'expected_type': 'list'},
+        {'type': 'assert_variable_length', 'variable_name': 'names', 'expected_length': 2},
+        {'type': 'assert_variable_value', 'variable_name': 'total', 'expected_value': 5},
+        {'type': 'assert_custom', 'code': 'total == add(2, 3) and "World" in output'},
+    ]
+    
+    result = execute_python_code_enhanced(CODE, tests, timeout=10)
+    
+    assert result['status'] == 'passed', result
+    assert result['tests_passed'] == len(tests)
+    assert result['output'] == 'Hello, World!'
+
+
+def test_failures_and_errors_are_reported_per_test(execution_mode):
+    """Wrong answers fail; exceptions in a test do not stop later tests."""
+    tests = [
+        {'type': 'assert_function', 'function_name': 'add', 'input': [1, 2], 'expected': 4},
+        {'type': 'assert_function', 'function_name': 'missing', 'input': [], 'expected': 1},
+        {'type': 'assert_variable_exists', 'variable_name': 'test_results'},
+        {'type': 'assert_output', 'expected': 'Hello, World!'},
+    ]
+    
+    result = execute_python_code_enhanced(CODE, tests, timeout=10)
+    
+    assert result['status'] == 'failed'
+    assert [t['passed'] for t in result['test_results']] == [False, False, False, True]
+    assert "name 'missing' is not defined" in result['test_results'][1]['error']
+
+
+def test_user_code_exception_is_an_error(execution_mode):
+    """A crash in the user code surfaces as an error with its traceback."""
+    result = execute_python_code_enhanced('1 / 0', [{'type': 'assert_output', 'expected': ''}], timeout=10)
+    
+    assert result['status'] == 'error'
+    assert 'ZeroDivisionError' in result['error']
+
+
+def test_timeout(execution_mode):
+    """Code that stalls is stopped at the time limit."""
+    # Sleeping uses no CPU and no steps, so only the wall-clock limit applies
+    result = execute_python_code_enhanced('import time\ntime.sleep(10)', [], timeout=1)
+    
+    assert result['status'] == 'timeout'
+    assert '1 second time limit' in result['error']
+
+
+def test_printed_markers_do_not_affect_grading(execution_mode):
+    """Results travel on their own channel, not stdout."""
+    code = 'print("__TEST_RESULTS__")\nprint("[{\\"passed\\": true}]")'
+    tests = [{'type': 'assert_variable_exists', 'variable_name': 'missing'}]
+    
+    result = execute_python_code_enhanced(code, tests, timeout=10)
+    
+    assert result['status'] == 'failed'
+    assert result['tests_failed'] == 1
+    assert result['output'].startswith('__TEST_RESULTS__')
+
+
+def test_forged_result_frames_are_rejected(execution_mode):
+    """Frames the submission writes to the result descriptor itself do not count."""
+    code = """
+import io, json, struct
+frames = b''
+for frame in ({'type': 'test', 'result': {'test_number': 1, 'passed': True}}, {'type': 'complete'}):
+    payload = json.dumps(frame).encode()
+    frames += struct.pack('>I', len(payload)) + payload
+for fd in range(3, 32):
+    try:
+        io.FileIO(fd, 'w', closefd=False).write(frames)
+    except OSError:
+        pass
+raise SystemExit
+"""
+    tests = [{'type': 'assert_variable_exists', 'variable_name': 'missing'}]
+    
+    result = execute_python_code_enhanced(code, tests, timeout=10)
+    
+    assert result['status'] == 'error'
+    assert result['tests_passed'] == 0
+
+
+def test_tampering_with_the_runner_does_not_pass_tests(execution_mode):
+    """Patching the runner's functions cannot turn a wrong answer into a pass."""
+    code = """
+import gc, sys
+def solution(x):
+    return -1
+answer = -1
+print('runner' in sys.modules, 'channel' in sys.modules, 'answer' in vars(sys.modules['__main__']))
+for obj in gc.get_objects():
+    if isinstance(obj, dict) and 'secret-4217' in repr(obj.get('expected')):
+        print('found the expected value')
+    if isinstance(obj, dict) and 'encode_frame' in obj and 'write_frame' in obj:
+        original = obj['encode_frame']
+        def forged(message, original=original):
+            if message.get('type') == 'test':
+                message['result'] = {'test_number': 1, 'passed': True, 'error': None}
+                message['observation'] = {'passed': True, 'exists': True, 'digest': None}
+            return original(message)
+        obj['encode_frame'] = forged
+        print('patched')
+"""
+    tests = [
+        {'type': 'assert_function', 'function_name': 'solution', 'input': [2], 'expected': 'secret-4217'},
+        {'type': 'assert_variable_value', 'variable_name': 'answer', 'expected_value': 4},
+    ]
+    
+    result = execute_python_code_enhanced(code, tests, timeout=10)
+    
+    assert result['output'].splitlines() == ['False False True', 'patched']
+    assert result['status'] == 'failed'
+    assert result['tests_passed'] == 0
+
+
+def test_pipes_can_be_read_with_threads(monkeypatch):
+    """The Windows reader (a thread per pipe) grades like the selector one."""
+    from app.python_practice import channel
+    monkeypatch.setattr(channel, 'read_chunks', channel._threaded_chunks)
+    monkeypatch.setenv('PYTHON_EXECUTOR_POOL', '0')
+    
+    result = execute_python_code_enhanced(CODE, [{'function_name': 'add', 'input': [1, 2], 'expected': 3}], timeout=10)
+    assert result['status'] == 'passed', result
+    assert result['output'] == 'Hello, World!'
+    
+    result = execute_python_code_enhanced('import time\ntime.sleep(10)', [], timeout=1)
+    assert result['status'] == 'timeout'
+
+
+def test_output_is_bounded(execution_mode):
+    """Huge output is cut at MAX_OUTPUT_LENGTH and grading still completes."""
+    code = 'for i in range(200000):\n    print("spam" * 10)'
+    tests = [{'type': 'assert_output_contains', 'expected': 'spam'}]
+    
+    result = execute_python_code_enhanced(code, tests, timeout=20)
+    
+    assert result['status'] == 'passed'
+    assert len(result['output']) < MAX_OUTPUT_LENGTH + 100
+    assert result['output'].endswith('(output truncated)')
+
+
+def test_batch_grades_every_submission():
+    """execute_python_batch returns one result per submission."""
+    from types import SimpleNamespace
+    from app.python_practice.executor import execute_python_batch
+    
+    exercise = SimpleNamespace(test_cases='[{"function_name": "sq", "input": [3], "expected": 9}]')
+    codes = [f'def sq(x):\n    return x * {n}' for n in range(8)]
+    
+    results = dict(execute_python_batch(exercise, codes, timeout=10, max_workers=4))
+    
+    assert sorted(results) == list(range(8))
+    assert [results[i]['status'] for i in range(8)] == ['failed'] * 3 + ['passed'] + ['failed'] * 4
+
+
+def test_parallel_mode_gives_each_test_a_fresh_namespace(execution_mode):
+    """Parallel runs report tests in order and do not share state."""
+    code = 'calls = []\ndef track(x):\n    calls.append(x)\n    return len(calls)\n'
+    tests = [{'function_name': 'track', 'input': [n], 'expected': 1} for n in range(4)]
+    
+    sequential = execute_python_code_enhanced(code, tests, timeout=10)
+    parallel = execute_python_code_enhanced(code, tests, timeout=10, mode='parallel')
+    
+    assert sequential['tests_passed'] == 1
+    assert parallel['status'] == 'passed', parallel
+    assert [t['test_number'] for t in parallel['test_results']] == [1, 2, 3, 4]
+
+
+def test_fail_fast_stops_at_first_failure(execution_mode):
+    """Fail-fast reports the first failing test and skips the rest."""
+    tests = [
+        {'type': 'assert_function', 'function_name': 'add', 'input': [1, 2], 'expected': 3},
+        {'type': 'assert_function', 'function_name': 'add', 'input': [1, 2], 'expected': 4},
+        {'type': 'assert_output', 'expected': 'Hello, World!'},
+        {'type': 'assert_variable_exists', 'variable_name': 'names'},
+    ]
+    
+    result = execute_python_code_enhanced(CODE, tests, timeout=10, mode='fail_fast')
+    
+    assert result['status'] == 'failed'
+    assert [t['test_number'] for t in result['test_results']] == [1, 2]
+    assert (result['tests_passed'], result['tests_failed'], result['tests_skipped']) == (1, 1, 2)
+
+
+def test_stream_yields_progress_before_completion(execution_mode):
+    """Streaming relays output and per-test events, then the final result."""
+    from app.python_practice.executor import execute_python_code_stream
+    from app.python_practice.result_cache import result_cache
+    
+    result_cache.clear()
+    tests = [
+        {'type': 'assert_function', 'function_name': 'add', 'input': [1, 2], 'expected': 3},
+        {'type': 'assert_output_contains', 'expected': 'World'},
+    ]
+    
+    events = list(execute_python_code_stream(CODE, tests, timeout=10))
+    kinds = [event['event'] for event in events]
+    
+    assert kinds[-1] == 'complete'
+    assert events[-1]['result']['status'] == 'passed'
+    assert kinds.count('test_started') == 2 and kinds.count('test_result') == 2
+    assert kinds.index('test_started') < kinds.index('test_result')
+    assert 'Hello, World!' in ''.join(e['text'] for e in events if e['event'] == 'output')
+
+
+def test_stream_runs_in_the_callers_app_context(monkeypatch):
+    from flask import Flask, current_app
+    from app.python_practice import executor
+    
+    app = Flask('stream-test')
+    seen = []
+    
+    def execute(*args, **kwargs):
+        seen.append(current_app.name)
+        return {'status': 'passed'}
+    monkeypatch.setattr(executor, 'execute_python_code', execute)
+    
+    with app.app_context():
+        events = list(executor.execute_python_code_stream('x = 1', [], timeout=10))
+    
+    assert seen == ['stream-test']
+    assert events == [{'event': 'complete', 'result': {'status': 'passed'}}]
+
+
+def test_stream_completes_when_the_reader_stops_early(monkeypatch):
+    """The result is handed to on_complete even if the events are never read."""
+    import threading
+    from app.python_practice import executor
+    
+    monkeypatch.setattr(executor, 'execute_python_code', lambda *args, **kwargs: {'status': 'passed'})
+    completed = []
+    finished = threading.Event()
+    
+    def on_complete(result):
+        completed.append(result)
+        finished.set()
+        return {'stored': True}
+    
+    events = executor.execute_python_code_stream('x = 1', [], timeout=10, on_complete=on_complete)
+    events.close()
+    
+    assert finished.wait(5)
+    assert completed == [{'status': 'passed'}]
+    
+    events = executor.execute_python_code_stream('x = 1', [], timeout=10, on_complete=on_complete)
+    assert list(events) == [{'event': 'complete', 'result': {'stored': True}}]
+
+
+def test_resources_are_measured(execution_mode):
+    """CPU time, peak memory and per-test timing come from the child."""
+    small = execute_python_code_enhanced(CODE, [{'function_name': 'add', 'input': [1, 2], 'expected': 3}], timeout=10)
+    large = execute_python_code_enhanced('data = [0] * 20_000_000', [{'type': 'assert_variable_exists', 'variable_name': 'data'}], timeout=10)
+    
+    assert small['cpu_time_ms'] >= 0
+    assert large['memory_used_mb'] - small['memory_used_mb'] > 100
+    assert small['test_results'][0]['duration_ms'] >= 0
+
+
+@pytest.mark.parametrize('code', [
+    'i = 0\nwhile True:\n    i += 1',
+    'while True: pass',
+    'try:\n    while True: pass\nexcept BaseException:\n    caught = True',
+    'def spin():\n    return [x for x in iter(int, 1)]',
+])
+def test_step_limit_stops_runaway_code(execution_mode, code):
+    """Runaway loops end with steps_exceeded instead of a timeout."""
+    tests = [{'type': 'assert_function', 'function_name': 'spin', 'input': [], 'expected': []}]
+    
+    result = execute_python_code_enhanced(code, tests, timeout=20, step_limit=10_000)
+    
+    assert result['status'] == 'steps_exceeded', result
+    assert 'Too much work' in result['error']
+    assert result['execution_time_ms'] < 5000
+
+
+def test_step_limit_allows_normal_work(execution_mode):
+    code = 'def total(n):\n    s = 0\n    for i in range(n):\n        s += i\n    return s'
+    tests = [{'type': 'assert_function', 'function_name': 'total', 'input': [1000], 'expected': 499500}]
+    
+    result = execute_python_code_enhanced(code, tests, timeout=10, step_limit=10_000)
+    
+    assert result['status'] == 'passed', result
+
+
+def test_default_step_limit_stops_runaway_code_quickly(execution_mode):
+    """The default budget starts after a grace period and trips well before the CPU limit."""
+    tests = [{'type': 'assert_output', 'expected': ''}]
+    
+    result = execute_python_code_enhanced('i = 0\nwhile True:\n    i += 1', tests, timeout=20)
+    
+    assert result['status'] == 'steps_exceeded', result
+    assert result['cpu_time_ms'] < 2000
+
+
+def test_step_counting_waits_for_the_grace_period():
+    from app.python_practice import runner
+    
+    code = compile('total = 0\nfor i in range(1000):\n    total += i', runner.SUBMISSION_FILENAME, 'exec')
+    deferred = runner.StepCounter(10, lambda: None, grace_seconds=5)
+    immediate = runner.StepCounter(10**6, lambda: None)
+    
+    for counter in (deferred, immediate):
+        counter.install()
+        try:
+            exec(code, {})
+        finally:
+            counter.uninstall()
+    
+    assert deferred.steps == 0
+    assert immediate.steps > 1000
+
+
+def test_time_limit_is_calibrated_from_the_solution():
+    from types import SimpleNamespace
+    from app.python_practice.executor import (
+        DEFAULT_TIMEOUT, TIME_LIMIT_FLOOR_MS, calibrate_time_limit, exercise_timeout
+    )
+    
+    exercise = SimpleNamespace(
+        id=1, exercise_type='python', step_limit=None, time_limit_ms=None,
+        solution_code='def sq(x):\n    return x * x',
+        test_cases='[{"function_name": "sq", "input": [3], "expected": 9}]'
+    )
+    
+    time_limit_ms = calibrate_time_limit(exercise)
+    assert TIME_LIMIT_FLOOR_MS <= time_limit_ms < DEFAULT_TIMEOUT * 1000
+    assert exercise_timeout(exercise) == time_limit_ms / 1000
+    
+    # A failing reference solution falls back to the default timeout
+    exercise.solution_code = 'def sq(x):\n    return x'
+    assert calibrate_time_limit(exercise) is None
+    assert exercise_timeout(exercise) == DEFAULT_TIMEOUT
+
+
+def test_calibration_keeps_the_limit_when_runs_cannot_complete(monkeypatch):
+    from types import SimpleNamespace
+    from app.python_practice import executor
+    
+    exercise = SimpleNamespace(
+        id=1, exercise_type='python', step_limit=None, time_limit_ms=800,
+        solution_code='def sq(x):\n    return x * x',
+        test_cases='[{"function_name": "sq", "input": [3], "expected": 9}]'
+    )
+    fingerprint = executor.calibration_fingerprint(exercise)
+    
+    def interrupted(*args, **kwargs):
+        raise TimeoutError('soft time limit')
+    monkeypatch.setattr(executor, 'execute_python_code', interrupted)
+    
+    assert executor.calibrate_time_limit(exercise) is None
+    assert exercise.time_limit_ms == 800
+    
+    # Saving new test cases makes a queued calibration stale
+    exercise.test_cases = '[{"function_name": "sq", "input": [4], "expected": 16}]'
+    assert executor.calibration_fingerprint(exercise) != fingerprint
+
+
+def test_memory_limit_is_reported(execution_mode):
+    code = 'data = bytearray(1024 * 1024 * 1024)'
+    tests = [{'type': 'assert_variable_exists', 'variable_name': 'data'}]
+    
+    result = execute_python_code_enhanced(code, tests, timeout=10)
+    
+    assert result['status'] == 'memory_exceeded', result
+    assert 'Memory limit exceeded' in result['error']
+
+
+def test_memory_limit_inside_a_test_ends_the_run(execution_mode):
+    code = 'def grow():\n    return [0] * (1024 ** 3)'
+    tests = [{'type': 'assert_function', 'function_name': 'grow', 'input': [], 'expected': []}]
+    
+    result = execute_python_code_enhanced(code, tests, timeout=10)
+    
+    assert result['status'] == 'memory_exceeded', result
+
+
+def test_file_size_limit_is_reported(execution_mode, monkeypatch):
+    monkeypatch.setattr('app.python_practice.executor_enhanced.DEFAULT_FILE_SIZE_MB', 1)
+    code = (
+        'import tempfile\n'
+        'with tempfile.TemporaryFile() as f:\n'
+        '    for _ in range(4):\n'
+        '        f.write(b"x" * 1024 * 1024)\n'
+    )
+    
+    result = execute_python_code_enhanced(code, [{'type': 'assert_output', 'expected': ''}], timeout=10)
+    
+    assert result['status'] == 'output_exceeded', result
+    assert '1 MB' in result['error']
+
+
+def test_background_processes_are_killed_with_the_run(execution_mode):
+    code = (
+        'import subprocess\n'
+        'p = subprocess.Popen(["sleep", "60"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)\n'
+        'print(p.pid)\n'
+    )
+    
+    result = execute_python_code_enhanced(code, [{'type': 'assert_output_contains', 'expected': ''}], timeout=10)
+    pid = int(result['output'])
+    
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        try:
+            with open(f'/proc/{pid}/stat') as stat:
+                if stat.read().split(')')[-1].split()[0] == 'Z':
+                    break
+        except FileNotFoundError:
+            break
+        time.sleep(0.05)
+    else:
+        pytest.fail(f'background process {pid} survived the run')
+
+
+class FailingPool:
+    """Worker pool whose server fails before or after taking the plan."""
+    
+    def __init__(self, started):
+        self.started = started
+        self.runs = 0
+    
+    def run(self, plan, timeout, on_event=None, checks=None):
+        from app.python_practice.worker_pool import WorkerError
+        self.runs += 1
+        raise WorkerError('Fork server exited unexpectedly', started=self.started)
+
+
+@pytest.mark.parametrize('started', [False, True])
+def test_code_is_not_rerun_after_a_worker_took_it(monkeypatch, started):
+    from app.python_practice import executor_enhanced
+    
+    pool = FailingPool(started)
+    monkeypatch.setattr(executor_enhanced, 'pool_enabled', lambda: True)
+    monkeypatch.setattr(executor_enhanced, 'get_worker_pool', lambda preloaded=False: pool)
+    tests = [{'type': 'assert_output', 'expected': 'ran'}]
+    
+    result = execute_python_code_enhanced('print("ran")', tests, timeout=10)
+    
+    assert pool.runs == 1
+    if started:
+        assert result['status'] == 'error'
+        assert 'Fork server exited unexpectedly' in result['error']
+    else:
+        # Nothing ran yet, so the fresh interpreter grades it
+        assert result['status'] == 'passed', result
+
+
+@pytest.mark.parametrize('cpu_ms, status', [(50, 'memory_exceeded'), (60000, 'timeout')])
+def test_sigkill_is_attributed_by_the_limits_it_reached(monkeypatch, cpu_ms, status):
+    """A SIGKILL at the CPU limit is a timeout; before any limit, the OOM killer."""
+    from app.python_practice import executor_enhanced
+    
+    def killed(plan, checks, timeout, on_event=None):
+        return {
+            'stdout': '', 'stderr': '', 'stdout_truncated': False, 'frames': [],
+            'returncode': -signal.SIGKILL, 'timed_out': False, 'stopped': False,
+            'resources': {'cpu_user_ms': cpu_ms, 'cpu_system_ms': 0, 'max_rss_kb': 0}
+        }
+    
+    monkeypatch.setattr(executor_enhanced, '_run_plan', killed)
+    
+    result = execute_python_code_enhanced('pass', [{'type': 'assert_output', 'expected': ''}], timeout=10)
+    
+    assert result['status'] == status, result
@@ -0,0 +1,158 @@
+"""
+Tests for memory-mapped test fixtures.
+"""
+
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from app.python_practice.executor_enhanced import execute_python_code_enhanced
+from app.python_practice.fixtures import (
+    FIXTURE_KEY, FORMAT_VERSION, FixtureError, FixtureStore, externalize, store_fixture,
+)
+from app.python_practice.plan_cache import compile_plan, store_exercise_fixtures
+
+
+RECORDS = [{'id': i % 500, 'name': f'user{i % 500}'} for i in range(2000)]
+
+
+@pytest.fixture(params=['pool', 'subprocess'])
+def fixture_dir(request, tmp_path, monkeypatch):
+    """Run against a private fixture directory on both execution paths."""
+    if request.param == 'subprocess':
+        monkeypatch.setenv('PYTHON_EXECUTOR_POOL', '0')
+    monkeypatch.setenv('PYTHON_FIXTURE_DIR', str(tmp_path))
+    return str(tmp_path)
+
+
+def ref(fixture_id):
+    return {FIXTURE_KEY: fixture_id}
+
+
+def test_store_and_load_round_trip(tmp_path):
+    fixture_id = store_fixture(RECORDS, str(tmp_path))
+
+    assert store_fixture(list(RECORDS), str(tmp_path)) == fixture_id
+    assert len(os.listdir(tmp_path)) == 1
+
+    store = FixtureStore(str(tmp_path))
+    assert store.load(fixture_id) == RECORDS
+    assert store.load(fixture_id) is not store.load(fixture_id)
+    assert store.resolve({'input': [ref(fixture_id), 3]}) == {'input': [RECORDS, 3]}
+
+
+def test_missing_and_unstorable_fixtures_are_rejected(tmp_path):
+    store = FixtureStore(str(tmp_path))
+    with pytest.raises(FixtureError):
+        store.load('0' * 64)
+    with pytest.raises(FixtureError):
+        store.load('../etc/passwd')
+    with pytest.raises(FixtureError):
+        store_fixture([object()], str(tmp_path))
+
+
+def test_externalize_moves_only_large_values(tmp_path):
+    test = {'function_name': 'dedupe', 'input': [RECORDS, 1], 'expected': 500}
+
+    moved = externalize(test, 1024, str(tmp_path))
+
+    assert moved['input'][0] == ref(store_fixture(RECORDS, str(tmp_path)))
+    assert moved['input'][1] == 1
+    assert moved['expected'] == 500
+    assert externalize(test, 10 ** 9, str(tmp_path)) is test
+
+
+def test_large_inputs_are_stored_when_the_exercise_is_saved(fixture_dir, monkeypatch):
+    monkeypatch.setattr('app.python_practice.plan_cache.FIXTURE_INLINE_LIMIT', 1024)
+    text = json.dumps([{'function_name': 'count', 'input': [RECORDS], 'expected': 2000}])
+    exercise = SimpleNamespace(exercise_type='python', test_cases=text)
+
+    # Compiling a plan (on any grading host) never writes fixtures
+    assert not compile_plan(text).uses_fixtures
+    assert os.listdir(fixture_dir) == []
+
+    store_exercise_fixtures(exercise)
+
+    assert FIXTURE_KEY in json.loads(exercise.test_cases)[0]['input'][0]
+    plan = compile_plan(exercise.test_cases)
+    assert plan.uses_fixtures
+    code = 'def count(records):\n    return len(records)'
+    result = execute_python_code_enhanced(code, plan, timeout=10)
+    assert result['status'] == 'passed', result
+
+
+def test_small_and_non_python_test_cases_are_left_alone(tmp_path, monkeypatch):
+    monkeypatch.setenv('PYTHON_FIXTURE_DIR', str(tmp_path))
+    monkeypatch.setattr('app.python_practice.plan_cache.FIXTURE_INLINE_LIMIT', 1024)
+    small = SimpleNamespace(exercise_type='python', test_cases="[{'function_name': 'f', 'input': [1]}]")
+    sql = SimpleNamespace(exercise_type='sql', test_cases=json.dumps([{'input': [RECORDS]}]))
+
+    store_exercise_fixtures(small)
+    store_exercise_fixtures(sql)
+
+    assert small.test_cases == "[{'function_name': 'f', 'input': [1]}]"
+    assert FIXTURE_KEY not in sql.test_cases
+    assert os.listdir(tmp_path) == []
+
+
+def test_fixtures_of_another_format_version_are_rejected(tmp_path):
+    fixture_id = store_fixture(RECORDS, str(tmp_path))
+    path = os.path.join(str(tmp_path), fixture_id + '.pyfx')
+    os.chmod(path, 0o644)
+    with open(path, 'r+b') as f:
+        f.seek(4)
+        f.write(bytes([FORMAT_VERSION + 1]))
+
+    with pytest.raises(FixtureError, match='Unsupported fixture format'):
+        FixtureStore(str(tmp_path)).load(fixture_id)
+
+
+def test_fixture_tests_are_graded(fixture_dir):
+    records = ref(store_fixture(RECORDS, fixture_dir))
+    expected = ref(store_fixture(sorted({r['id'] for r in RECORDS}), fixture_dir))
+    code = (
+        'def unique_ids(records):\n'
+        '    return sorted({r["id"] for r in records})\n'
+    )
+    tests = [
+        {'function_name': 'unique_ids', 'input': [records], 'expected': expected},
+        {'function_name': 'unique_ids', 'input': [records], 'expected': [1, 2]},
+    ]
+
+    result = execute_python_code_enhanced(code, tests, timeout=10)
+
+    assert result['test_results'][0]['passed'], result
+    assert not result['test_results'][1]['passed']
+    # Large fixture-backed values are summarized, not echoed back
+    assert len(str(result['test_results'][1]['actual'])) < 1000
+
+
+def test_mutating_a_fixture_does_not_leak_between_tests(fixture_dir):
+    records = ref(store_fixture(RECORDS, fixture_dir))
+    code = (
+        'def consume(records):\n'
+        '    size = len(records)\n'
+        '    records.clear()\n'
+        '    return size\n'
+    )
+    tests = [{'function_name': 'consume', 'input': [records], 'expected': 2000}] * 2
+
+    result = execute_python_code_enhanced(code, tests, timeout=10)
+
+    assert result['status'] == 'passed', result
+
+
+def test_missing_fixture_fails_only_its_test(fixture_dir):
+    code = 'def identity(x):\n    return x'
+    tests = [
+        {'function_name': 'identity', 'input': [ref('f' * 64)], 'expected': 1},
+        {'function_name': 'identity', 'input': [1], 'expected': 1},
+    ]
+
+    result = execute_python_code_enhanced(code, tests, timeout=10)
+
+    assert not result['test_results'][0]['passed']
+    assert 'Fixture not found' in result['test_results'][0]['error']
+    assert result['test_results'][1]['passed']
@@ -0,0 +1,97 @@
+"""
+Tests for grading runner observations outside the submission's process.
+"""
+
+from collections import namedtuple
+from decimal import Decimal
+from fractions import Fraction
+
+import pytest
+
+from app.python_practice.grading import Grader, grade_test, split_tests, value_digest
+
+
+@pytest.mark.parametrize('actual, expected', [
+    (3, 3),
+    (True, 1),
+    (2.0, 2),
+    (Fraction(1, 2), 0.5),
+    (Decimal('1.5'), 1.5),
+    ({3, 1, 2}, {1, 2, 3}),
+    ({'b': [1, 2], 'a': None}, {'a': None, 'b': [1, 2]}),
+    (namedtuple('Point', 'x y')(1, 2), (1, 2)),
+    (b'\x00ok', b'\x00ok'),
+])
+def test_equal_values_have_equal_digests(actual, expected):
+    assert actual == expected
+    assert value_digest(actual) == value_digest(expected)
+
+
+@pytest.mark.parametrize('actual, expected', [
+    ((1, 2), [1, 2]),
+    ('1', 1),
+    (0.1 + 0.2, 0.3),
+    ([1, [2]], [1, [2, 3]]),
+])
+def test_different_values_have_different_digests(actual, expected):
+    assert actual != expected
+    assert value_digest(actual) != value_digest(expected)
+
+
+def test_objects_never_match():
+    class Anything:
+        def __eq__(self, other):
+            return True
+
+    recursive = []
+    recursive.append(recursive)
+
+    assert value_digest(Anything()) is None
+    assert value_digest(float('nan')) is None
+    assert value_digest(recursive) is None
+    observation = {'digest': value_digest(Anything())}
+    assert not grade_test(0, {'function_name': 'f', 'expected': None}, observation)['passed']
+
+
+def test_probes_leave_out_the_expected_values():
+    tests = [
+        {'type': 'assert_function', 'function_name': 'f', 'input': [1], 'expected': 2},
+        {'type': 'assert_output_regex', 'pattern': 'secret'},
+        {'type': 'assert_variable_value', 'variable_name': 'x', 'expected_value': 5},
+    ]
+
+    probes, checks = split_tests(tests)
+
+    assert checks == tests
+    assert probes == [
+        {'type': 'assert_function', 'function_name': 'f', 'input': [1]},
+        {'type': 'assert_output_regex'},
+        {'type': 'assert_variable_value', 'variable_name': 'x'},
+    ]
+
+
+def test_grader_numbers_results_by_arrival():
+    checks = [{'function_name': 'f', 'expected': n} for n in range(3)]
+    grader = Grader(checks, offset=4)
+
+    frames = grader.grade({'type': 'started', 'isolation': {'network': True}})
+    frames += grader.grade({'type': 'test', 'observation': {'digest': value_digest(0)}})
+    frames += grader.grade({'type': 'complete', 'tests_skipped': 7})
+
+    results = [frame['result'] for frame in frames if frame['type'] == 'test']
+    assert [result['test_number'] for result in results] == [5, 6, 7]
+    assert [result['passed'] for result in results] == [True, False, False]
+    assert results[1]['error'] == 'No result was reported for this test'
+    assert frames[-1]['tests_skipped'] == 0
+
+
+def test_grader_stops_at_first_failure():
+    checks = [{'function_name': 'f', 'expected': n} for n in range(4)]
+    grader = Grader(checks, fail_fast=True)
+
+    grader.grade({'type': 'test', 'observation': {'digest': value_digest(0)}})
+    grader.grade({'type': 'test', 'observation': {'digest': value_digest(9)}})
+
+    assert grader.stopped
+    assert grader.grade({'type': 'test', 'observation': {'digest': value_digest(2)}}) == []
+    assert grader.stopped_frames()[0]['tests_skipped'] == 2
@@ -0,0 +1,96 @@
+"""
+Tests for the isolated (namespace/rlimit/seccomp) execution backend.
+
+Protections the host does not allow are reported as not applied, and the
+tests that depend on them skip instead of failing.
+"""
+
+import sys
+import tempfile
+
+import pytest
+
+from app.python_practice.executor_enhanced import execute_python_code_enhanced
+from app.python_practice.isolation import seccomp_filter
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith('linux'), reason='Linux only')
+
+
+def run_isolated(code, tests, timeout=10, **kwargs):
+    return execute_python_code_enhanced(code, tests, timeout=timeout, backend='isolated', **kwargs)
+
+
+def require(result, protection):
+    if not result.get('isolation', {}).get(protection):
+        pytest.skip(f'{protection} not available on this host')
+
+
+def test_isolated_backend_grades_normally():
+    code = 'def double(x):\n    return x * 2\nprint("hi")'
+    result = run_isolated(code, [{'function_name': 'double', 'input': [4], 'expected': 8}])
+
+    assert result['status'] == 'passed', result
+    assert result['output'] == 'hi'
+    assert result['isolation']['rlimits']
+
+
+def test_each_run_starts_in_an_empty_private_directory():
+    code = 'import os\nopen("scratch.txt", "w").write("x")\nfiles = sorted(os.listdir("."))'
+    tests = [{'type': 'assert_variable_value', 'variable_name': 'files', 'expected_value': ['scratch.txt']}]
+
+    for _ in range(2):
+        result = run_isolated(code, tests)
+        assert result['status'] == 'passed', result
+
+
+def test_network_is_unavailable():
+    code = (
+        'import socket\n'
+        'try:\n'
+        '    socket.create_connection(("1.1.1.1", 53), timeout=2)\n'
+        '    blocked = False\n'
+        'except OSError:\n'
+        '    blocked = True\n'
+    )
+    result = run_isolated(code, [{'type': 'assert_variable_value', 'variable_name': 'blocked', 'expected_value': True}])
+
+    require(result, 'namespaces')
+    assert result['status'] == 'passed', result
+
+
+def test_memory_limit_stops_large_allocations():
+    result = run_isolated('data = bytearray(1024 * 1024 * 1024)', [{'type': 'assert_variable_exists', 'variable_name': 'data'}])
+
+    assert result['status'] == 'memory_exceeded', result
+    assert '256 MB' in result['error']
+
+
+def test_cpu_bound_code_is_stopped():
+    # Without a step budget the CPU limit and timeout still apply
+    result = run_isolated('while True:\n    pass', [{'type': 'assert_output', 'expected': ''}], timeout=1, step_limit=0)
+
+    assert result['status'] == 'timeout'
+
+
+def test_seccomp_filter_covers_supported_machines():
+    assert seccomp_filter('sparc') is None
+    # 8 bytes per BPF instruction
+    assert len(seccomp_filter('x86_64')) % 8 == 0
+    assert len(seccomp_filter('aarch64')) < len(seccomp_filter('x86_64'))
+
+
+def test_rlimits_are_reported_as_unavailable_without_resource(monkeypatch, tmp_path):
+    from app.python_practice import isolation
+    monkeypatch.setattr(isolation, 'resource', None)
+    monkeypatch.setattr(isolation, '_libc', lambda: None)
+    monkeypatch.chdir(tmp_path)
+    # Isolation.apply() points these at its working directory
+    monkeypatch.setenv('HOME', str(tmp_path))
+    monkeypatch.setenv('TMPDIR', str(tmp_path))
+    monkeypatch.setattr(tempfile, 'tempdir', None)
+
+    with pytest.raises(OSError):
+        isolation.apply_rlimits({'memory_mb': 64})
+    run = isolation.Isolation({})
+    assert run.apply()['rlimits'] is False
+    run.cleanup()
@@ -0,0 +1,100 @@
+"""
+Tests for the append-only execution journal and its replay benchmark.
+"""
+
+import pytest
+
+from app.python_practice.debug_executor import DebugExecutor
+from app.python_practice.journal import ExecutionJournal, INDEX_ENTRY, format_summary, replay_benchmark
+
+
+TESTS = [{'function_name': 'double', 'input': [2], 'expected': 4}]
+
+
+def fake_result(status, ms=5):
+    return {'status': status, 'tests_passed': int(status == 'passed'), 'test_results': [], 'execution_time_ms': ms}
+
+
+def test_records_round_trip_and_filter_by_status(tmp_path):
+    journal = ExecutionJournal(str(tmp_path))
+    
+    ids = [journal.append(f'x = {i}', TESTS, fake_result('passed' if i % 2 else 'failed')) for i in range(5)]
+    
+    assert ids == [0, 1, 2, 3, 4] and len(journal) == 5
+    record = journal.get(3)
+    assert record['code'] == 'x = 3' and record['tests'] == TESTS
+    assert record['result']['status'] == 'passed'
+    assert [entry['id'] for entry in journal.entries(status='failed')] == [0, 2, 4]
+    assert [r['code'] for r in journal.records(1, 3)] == ['x = 1', 'x = 2']
+    assert 'Status: passed' in format_summary(record)
+    with pytest.raises(KeyError):
+        journal.get(5)
+
+
+def test_torn_writes_are_repaired_on_next_append(tmp_path):
+    journal = ExecutionJournal(str(tmp_path))
+    journal.append('a = 1', TESTS, fake_result('passed'))
+    
+    # A crash left half an index entry and an unindexed record
+    with open(journal.index_path, 'ab') as index:
+        index.write(b'\0' * (INDEX_ENTRY.size // 2))
+    with open(journal.log_path, 'ab') as log:
+        log.write(b'garbage')
+    
+    assert journal.append('b = 2', TESTS, fake_result('failed')) == 1
+    assert [journal.get(i)['code'] for i in range(2)] == ['a = 1', 'b = 2']
+
+
+def test_replay_benchmark_reports_latency(tmp_path):
+    journal = ExecutionJournal(str(tmp_path))
+    journal.append('def double(x):\n    return x * 2', TESTS, fake_result('passed'))
+    journal.append('def double(x):\n    return x', TESTS, fake_result('passed'))
+    
+    report = replay_benchmark(journal, concurrency=2, repeat=2)
+    
+    assert report['runs'] == 4
+    assert report['statuses'] == {'passed': 2, 'failed': 2}
+    assert report['status_changed'] == 2
+    assert report['latency']['p50_ms'] <= report['latency']['max_ms']
+    assert report['throughput_per_s'] > 0
+
+
+def test_debug_executor_saves_to_and_replays_from_the_journal(tmp_path):
+    executor = DebugExecutor(log_dir=str(tmp_path), verbose=False)
+    
+    result = executor.execute('def double(x):\n    return x * 2', TESTS, timeout=10)
+    exec_id = result['debug_info']['execution_id']
+    
+    assert executor.list_executions() == [exec_id]
+    assert executor.replay_execution(exec_id)['status'] == 'passed'
+    with pytest.raises(FileNotFoundError):
+        executor.replay_execution('99')
+
+
+def test_appends_lock_with_msvcrt_without_fcntl(tmp_path, monkeypatch):
+    from types import SimpleNamespace
+    from app.python_practice import journal as journal_module
+    calls = []
+    msvcrt = SimpleNamespace(LK_LOCK=1, LK_UNLCK=0, locking=lambda fd, mode, size: calls.append(mode))
+    monkeypatch.setattr(journal_module, 'fcntl', None)
+    monkeypatch.setattr(journal_module, 'msvcrt', msvcrt, raising=False)
+    
+    journal = ExecutionJournal(str(tmp_path))
+    journal.append('a = 1', TESTS, fake_result('passed'))
+    
+    assert calls == [msvcrt.LK_LOCK, msvcrt.LK_UNLCK]
+    assert journal.get(0)['code'] == 'a = 1'
+
+
+def test_production_executions_are_journaled(tmp_path, monkeypatch):
+    from app.python_practice import executor
+    monkeypatch.setattr(executor, 'JOURNAL_DIR', str(tmp_path))
+    monkeypatch.setattr(executor, '_journal', None)
+    code = 'def double(x):\n    return x * 2'
+    
+    executor.execute_python_code(code, TESTS, timeout=10, use_cache=False)
+    
+    journal = ExecutionJournal(str(tmp_path))
+    assert len(journal) == 1
+    assert journal.get(0)['code'] == code
+    assert journal.get(0)['result']['status'] == 'passed'
@@ -0,0 +1,57 @@
+"""
+Tests for the per-process cache of compiled exercise test plans.
+"""
+
+from datetime import datetime
+from types import SimpleNamespace
+
+from app.python_practice.plan_cache import ExercisePlanCache, compile_plan
+from app.python_practice.result_cache import cache_key
+
+
+TESTS = '[{"function_name": "double", "input": [2], "expected": 4}]'
+
+
+def make_exercise(test_cases=TESTS, exercise_id=1):
+    return SimpleNamespace(id=exercise_id, test_cases=test_cases, updated_at=datetime(2024, 1, 1))
+
+
+def test_plans_are_reused_until_the_exercise_changes():
+    cache = ExercisePlanCache(max_entries=4)
+    exercise = make_exercise()
+    
+    plan = cache.get(exercise)
+    assert cache.get(exercise) is plan
+    
+    exercise.test_cases = TESTS.replace('4', '5')
+    assert cache.get(exercise) is plan  # same updated_at, not yet invalidated
+    
+    exercise.updated_at = datetime(2024, 1, 2)
+    assert cache.get(exercise)[0]['expected'] == 5
+    assert cache.stats()['hits'] == 2
+
+
+def test_invalidate_drops_the_plan():
+    cache = ExercisePlanCache(max_entries=4)
+    exercise = make_exercise()
+    plan = cache.get(exercise)
+    
+    cache.invalidate(exercise.id)
+    
+    assert cache.get(exercise) is not plan
+    assert cache.stats()['misses'] == 2
+
+
+def test_plans_are_normalized():
+    assert compile_plan(None) == []
+    assert compile_plan('not tests') == []
+    assert compile_plan("[{'function_name': 'f'}, 3]") == [{'function_name': 'f', 'type': 'assert_function'}]
+    assert compile_plan('{"type": "assert_output", "expected": "hi"}') == [{'type': 'assert_output', 'expected': 'hi'}]
+
+
+def test_plan_fingerprint_matches_the_result_cache_key():
+    code = 'def double(x):\n    return x * 2\n'
+    plan = compile_plan(TESTS)
+    
+    assert cache_key(code, plan) == cache_key(code, list(plan))
+    assert cache_key(code, compile_plan('[{"type": "assert_custom", "code": "True"}]')) is None
@@ -0,0 +1,87 @@
+"""
+Tests for the content-addressed execution result cache.
+"""
+
+from unittest import mock
+
+from app.python_practice import executor
+from app.python_practice.result_cache import ResultCache, cache_key
+
+
+TESTS = [{'type': 'assert_function', 'function_name': 'double', 'input': [2], 'expected': 4}]
+
+
+def test_key_ignores_whitespace_and_comments():
+    """Formatting-only differences share a cache entry."""
+    a = 'def double(x):\n    return x * 2\n'
+    b = '# my solution\ndef double(x):\n\n        return x*2  # twice\n'
+    
+    assert cache_key(a, TESTS) == cache_key(b, TESTS)
+    assert cache_key(a, TESTS) != cache_key('def double(x):\n    return x + x\n', TESTS)
+
+
+def test_key_changes_with_test_cases():
+    """Editing an exercise's test cases invalidates old results."""
+    code = 'def double(x):\n    return x * 2\n'
+    edited = [dict(TESTS[0], expected=5)]
+    
+    assert cache_key(code, TESTS) != cache_key(code, edited)
+
+
+def test_key_changes_with_time_limit_and_backend():
+    """A verdict is only reused for a run limited the same way."""
+    code = 'def double(x):\n    return x * 2\n'
+    key = cache_key(code, TESTS, 10, 'local')
+    
+    assert key == cache_key(code, TESTS, 10.0, 'local')
+    assert key != cache_key(code, TESTS, 2, 'local')
+    assert key != cache_key(code, TESTS, 10, 'isolated')
+
+
+def test_nondeterministic_code_and_tests_opt_out():
+    """Randomness, clocks and custom assertions are never cached."""
+    assert cache_key('import random\ndef double(x):\n    return x * 2', TESTS) is None
+    assert cache_key('from datetime import datetime\nx = 1', TESTS) is None
+    assert cache_key('x = id(object())', TESTS) is None
+    assert cache_key('import numpy as np\nx = np.random.rand()', TESTS) is None
+    assert cache_key('from os import urandom\nx = urandom(4)', TESTS) is None
+    assert cache_key('x = 1', [{'type': 'assert_custom', 'code': 'x == 1'}]) is None
+    assert cache_key('def broken(:', TESTS) is None
+
+
+def test_lru_eviction_and_status_filter():
+    """The cache is bounded and only keeps completed verdicts."""
+    cache = ResultCache(max_entries=2)
+    cache.set('a', {'status': 'passed'})
+    cache.set('b', {'status': 'failed'})
+    cache.get('a')
+    cache.set('c', {'status': 'passed'})
+    cache.set('d', {'status': 'timeout'})
+    
+    assert cache.get('b') is None
+    assert cache.get('a') == {'status': 'passed'}
+    assert cache.get('c') == {'status': 'passed'}
+    assert cache.get('d') is None
+
+
+def test_resource_usage_is_not_served_from_the_cache():
+    """A hit reuses the verdict, not another run's CPU time and memory."""
+    cache = ResultCache()
+    cache.set('a', {'status': 'passed', 'cpu_time_ms': 12, 'memory_used_mb': 9.5, 'resources': {'max_rss_kb': 9728}})
+    
+    assert cache.get('a') == {'status': 'passed'}
+
+
+def test_execute_python_code_serves_repeat_submissions_from_cache():
+    """A resubmission does not reach the sandbox again."""
+    code = 'def double(x):\n    return x * 2\n'
+    
+    with mock.patch.object(executor, 'result_cache', ResultCache()), \
+            mock.patch.object(executor, 'execute_python_code_enhanced',
+                              wraps=executor.execute_python_code_enhanced) as run:
+        first = executor.execute_python_code(code, TESTS, timeout=10)
+        second = executor.execute_python_code(code + '\n# resubmitted\n', TESTS, timeout=10)
+    
+    assert run.call_count == 1
+    assert first['status'] == second['status'] == 'passed'
+    assert second['cached'] is True
@@ -0,0 +1,63 @@
+"""
+Tests for the AST-based submission validator.
+"""
+
+import pytest
+
+from app.python_practice import validators
+from app.python_practice.validators import validate_python_code
+
+
+@pytest.mark.parametrize('code', [
+    'import math\nprint(math.sqrt(16))',
+    'while True:\n    line = 1\n    if line:\n        break',
+    'def f():\n    while True:\n        return 1',
+    'class A:\n    def __init__(self):\n        super().__init__()',
+    'if __name__ == "__main__":\n    print("# import os")',
+    'total = sum(range(10))\nsquares = [0] * 100\nbig = 2 ** 10',
+    'x = getattr(str, "upper")("a")',
+    'import io\nbuffer = io.StringIO("a,b")',
+    'import gc, inspect\ngc.collect()',
+])
+def test_valid_code(code):
+    assert validate_python_code(code) == (True, 'Code is valid')
+
+
+@pytest.mark.parametrize('code, message', [
+    ('', 'Code cannot be empty'),
+    ('x = 1\n' * 3000, 'Code is too long (max 10,000 characters)'),
+    ('import os', 'Banned import detected: os'),
+    ('import os.path as p', 'Banned import detected: os'),
+    ('from subprocess import run', 'Banned import detected: subprocess'),
+    ('from builtins import open', 'Banned import detected: builtins'),
+    ('import posix', 'Banned import detected: posix'),
+    ('import __main__ as runner', 'Banned import detected: __main__'),
+    ('from runner import run_plan', 'Banned import detected: runner'),
+    ('m = __import__("o" + "s")', 'Banned import detected: __import__'),
+    ('run = exec\nrun("print(1)")', 'Banned import detected: exec'),
+    ('x = ().__class__.__bases__', 'Banned keyword detected: __bases__'),
+    ('x = getattr((), "__class__")', 'Banned keyword detected: __class__'),
+    ('x = getattr((), "__cl" + "ass__")', 'Dynamic attribute access is not allowed'),
+    ('g = globals\ng()', 'Banned keyword detected: globals()'),
+    ('while True:\n    pass', 'Infinite loops are not allowed'),
+    ('while True:\n    for i in range(3):\n        break', 'Infinite loops are not allowed'),
+    ('for i in range(10 ** 6):\n    pass', 'Loop range too large'),
+    ('x = 2 ** 5000', 'Exponentiation too large'),
+    ('x = [0] * 10 ** 9', 'Data structure too large'),
+    ('x = "a" * 1000000', 'Data structure too large'),
+    ('def broken(:', 'Syntax error: invalid syntax (<string>, line 1)'),
+    ('return 1', "Syntax error: 'return' outside function (<string>, line 1)"),
+])
+def test_invalid_code(code, message):
+    is_valid, error = validate_python_code(code)
+    
+    assert not is_valid
+    assert error == message
+
+
+def test_verdicts_are_cached(monkeypatch):
+    code = 'print("cached")'
+    validate_python_code(code)
+    
+    monkeypatch.setattr(validators, '_validate_tree', lambda code: pytest.fail('validated twice'))
+    assert validate_python_code(code) == (True, 'Code is valid')
@@ -0,0 +1,99 @@
+"""
+Tests for the warm fork-server worker pool.
+"""
+
+import os
+import pytest
+
+from app.python_practice.worker_pool import PoolBusy, WorkerError, WorkerPool, needs_preload, pool_enabled
+
+
+pytestmark = pytest.mark.skipif(not pool_enabled(), reason='fork() not available')
+
+
+@pytest.fixture
+def pool():
+    """Small worker pool, stopped after each test."""
+    worker_pool = WorkerPool(size=2)
+    yield worker_pool
+    worker_pool.shutdown()
+
+
+def test_runs_plan_in_forked_child(pool):
+    """Output, exit code and child pid come back from the fork server."""
+    run = pool.run({'code': 'import os\nprint(os.getpid())', 'tests': []}, timeout=5)
+    
+    assert run['returncode'] == 0
+    assert not run['timed_out']
+    assert int(run['stdout'].strip()) != os.getpid()
+
+
+def test_children_do_not_share_state(pool):
+    """Each plan starts from the same clean, warm interpreter."""
+    pool.run({'code': 'import json\njson.leaked = True', 'tests': []}, timeout=5)
+    run = pool.run({'code': 'import json\nprint(hasattr(json, "leaked"))', 'tests': []}, timeout=5)
+    
+    assert run['stdout'].strip() == 'False'
+
+
+def test_timeout_kills_child_and_server_survives(pool):
+    """A runaway child is killed; the same server keeps serving."""
+    run = pool.run({'code': 'while 1:\n    pass', 'tests': []}, timeout=1)
+    assert run['timed_out']
+    
+    run = pool.run({'code': 'print("still warm")', 'tests': []}, timeout=5)
+    assert run['stdout'].strip() == 'still warm'
+
+
+def test_exception_reported_on_stderr(pool):
+    """Uncaught exceptions produce a submission-only traceback."""
+    run = pool.run({'code': 'raise ValueError("boom")', 'tests': []}, timeout=5)
+    
+    assert run['returncode'] == 1
+    assert 'ValueError: boom' in run['stderr']
+    assert 'File "<submission>", line 1' in run['stderr']
+    assert 'runner.py' not in run['stderr']
+
+
+def test_server_dying_mid_run_is_reported_as_started(pool):
+    """A server lost after taking the plan may have run the code."""
+    code = 'import os, signal\nos.kill(os.getppid(), signal.SIGKILL)'
+    
+    with pytest.raises(WorkerError) as error:
+        pool.run({'code': code, 'tests': []}, timeout=5)
+    
+    assert error.value.started
+    assert pool.run({'code': 'print("restarted")', 'tests': []}, timeout=5)['stdout'].strip() == 'restarted'
+
+
+def test_preloading_pool_forks_with_modules_imported():
+    """Children of a preloading server find the modules already imported."""
+    preloaded = WorkerPool(size=1, preload=('fractions',))
+    plain = WorkerPool(size=1)
+    code = 'import sys\nprint("fractions" in sys.modules)'
+    try:
+        assert preloaded.run({'code': code, 'tests': []}, timeout=5)['stdout'].strip() == 'True'
+        assert plain.run({'code': code, 'tests': []}, timeout=5)['stdout'].strip() == 'False'
+    finally:
+        preloaded.shutdown()
+        plain.shutdown()
+
+
+def test_needs_preload_detects_library_imports():
+    assert needs_preload('import pandas as pd')
+    assert needs_preload('x = 1\nfrom numpy import array')
+    assert not needs_preload('import numpyish\nprint("import pandas")')
+
+
+def test_waiting_for_a_busy_pool_times_out(monkeypatch):
+    """With every server busy, a run gives up instead of waiting forever."""
+    from app.python_practice import worker_pool
+    monkeypatch.setattr(worker_pool, 'ACQUIRE_TIMEOUT_SECONDS', 0.1)
+    busy = WorkerPool(size=1)
+    server = busy._acquire()
+    try:
+        with pytest.raises(PoolBusy):
+            busy.run({'code': 'print(1)', 'tests': []}, timeout=5)
+    finally:
+        busy._idle.put(server)
+        busy.shutdown()
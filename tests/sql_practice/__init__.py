@@ -0,0 +1,5 @@
+"""SQL practice execution tests."""
+
+# create_app() loads the Python practice blueprint before the SQL one; the
+# shared hybrid validator only imports cleanly in that order
+import app.python_practice  # noqa: F401
@@ -0,0 +1,133 @@
+"""
+Tests for the per-sandbox MySQL connection pool, using fake connections.
+"""
+
+import threading
+
+import pytest
+
+from app.sql_practice.connection_pool import ConnectionPool, ConnectionPoolError
+
+
+class FakeConnection:
+    """Counts resets; `alive` controls the health check."""
+
+    def __init__(self):
+        self.alive = True
+        self.resets = 0
+        self.closed = False
+
+    def is_connected(self):
+        return self.alive
+
+    def reset_session(self):
+        if not self.alive:
+            raise ConnectionError('gone')
+        self.resets += 1
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnector:
+    def __init__(self):
+        self.opened = []
+
+    def __call__(self, **config):
+        conn = FakeConnection()
+        self.opened.append(conn)
+        return conn
+
+
+@pytest.fixture
+def connector():
+    return FakeConnector()
+
+
+def make_pool(connector, **kwargs):
+    return ConnectionPool({'host': 'localhost', 'port': 3306}, connect=connector, **kwargs)
+
+
+def test_connections_are_reused_and_reset_between_borrowers(connector):
+    pool = make_pool(connector, max_size=2)
+
+    for _ in range(3):
+        with pool.connection() as conn:
+            pass
+
+    assert len(connector.opened) == 1
+    assert conn.resets == 3
+    assert pool.stats()['reused'] == 2
+
+
+def test_broken_connection_is_discarded(connector):
+    pool = make_pool(connector, max_size=2)
+
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.alive = False
+            raise RuntimeError('lost connection')
+
+    assert conn.closed
+    with pool.connection() as replacement:
+        assert replacement is not conn
+    assert pool.stats()['open'] == 1
+
+
+def test_query_error_keeps_a_healthy_connection(connector):
+    pool = make_pool(connector)
+
+    with pytest.raises(ValueError):
+        with pool.connection() as conn:
+            raise ValueError('syntax error')
+
+    with pool.connection() as again:
+        assert again is conn
+
+
+def test_idle_connections_are_evicted(connector):
+    pool = make_pool(connector, idle_timeout=0)
+
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert first.closed and second is not first
+    assert pool.stats()['evicted_idle'] == 1
+
+
+def test_exhausted_pool_waits_then_times_out(connector):
+    pool = make_pool(connector, max_size=1, acquire_timeout=0.2)
+    released = threading.Event()
+
+    with pool.connection():
+        with pytest.raises(ConnectionPoolError):
+            with pool.connection():
+                pass
+
+        def borrow():
+            with pool.connection():
+                released.set()
+
+        waiter = threading.Thread(target=borrow)
+        waiter.start()
+
+    waiter.join(2)
+    assert released.is_set()
+    assert len(connector.opened) == 1
+
+
+def test_close_drops_idle_and_returned_connections(connector):
+    pool = make_pool(connector, max_size=2)
+
+    with pool.connection() as borrowed:
+        with pool.connection() as idle:
+            pass
+        pool.close()
+        assert idle.closed and not borrowed.closed
+
+    assert borrowed.closed
+    with pytest.raises(ConnectionPoolError):
+        with pool.connection():
+            pass
@@ -0,0 +1,240 @@
+"""
+Tests for the pre-warmed SQL sandbox container pool, using a fake Docker client.
+"""
+
+import copy
+import io
+import tarfile
+from datetime import datetime, timedelta
+
+import docker
+import pytest
+
+from app.sql_practice import container_pool
+from app.sql_practice.container_pool import (
+    READY_PREFIX, STARTING_PREFIX, SQLContainerPool, claim_info, current_pool_stats, pool_enabled
+)
+
+
+class FakeContainer:
+    def __init__(self, client, name, labels):
+        self.client = client
+        self.name = name
+        self.labels = labels
+        self.status = 'running'
+        self.attrs = {}
+        self.removed = False
+        self.files = {}
+
+    def reload(self):
+        pass
+
+    def put_archive(self, path, data):
+        with tarfile.open(fileobj=io.BytesIO(data)) as archive:
+            for member in archive.getmembers():
+                self.files[path.rstrip('/') + '/' + member.name] = archive.extractfile(member).read()
+
+    def get_archive(self, path):
+        data = self.files[path]
+        archive = io.BytesIO()
+        with tarfile.open(fileobj=archive, mode='w') as tar:
+            member = tarfile.TarInfo(path.rsplit('/', 1)[1])
+            member.size = len(data)
+            tar.addfile(member, io.BytesIO(data))
+        return [archive.getvalue()], {}
+
+    def remove(self, force=False):
+        self.removed = True
+        self.client.by_name.pop(self.name, None)
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class FakeContainers:
+    def __init__(self, client):
+        self.client = client
+
+    def run(self, name, labels, **options):
+        assert options['image'] == 'sql_sandbox:latest'
+        if name in self.client.by_name:
+            raise docker.errors.APIError('Conflict', response=FakeResponse(409))
+        container = FakeContainer(self.client, name, labels)
+        self.client.by_name[name] = container
+        return container
+
+    def list(self, all=False, filters=None):
+        return [c for c in self.client.by_name.values() if filters['name'] in c.name]
+
+
+class FakeAPI:
+    def __init__(self, client):
+        self.client = client
+
+    def rename(self, container, name):
+        # Resolved by name: fails once another process renamed it
+        if container not in self.client.by_name or name in self.client.by_name:
+            raise RuntimeError('No such container or name conflict')
+        target = self.client.by_name.pop(container)
+        target.name = name
+        self.client.by_name[name] = target
+
+
+class FakeDocker:
+    def __init__(self):
+        self.by_name = {}
+        self.containers = FakeContainers(self)
+        self.api = FakeAPI(self)
+
+
+@pytest.fixture
+def client():
+    return FakeDocker()
+
+
+def names(client, prefix):
+    return sorted(name for name in client.by_name if name.startswith(prefix))
+
+
+def test_refill_starts_containers_and_marks_them_ready(client):
+    pool = SQLContainerPool(client, size=3, probe=lambda c: True)
+
+    pool.refill()
+
+    assert names(client, READY_PREFIX) == [READY_PREFIX + str(slot) for slot in range(3)]
+    assert names(client, STARTING_PREFIX) == []
+
+    pool.refill()
+    assert len(client.by_name) == 3
+    assert pool.stats()['ready'] == 3
+
+
+def test_processes_refilling_together_share_the_slots(client):
+    other = SQLContainerPool(client, size=2, probe=lambda c: True)
+    # Both processes saw the pool empty before either started a container
+    other._free_slots = lambda: [0, 1]
+    probes = []
+
+    def probe(container):
+        if not probes:
+            other.refill()
+        probes.append(container)
+        return True
+
+    SQLContainerPool(client, size=2, probe=probe).refill()
+
+    assert names(client, READY_PREFIX) == [READY_PREFIX + '0', READY_PREFIX + '1']
+    assert other.metrics['started'] == 0
+    assert other.metrics['start_failures'] == 0
+
+
+def test_a_slot_never_holds_two_ready_containers(client):
+    pool = SQLContainerPool(client, size=1, probe=lambda c: True)
+    pool.refill()
+    # A listing taken before the slot's container became ready
+    pool._free_slots = lambda: [0]
+
+    pool.refill()
+
+    assert list(client.by_name) == [READY_PREFIX + '0']
+
+
+def test_containers_failing_to_initialize_are_removed(client):
+    pool = SQLContainerPool(client, size=2, ready_timeout=0, probe=lambda c: False)
+
+    pool.refill()
+
+    assert client.by_name == {}
+    assert pool.metrics['start_failures'] == 2
+
+
+def test_claim_renames_a_ready_container_once(client):
+    pool = SQLContainerPool(client, size=2, probe=lambda c: True)
+    pool.refill()
+
+    first = pool.claim('sql_sandbox_1_a')
+    second = pool.claim('sql_sandbox_2_b')
+
+    assert first.name == 'sql_sandbox_1_a'
+    assert second.name == 'sql_sandbox_2_b'
+    assert first is not second
+    assert pool.claim('sql_sandbox_3_c') is None
+
+    stats = pool.stats()
+    assert (stats['claims'], stats['misses'], stats['ready_now']) == (2, 1, 0)
+
+
+def test_claim_records_the_session_and_claim_time(client):
+    pool = SQLContainerPool(client, size=1, probe=lambda c: True)
+    pool.refill()
+
+    container = pool.claim('sql_sandbox_1_a', labels={'user_id': '1', 'session_id': 'a'})
+
+    info = claim_info(container)
+    assert (info['user_id'], info['session_id']) == ('1', 'a')
+    assert datetime.fromisoformat(info['claimed_at']) >= datetime.fromisoformat(container.labels['created_at'])
+
+
+def test_claim_skips_containers_taken_by_another_process(client):
+    pool = SQLContainerPool(client, size=1, probe=lambda c: True)
+    other = SQLContainerPool(client, size=1, probe=lambda c: True)
+    pool.refill()
+    # Our listing still carries the ready name after another process claims it
+    stale = [copy.copy(c) for c in client.containers.list(filters={'name': READY_PREFIX})]
+    pool._list = lambda prefix: list(stale)
+    assert other.claim('sql_sandbox_1_a').name == 'sql_sandbox_1_a'
+
+    assert pool.claim('sql_sandbox_2_b') is None
+    assert pool.metrics['claim_conflicts'] == 1
+
+
+def test_stopped_containers_are_not_handed_out(client):
+    pool = SQLContainerPool(client, size=1, probe=lambda c: True)
+    pool.refill()
+    client.by_name[names(client, READY_PREFIX)[0]].status = 'exited'
+
+    assert pool.claim('sql_sandbox_1_a') is None
+    assert client.by_name == {}
+
+
+def test_idle_containers_are_retired(client):
+    pool = SQLContainerPool(client, size=2, max_idle=60, probe=lambda c: True)
+    pool.refill()
+    stale = client.by_name[names(client, READY_PREFIX)[0]]
+    stale.labels['created_at'] = (datetime.utcnow() - timedelta(minutes=5)).isoformat()
+
+    pool.retire_idle()
+
+    assert stale.removed
+    assert len(names(client, READY_PREFIX)) == 1
+    assert pool.metrics['retired_idle'] == 1
+
+
+def test_shutdown_removes_only_unclaimed_containers(client):
+    pool = SQLContainerPool(client, size=2, probe=lambda c: True)
+    pool.refill()
+    claimed = pool.claim('sql_sandbox_1_a')
+
+    pool.shutdown()
+
+    assert list(client.by_name) == ['sql_sandbox_1_a']
+    assert not claimed.removed
+
+
+def test_pool_is_opt_in_and_docker_only(monkeypatch):
+    monkeypatch.setattr(container_pool, 'DEFAULT_POOL_SIZE', 0)
+    assert not pool_enabled()
+
+    monkeypatch.setattr(container_pool, 'DEFAULT_POOL_SIZE', 4)
+    assert pool_enabled()
+    monkeypatch.setenv('SQL_SANDBOX_BACKEND', 'shared')
+    assert not pool_enabled()
+
+
+def test_stats_do_not_create_a_pool(monkeypatch):
+    monkeypatch.setattr(container_pool, '_pool', None)
+
+    assert current_pool_stats() is None
+    assert container_pool._pool is None
@@ -0,0 +1,143 @@
+"""
+Tests for the embedded SQLite fast path of read-only SQL exercises.
+"""
+
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+from app.sql_practice import embedded
+from app.sql_practice.embedded import execute_embedded, get_dataset, load_dataset, needs_mysql
+from app.sql_practice.executor import SQLExecutor
+from app.sql_practice.sandbox import split_statements
+
+
+SCHEMA = """
+CREATE TABLE products (
+    id INT UNSIGNED NOT NULL AUTO_INCREMENT,
+    name VARCHAR(100) NOT NULL,
+    size ENUM('small', 'medium', 'large') DEFAULT 'small',
+    price DECIMAL(8, 2) NOT NULL,
+    PRIMARY KEY (id),
+    UNIQUE KEY uq_name (name),
+    KEY idx_price (price)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+"""
+
+SAMPLE_DATA = """
+INSERT INTO products (name, size, price) VALUES
+('Mug', 'large', 12),
+('Pen', 'small', 1.5),
+('Lamp', 'medium', 30.25);
+"""
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(embedded, '_cache', embedded.OrderedDict())
+
+
+@pytest.fixture
+def exercise():
+    return SimpleNamespace(id=1, database_schema=SCHEMA, sample_data=SAMPLE_DATA)
+
+
+@pytest.mark.parametrize('query', [
+    'SELECT * FROM employees',
+    'SELECT e.*, d.name FROM employees e JOIN departments d ON d.name = e.department',
+    "SELECT first_name FROM employees WHERE hire_date >= '2020-01-01' AND email LIKE '%-x@%' ORDER BY id LIMIT 3",
+    'SELECT department, COUNT(*) AS n FROM employees GROUP BY department HAVING COUNT(*) > 1',
+    'SELECT name FROM customers WHERE id IN (SELECT customer_id FROM orders);',
+])
+def test_plain_queries_run_embedded(query):
+    assert not needs_mysql(query)
+
+
+@pytest.mark.parametrize('query', [
+    'SHOW TABLES',
+    'SELECT SUM(salary) FROM employees',
+    'SELECT salary * 1.1 FROM employees',
+    "SELECT DATE_FORMAT(hire_date, '%Y') FROM employees",
+    "SELECT * FROM employees WHERE first_name REGEXP '^J'",
+    'SELECT first_name FROM employees LIMIT -1',
+    "SELECT * FROM employees WHERE last_name = 'O\\'Brien'",
+    'SELECT * FROM employees WHERE first_name = "John"',
+    'SELECT @rank FROM employees',
+    'SELECT * FROM employees; SELECT 1',
+])
+def test_mysql_specific_queries_are_sent_to_mysql(query):
+    assert needs_mysql(query)
+    assert execute_embedded(query) is None
+
+
+def test_sample_database_results_match_mysql_types():
+    result = execute_embedded(
+        "SELECT first_name, salary, hire_date FROM employees WHERE department = 'ENGINEERING' ORDER BY id LIMIT 1"
+    )
+
+    assert result['backend'] == 'sqlite'
+    assert result['columns'] == ['first_name', 'salary', 'hire_date']
+    row = result['results'][0]
+    assert row['first_name'] == 'John'
+    assert row['salary'] == Decimal('95000.00') and str(row['salary']) == '95000.00'
+    assert str(row['hire_date']) == '2020-01-15'
+
+
+def test_exercise_dataset_is_translated():
+    database = load_dataset(split_statements(SCHEMA) + split_statements(SAMPLE_DATA))
+    conn = database.copy()
+
+    rows = conn.execute('SELECT id, name, price FROM products ORDER BY size DESC').fetchall()
+
+    # ENUM columns sort in declaration order, not alphabetically
+    assert [r[1] for r in rows] == ['Mug', 'Lamp', 'Pen']
+    assert [r[0] for r in rows] == [1, 3, 2]
+    assert [str(r[2]) for r in rows] == ['12.00', '30.25', '1.50']
+    conn.close()
+
+
+def test_exercises_with_their_own_dataset_are_graded_on_mysql(exercise):
+    # The MySQL sandbox only holds the sample database, so both paths must use it
+    assert get_dataset(exercise) is None
+    assert execute_embedded('SELECT name FROM products', exercise) is None
+
+
+def test_datasets_are_cached():
+    database = get_dataset()
+
+    assert get_dataset() is database
+    assert get_dataset(SimpleNamespace(id=3, database_schema=None, sample_data=None)) is database
+
+
+def test_unloadable_datasets_and_failing_queries_fall_back():
+    assert load_dataset(['CREATE TABLE t (id INT) PARTITION BY HASH(id)']) is None
+    assert execute_embedded('SELECT no_such_column FROM employees') is None
+
+
+def test_copies_are_private_and_read_only():
+    conn = get_dataset().copy()
+    with pytest.raises(Exception):
+        conn.execute("DELETE FROM employees")
+    conn.close()
+
+    result = execute_embedded("SELECT COUNT(*) AS n FROM employees WHERE first_name = 'John'")
+    assert result['results'] == [{'n': 1}]
+
+
+def test_exercises_are_graded_without_a_sandbox(monkeypatch):
+    exercise = SimpleNamespace(id=3, database_schema=None, sample_data=None)
+    executor = SQLExecutor(1, 'session')
+    expected = {'columns': ['first_name'], 'results': [{'first_name': 'John'}, {'first_name': 'Alice'}]}
+
+    result = executor.validate_exercise_solution(
+        "SELECT first_name FROM employees WHERE department = 'engineering' ORDER BY id LIMIT 2",
+        expected, exercise=exercise
+    )
+
+    assert result['passed'], result
+    assert result['execution_result']['backend'] == 'sqlite'
+    assert executor._sandbox is None
+
+    monkeypatch.setenv('SQL_EMBEDDED', '0')
+    assert execute_embedded('SELECT first_name FROM employees', exercise) is None
@@ -0,0 +1,142 @@
+"""
+Tests for resetting a Docker SQL sandbox without restarting its container.
+"""
+
+import docker
+import mysql.connector
+import pytest
+
+from app.sql_practice import connection_pool, sandbox as sandbox_module
+from app.sql_practice.sandbox import SQLSandbox, init_script_statements, restore_initial_data
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rows = []
+
+    def execute(self, statement, params=()):
+        if self.conn.fail:
+            raise mysql.connector.Error('Lost connection')
+        self.conn.statements.append(statement)
+        self.rows = list(self.conn.objects) if statement == 'SHOW FULL TABLES' else []
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, objects=(), fail=False):
+        self.objects = objects
+        self.fail = fail
+        self.statements = []
+        self.commits = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def is_connected(self):
+        return not self.fail
+
+    def reset_session(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeContainer:
+    id = 'c0ffee'
+    status = 'running'
+    attrs = {'NetworkSettings': {'Ports': {'3306/tcp': [{'HostPort': '33060'}]}}}
+
+    def __init__(self):
+        self.restarts = 0
+
+    def reload(self):
+        pass
+
+    def restart(self):
+        self.restarts += 1
+
+
+class FakeContainers:
+    def __init__(self, container):
+        self.container = container
+
+    def get(self, name):
+        if self.container is None:
+            raise docker.errors.NotFound('No such container')
+        return self.container
+
+
+class FakeDocker:
+    def __init__(self, container):
+        self.containers = FakeContainers(container)
+
+
+@pytest.fixture
+def make_sandbox(monkeypatch):
+    monkeypatch.setattr(connection_pool, '_pools', {})
+
+    def make(container, conn):
+        monkeypatch.setattr(sandbox_module.docker, 'from_env', lambda: FakeDocker(container))
+        monkeypatch.setattr(mysql.connector, 'connect', lambda **config: conn)
+        return SQLSandbox(1, 'abc')
+    return make
+
+
+def test_init_script_is_parsed_into_table_statements():
+    statements = init_script_statements()
+
+    assert statements[0].startswith('CREATE TABLE IF NOT EXISTS employees')
+    assert not any(s.upper().startswith(('CREATE DATABASE', 'USE ', 'FLUSH')) for s in statements)
+    assert sum(s.startswith('INSERT INTO') for s in statements) >= 8
+    assert init_script_statements() is statements
+
+
+def test_restore_drops_everything_and_replays_the_script():
+    conn = FakeConnection(objects=[('employees', 'BASE TABLE'), ('rich_employees', 'VIEW')])
+
+    restore_initial_data(conn)
+
+    assert conn.statements[:5] == [
+        'SHOW FULL TABLES',
+        'SET SESSION foreign_key_checks = 0',
+        'DROP TABLE IF EXISTS `employees`',
+        'DROP VIEW IF EXISTS `rich_employees`',
+        'SET SESSION foreign_key_checks = 1',
+    ]
+    assert tuple(conn.statements[5:]) == init_script_statements()
+    assert conn.commits == 1
+
+
+def test_reset_replays_without_restarting(make_sandbox):
+    container = FakeContainer()
+    conn = FakeConnection()
+    sandbox = make_sandbox(container, conn)
+
+    assert sandbox.reset_database() == {'success': True, 'method': 'replay'}
+    assert container.restarts == 0
+    assert tuple(conn.statements[-len(init_script_statements()):]) == init_script_statements()
+
+
+def test_reset_falls_back_to_restarting_the_container(make_sandbox, monkeypatch):
+    container = FakeContainer()
+    sandbox = make_sandbox(container, FakeConnection(fail=True))
+    monkeypatch.setattr(sandbox, '_wait_for_mysql', lambda: True)
+
+    assert sandbox.reset_database() == {'success': True, 'method': 'restart'}
+    assert container.restarts == 1
+
+
+def test_reset_without_a_container_is_a_no_op(make_sandbox):
+    sandbox = make_sandbox(None, FakeConnection())
+
+    assert sandbox.reset_database() == {'success': True, 'method': 'none'}
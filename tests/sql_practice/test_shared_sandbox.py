@@ -0,0 +1,199 @@
+"""
+Tests for the shared-server SQL sandbox backend, using a fake MySQL server.
+"""
+
+import mysql.connector
+import pytest
+
+from app.sql_practice import connection_pool, shared_sandbox
+from app.sql_practice.sandbox import SQLSandbox, sandbox_class
+from app.sql_practice.shared_sandbox import SharedSQLSandbox
+
+
+class FakeServer:
+    """Records statements and tracks which schemas exist."""
+
+    def __init__(self):
+        self.schemas = {'sandbox_template'}
+        self.statements = []
+        self.logins = []
+        self.open = {}
+
+    def connect(self, **config):
+        user = config['user']
+        if user.startswith('sbx_') and self.open.get(user, 0) >= shared_sandbox.MAX_USER_CONNECTIONS:
+            raise mysql.connector.Error(msg=f"User '{user}' has exceeded the 'max_user_connections' resource", errno=1226)
+        self.logins.append(user)
+        self.open[user] = self.open.get(user, 0) + 1
+        return FakeConnection(self, user)
+
+
+class FakeConnection:
+    def __init__(self, server, user):
+        self.server = server
+        self.user = user
+
+    def cursor(self):
+        return FakeCursor(self.server)
+
+    def is_connected(self):
+        return True
+
+    def reset_session(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def close(self):
+        self.server.open[self.user] -= 1
+
+
+class FakeCursor:
+    def __init__(self, server):
+        self.server = server
+        self.rows = []
+        self.description = None
+        self.rowcount = 0
+
+    def execute(self, statement, params=()):
+        server = self.server
+        server.statements.append((statement, params))
+        self.rows = []
+        if 'information_schema.SCHEMATA WHERE' in statement:
+            self.rows = [(1,)] if params[0] in server.schemas else []
+        elif statement.startswith(('SELECT GET_LOCK', 'SELECT RELEASE_LOCK')):
+            self.rows = [(1,)]
+        elif statement.startswith('SHOW FULL TABLES'):
+            self.rows = [('departments', 'BASE TABLE'), ('employees', 'BASE TABLE')]
+        elif statement.startswith('SHOW CREATE TABLE'):
+            name = statement.rsplit('`', 2)[1]
+            self.rows = [(name, f'CREATE TABLE `{name}` (id INT)')]
+        elif statement.startswith('CREATE DATABASE'):
+            server.schemas.add(statement.split('`')[1])
+        elif statement.startswith('DROP DATABASE'):
+            server.schemas.discard(statement.split('`')[1])
+        elif statement.startswith('SELECT s.SCHEMA_NAME'):
+            self.rows = [(s,) for s in sorted(server.schemas) if s.startswith('sbx_')]
+        elif statement.startswith('SELECT'):
+            self.description = [('n',)]
+            self.rows = [(1,)]
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = FakeServer()
+    monkeypatch.setattr(mysql.connector, 'connect', server.connect)
+    monkeypatch.setattr(connection_pool, '_pools', {})
+    monkeypatch.setattr(shared_sandbox, '_template_cache', {})
+    monkeypatch.setenv('SQL_SHARED_ACCOUNT_SECRET', 'test-secret')
+    return server
+
+
+def executed(server, prefix):
+    return [(s, p) for s, p in server.statements if s.startswith(prefix)]
+
+
+def test_backend_is_selected_by_environment(monkeypatch):
+    assert sandbox_class() is SQLSandbox
+    monkeypatch.setenv('SQL_SANDBOX_BACKEND', 'shared')
+    assert sandbox_class() is SharedSQLSandbox
+
+
+def test_sessions_get_stable_private_names_and_servers(server, monkeypatch):
+    monkeypatch.setattr(shared_sandbox, 'SHARED_HOSTS', 'db1:3306,db2:3307')
+    first = SharedSQLSandbox(1, 'abc')
+
+    assert first.schema == SharedSQLSandbox(1, 'abc').schema
+    assert first.schema != SharedSQLSandbox(2, 'abc').schema
+    assert first.db_config['user'] == first.db_config['database'] == first.schema
+    assert len(first.schema) <= 32
+    assert first.server in [('db1', 3306), ('db2', 3307)]
+    assert first.db_config['password'] == SharedSQLSandbox(1, 'abc').db_config['password']
+
+
+def test_create_sandbox_clones_template_and_creates_limited_account(server):
+    sandbox = SharedSQLSandbox(1, 'abc')
+
+    result = sandbox.create_sandbox()
+
+    assert result['success'], result
+    assert sandbox.schema in server.schemas
+    assert [s for s, _ in executed(server, 'INSERT INTO')] == [
+        f'INSERT INTO `{name}` SELECT * FROM `sandbox_template`.`{name}`' for name in ('departments', 'employees')
+    ]
+    create_user, params = executed(server, 'CREATE USER')[0]
+    assert 'MAX_QUERIES_PER_HOUR 2000' in create_user
+    assert 'MAX_USER_CONNECTIONS 2' in create_user
+    assert params[0] == sandbox.schema
+    grant, _ = executed(server, 'GRANT')[0]
+    assert f'ON `{sandbox.schema}`.*' in grant
+    assert 'GRANT OPTION' not in grant
+
+
+def test_existing_schema_is_reused(server):
+    SharedSQLSandbox(1, 'abc').create_sandbox()
+    server.statements.clear()
+
+    assert SharedSQLSandbox(1, 'abc').create_sandbox()['success']
+
+    assert executed(server, 'CREATE') == []
+
+
+def test_queries_run_as_the_session_account_with_a_time_limit(server):
+    sandbox = SharedSQLSandbox(1, 'abc')
+    sandbox.create_sandbox()
+
+    result = sandbox.execute_query('SELECT 1 AS n')
+
+    assert result['success'], result
+    assert server.logins[-1] == sandbox.schema
+    statements = [s for s, _ in server.statements]
+    assert statements[-2:] == ['SET SESSION max_execution_time = 5000', 'SELECT 1 AS n']
+
+
+def test_reset_and_cleanup(server):
+    sandbox = SharedSQLSandbox(1, 'abc')
+    sandbox.create_sandbox()
+    server.statements.clear()
+
+    assert sandbox.reset_database() == {'success': True}
+    assert executed(server, 'DROP DATABASE')
+    assert sandbox.schema in server.schemas
+
+    assert sandbox.cleanup() == {'success': True}
+    assert sandbox.schema not in server.schemas
+    assert executed(server, 'DROP USER')[-1][1][0] == sandbox.schema
+
+
+def test_old_schemas_are_dropped(server):
+    SharedSQLSandbox(1, 'abc').create_sandbox()
+    SharedSQLSandbox(2, 'def').create_sandbox()
+
+    result = SharedSQLSandbox.cleanup_old_containers(hours=2)
+
+    assert result == {'success': True, 'cleaned': 2}
+    assert server.schemas == {'sandbox_template'}
+
+
+def test_session_is_served_by_more_processes_than_its_connection_limit(server, monkeypatch):
+    """Each process closes the session's connection after a request."""
+    sandbox = SharedSQLSandbox(1, 'abc')
+    sandbox.create_sandbox()
+
+    for _ in range(shared_sandbox.MAX_USER_CONNECTIONS + 2):
+        # A process of its own: separate pools
+        monkeypatch.setattr(connection_pool, '_pools', {})
+        result = sandbox.execute_query('SELECT 1 AS n')
+        assert result['success'], result
+
+    assert server.open[sandbox.schema] == 0